@@ -1,140 +1,234 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from db.database import engine
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+from services import data_version
+from services.occupancy import stamp_changes, changed_since
 
 router = APIRouter(prefix="/bins", tags=["Bins"])
 
+# More changed bins than this since the client's version -> full reload
+MAX_CHANGED_BINS = 500
+
+BIN_COLUMNS = """
+    b.location_code,
+    b.aisle || b.rack AS aisle,
+    b.side,
+    b.total_cartons,
+    b.max_cartons,
+    b.status,
+    b.items
+"""
+
+# Rows fetched from the server-side cursor per round trip when streaming
+STREAM_BATCH_ROWS = 500
+
 @router.get("")
-def get_bins():
-    query = """
-    SELECT
-        UPPER(ls.location_code) AS location_code,
-
-        split_part(
-            split_part(UPPER(ls.location_code), ' ', 2),
-            '-',
-            1
-        ) AS aisle,
-
-        CASE
-            WHEN (
-                NULLIF(
-                    regexp_replace(
-                        split_part(
-                            split_part(UPPER(ls.location_code), ' ', 2),
-                            '-',
-                            1
-                        ),
-                        '[^0-9]',
-                        '',
-                        'g'
-                    ),
-                    ''
-                )::int % 2
-            ) = 0
-            THEN 'RIGHT'
-            ELSE 'LEFT'
-        END AS side,
-
-        SUM(
-            CASE
-                WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0
-                THEN 0
-                ELSE FLOOR(ls.units::float / p.units_per_carton)
-            END
-        ) AS total_cartons,
-
-        COALESCE(lc.max_cartons, 0) AS max_cartons,
-
-        CASE
-            WHEN SUM(
-                CASE
-                    WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0
-                    THEN 0
-                    ELSE FLOOR(ls.units::float / p.units_per_carton)
-                END
-            ) = 0
-            THEN 'EMPTY'
-
-            WHEN lc.max_cartons IS NOT NULL
-                 AND SUM(
-                    CASE
-                        WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0
-                        THEN 0
-                        ELSE FLOOR(ls.units::float / p.units_per_carton)
-                    END
-                 ) >= lc.max_cartons
-            THEN 'FULL'
-
-            ELSE 'PARTIAL'
-        END AS status,
-
-        json_agg(
-            json_build_object(
-                'sku', ls.sku,
-                'product_name', p.product_name,
-                'cartons',
-                CASE
-                    WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0
-                    THEN 0
-                    ELSE FLOOR(ls.units::float / p.units_per_carton)
-                END
-            )
-            ORDER BY p.product_name
-        ) AS items
-
-    FROM location_stock ls
-    JOIN products p ON p.sku = ls.sku
-
-    LEFT JOIN location_capacity lc
-        ON UPPER(lc.location_code) = UPPER(ls.location_code)
-
-    -- 🔒 STRICT ELECTRA LOCK
-    WHERE
-        UPPER(ls.location_code) LIKE 'ELECTRA %'
-        AND LEFT(
-            split_part(
-                split_part(UPPER(ls.location_code), ' ', 2),
-                '-',
-                1
-            ),
-            1
-        ) IN ('P','Q','R','S','T')
-
-    GROUP BY UPPER(ls.location_code), lc.max_cartons
-
-    -- 🔢 PROPER NUMERIC WAREHOUSE SORT
-    ORDER BY
-        LEFT(
-            split_part(
-                split_part(UPPER(ls.location_code), ' ', 2),
-                '-',
-                1
-            ),
-            1
-        ),
-
-        CAST(
-            regexp_replace(
-                split_part(
-                    split_part(UPPER(ls.location_code), ' ', 2),
-                    '-',
-                    1
-                ),
-                '[^0-9]',
-                '',
-                'g'
-            ) AS INTEGER
-        ),
-
-        split_part(
-            split_part(UPPER(ls.location_code), ' ', 2),
-            '-',
-            2
-        );
+def get_bins(
+    request: Request,
+    response: Response,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Postgres renders each bin as JSON text and the rows are streamed
+    through as-is: format=json sends one array (same body as before),
+    format=ndjson one bin per line.
+    """
+    cached = data_version.not_modified(request, response, data_version.STOCK)
+    if cached:
+        return cached
+
+    # bin_occupancy is maintained by the write paths
+    # (services/occupancy.refresh_bins), so this is a plain indexed read
+    query = f"""
+    SELECT row_to_json(t)::text
+    FROM (
+        SELECT {BIN_COLUMNS}
+        FROM bin_occupancy b
+
+        -- 🔒 STRICT ELECTRA LOCK
+        WHERE
+            b.building = :building
+            AND b.aisle = ANY(:aisles)
+
+        -- 🔢 PROPER NUMERIC WAREHOUSE SORT
+        ORDER BY b.aisle, b.rack, b.shelf, b.bin
+    ) t;
     """
 
+    params = {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+    }
+
+    return StreamingResponse(
+        stream_json_rows(text(query), params, ndjson=format == "ndjson"),
+        media_type="application/x-ndjson" if format == "ndjson" else "application/json",
+        headers={k: response.headers[k] for k in ("etag", "cache-control")},
+    )
+
+
+def stream_json_rows(query, params, ndjson=False):
+    """
+    Run `query` on a server-side cursor and pass its JSON text rows
+    through as a JSON array or as NDJSON.
+
+    The connection is opened when streaming starts and closed when the
+    generator ends or is closed, so a client that disconnects before
+    the body starts leaves nothing checked out.
+    """
+    with engine.connect() as conn:
+
+        result = conn.execution_options(
+            stream_results=True,
+            yield_per=STREAM_BATCH_ROWS,
+        ).execute(query, params)
+
+        if not ndjson:
+            yield "["
+
+        first = True
+
+        for batch in result.scalars().partitions():
+
+            if ndjson:
+                yield "\n".join(batch) + "\n"
+            else:
+                yield ("" if first else ",") + ",".join(batch)
+
+            first = False
+
+        if not ndjson:
+            yield "]"
+
+
+# =====================================================
+# CHANGE FEED
+# =====================================================
+@router.get("/changes")
+def get_bin_changes(since: int | None = Query(None, ge=0)):
+    """
+    Bins touched after version `since`. `bins` holds their current
+    rows (same shape as GET /bins); `removed` the codes that no longer
+    hold stock. resync=true means reload GET /bins and continue from
+    the returned version. Call without `since` to get the version.
+    """
+    with engine.begin() as conn:
+        version = stamp_changes(conn)
+
+    if since is None or since > version:
+        return {"version": version, "resync": True}
+
+    if since == version:
+        return {"version": version, "resync": False, "bins": [], "removed": []}
+
+    with engine.connect() as conn:
+
+        codes = changed_since(conn, since, version, MAX_CHANGED_BINS)
+
+        if codes is None:
+            return {"version": version, "resync": True}
+
+        rows = conn.execute(text(f"""
+            SELECT {BIN_COLUMNS}
+            FROM bin_occupancy b
+            WHERE b.location_code = ANY(:codes)
+              AND b.building = :building
+              AND b.aisle = ANY(:aisles)
+            ORDER BY b.aisle, b.rack, b.shelf, b.bin
+        """), {
+            "codes": codes,
+            "building": WAREHOUSE_BUILDING,
+            "aisles": ALLOWED_AISLES,
+        }).mappings().all()
+
+    present = {row["location_code"] for row in rows}
+
+    return {
+        "version": version,
+        "resync": False,
+        "bins": rows,
+        "removed": sorted(set(codes) - present),
+    }
+
+
+# =====================================================
+# OCCUPANCY ROLLUPS
+# =====================================================
+ROLLUP_COLUMNS = """
+    node,
+    parent,
+    level,
+    building,
+    aisle,
+    rack,
+    bins,
+    empty_bins,
+    mixed_bins,
+    cartons,
+    capacity,
+    CASE
+        WHEN capacity > 0 THEN ROUND(cartons * 100.0 / capacity, 1)
+        ELSE 0
+    END AS occupancy_percent
+"""
+
+@router.get("/rollups")
+def get_bin_rollups(
+    request: Request,
+    response: Response,
+    node: str = Query(""),
+    level: str | None = Query(None, pattern="^(building|aisle|rack)$"),
+    below: float | None = Query(None, ge=0),
+):
+    """
+    Drill-down over warehouse -> building -> aisle -> rack.
+
+    node=""            warehouse totals and its buildings
+    node="ELECTRA/P"   aisle P and its racks
+    level=rack&below=60[&node=ELECTRA]
+                       every rack (under node) below 60% occupancy
+    """
+    cached = data_version.not_modified(request, response, data_version.STOCK)
+    if cached:
+        return cached
+
+    node = node.strip().upper()
+
     with engine.connect() as conn:
-        rows = conn.execute(text(query)).mappings().all()
 
-    return rows
\ No newline at end of file
+        current = conn.execute(text(f"""
+            SELECT {ROLLUP_COLUMNS}
+            FROM bin_rollup_tree
+            WHERE node = :node
+        """), {"node": node}).mappings().first()
+
+        if level:
+            query = f"""
+                SELECT {ROLLUP_COLUMNS}
+                FROM bin_rollup_tree
+                WHERE level = :level
+                  AND (:node = '' OR node LIKE :prefix)
+            """
+            params = {"level": level, "node": node, "prefix": f"{node}/%"}
+        else:
+            query = f"""
+                SELECT {ROLLUP_COLUMNS}
+                FROM bin_rollup_tree
+                WHERE parent = :node
+            """
+            params = {"node": node}
+
+        if below is not None:
+            query += " AND cartons * 100.0 < :below * capacity"
+            params["below"] = below
+
+        children = conn.execute(
+            text(query + " ORDER BY building, aisle, rack"), params
+        ).mappings().all()
+
+    if current is None and not children:
+        raise HTTPException(status_code=404, detail="Unknown node")
+
+    return {"node": current, "children": children}
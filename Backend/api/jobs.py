@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from services import jobs
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+# -------------------------------------------------
+# LIST RECENT JOBS
+# -------------------------------------------------
+@router.get("")
+def list_jobs():
+    return jobs.list_jobs()
+
+
+# -------------------------------------------------
+# JOB STATUS / RESULT
+# -------------------------------------------------
+@router.get("/{job_id}")
+def get_job(job_id: str):
+
+    job = jobs.get(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 from sqlalchemy import text
 from db.database import engine
+from services.locations import normalize_code
+from services.occupancy import refresh_bins
+from services import data_version
 
 router = APIRouter(prefix="/locations", tags=["Locations"])
 
@@ -17,13 +20,18 @@ def set_pallet_capacity(data: dict):
         updated_at = NOW();
     """
 
+    location_code = normalize_code(data["location_code"])
+
     with engine.begin() as conn:
         conn.execute(
             text(query),
             {
-                "location_code": data["location_code"],
+                "location_code": location_code,
                 "capacity": data["max_cartons"],
             },
         )
+        refresh_bins(conn, [location_code])
+
+    data_version.bump(data_version.STOCK, data_version.CAPACITY)
 
     return {"status": "saved"}
\ No newline at end of file
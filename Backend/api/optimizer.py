@@ -1,40 +1,71 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
 from sqlalchemy import text
 from db.database import engine
-from collections import defaultdict
+import base64
+import json
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES, normalize_code
+from services.occupancy import refresh_bins, refresh_bins_for_skus
+from services.capacity import DEFAULT_BIN_CAPACITY
+from services import data_version, facets
+from services.consolidation import MERGE_THRESHOLD, load_bins, plan_consolidation
+from services.slotting import load_slotting_data, recommend
+from services.routing import load_candidates, allocate, route
 
 router = APIRouter(prefix="/optimizer", tags=["Optimizer"])
 
-ALLOWED_AISLES = ["P", "Q", "R", "S", "T"]
+MAX_PAGE_SIZE = 1000
+MAX_PICK_LINES = 2000
+
+# sort name -> (SQL expression, cursor cast type, default order)
+SORT_KEYS = {
+    "location": ("c.location_code", "text", "asc"),
+    "relevance": ("c.score::float8", "float8", "desc"),
+    "occupancy": ("occ.percent", "float8", "asc"),
+    "cartons": ("c.total_cartons", "int", "desc"),
+    "skus": ("COALESCE(b.sku_count, 0)", "int", "desc"),
+}
+
+
+class PickLine(BaseModel):
+    sku: str
+    cartons: int
+
+
+class PickList(BaseModel):
+    lines: list[PickLine]
 
 
 # =====================================================
-# FILTER OPTIONS
+# PAGE CURSOR
 # =====================================================
-@router.get("/filters")
-def get_filters():
+def encode_cursor(sort, order, key, location_code):
+    raw = json.dumps({"s": sort, "o": order, "k": key, "l": location_code})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    with engine.begin() as conn:
 
-        categories = conn.execute(text("""
-            SELECT DISTINCT category
-            FROM products
-            WHERE category IS NOT NULL
-              AND TRIM(category) <> ''
-            ORDER BY category
-        """)).scalars().all()
+def decode_cursor(cursor, sort, order):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        key, location_code = data["k"], data["l"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-        brands = conn.execute(text("""
-            SELECT DISTINCT brand
-            FROM products
-            WHERE brand IS NOT NULL
-              AND TRIM(brand) <> ''
-            ORDER BY brand
-        """)).scalars().all()
+    if data.get("s") != sort or data.get("o") != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+
+    return {"key": key, "location_code": location_code}
+
+
+# =====================================================
+# FILTER OPTIONS
+# =====================================================
+@router.get("/filters")
+def get_filters():
 
     return {
-        "categories": categories or [],
-        "brands": brands or [],
+        "categories": facets.values("category"),
+        "brands": facets.values("brand"),
     }
 
 
@@ -47,44 +78,25 @@ def get_flavours(
     category: list[str] | None = Query(None),
 ):
 
-    query = """
-        SELECT DISTINCT product_name
-        FROM products
-        WHERE 1=1
-    """
-
-    params = {}
-
-    if brand:
-
-        brand_conditions = []
-
-        for i, b in enumerate(brand):
-            key = f"brand_{i}"
-            brand_conditions.append(f"brand ILIKE :{key}")
-            params[key] = f"%{b}%"
-
-        query += " AND (" + " OR ".join(brand_conditions) + ")"
-
-
-    if category:
-
-        category_conditions = []
-
-        for i, c in enumerate(category):
-            key = f"cat_{i}"
-            category_conditions.append(f"category ILIKE :{key}")
-            params[key] = f"%{c}%"
-
-        query += " AND (" + " OR ".join(category_conditions) + ")"
-
-
-    query += " ORDER BY product_name"
+    return {
+        "flavours": facets.values("product_name", brand=brand, category=category)
+    }
 
-    with engine.begin() as conn:
-        flavours = conn.execute(text(query), params).scalars().all()
 
-    return {"flavours": flavours or []}
+# =====================================================
+# FACET COUNTS
+# =====================================================
+@router.get("/facets")
+def get_facets(
+    brand: list[str] | None = Query(None),
+    category: list[str] | None = Query(None),
+    flavour: list[str] | None = Query(None),
+):
+    """
+    Brand / category / flavour options with the number of occupied
+    locations each would match under the other current selections.
+    """
+    return facets.facets(brand=brand, category=category, flavour=flavour)
 
 
 # =====================================================
@@ -93,6 +105,9 @@ def get_flavours(
 @router.get("/locations")
 def get_locations(
 
+    request: Request,
+    response: Response,
+
     aisle: str | None = Query(None),
 
     rack: list[str] | None = Query(None),
@@ -105,11 +120,20 @@ def get_locations(
     search: str | None = Query(None),
     pallet_type: str | None = Query(None),
     empty: bool | None = Query(None),
+
+    sort: str | None = Query(None, pattern="^(location|relevance|occupancy|cartons|skus)$"),
+    order: str | None = Query(None, pattern="^(asc|desc)$"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
 ):
 
+    cached = data_version.not_modified(request, response, data_version.STOCK)
+    if cached:
+        return cached
+
     query = """
         SELECT
-            UPPER(ls.location_code) AS location_code,
+            ls.location_code,
             ls.sku,
             p.product_name,
             p.brand,
@@ -120,33 +144,38 @@ def get_locations(
                     THEN 0
                     ELSE ls.units::float / p.units_per_carton
                 END
-            ) AS cartons
+            ) AS cartons,
+            {score} AS score
         FROM location_stock ls
+        JOIN locations l ON l.location_code = ls.location_code
         JOIN products p ON p.sku = ls.sku
-        WHERE 1=1
+        WHERE l.building = :building
     """
 
-    params = {}
+    params = {"building": WAREHOUSE_BUILDING}
+
+    # search relevance of each item (pg_trgm), 0 without a search
+    if search and search.strip():
+        query = query.format(score="""GREATEST(
+            word_similarity(:search_all, p.search_text),
+            word_similarity(:search_all, ls.location_code)
+        )""")
+        params["search_all"] = search.strip()
+    else:
+        query = query.format(score="0::real")
 
     # =====================================================
     # AISLE FILTER
     # =====================================================
     if aisle:
 
-        query += " AND UPPER(ls.location_code) LIKE :aisle"
-        params["aisle"] = f"ELECTRA {aisle.upper()}%"
+        query += " AND l.aisle = :aisle"
+        params["aisle"] = aisle.upper()
 
     else:
 
-        query += """
-            AND (
-                UPPER(ls.location_code) LIKE 'ELECTRA P%' OR
-                UPPER(ls.location_code) LIKE 'ELECTRA Q%' OR
-                UPPER(ls.location_code) LIKE 'ELECTRA R%' OR
-                UPPER(ls.location_code) LIKE 'ELECTRA S%' OR
-                UPPER(ls.location_code) LIKE 'ELECTRA T%'
-            )
-        """
+        query += " AND l.aisle = ANY(:aisles)"
+        params["aisles"] = ALLOWED_AISLES
 
 
     # =====================================================
@@ -154,14 +183,8 @@ def get_locations(
     # =====================================================
     if rack:
 
-        rack_conditions = []
-
-        for i, r in enumerate(rack):
-            key = f"rack_{i}"
-            rack_conditions.append(f"UPPER(ls.location_code) LIKE :{key}")
-            params[key] = f"%{r}-%"
-
-        query += " AND (" + " OR ".join(rack_conditions) + ")"
+        query += " AND l.rack = ANY(:racks)"
+        params["racks"] = [int(r) for r in rack if str(r).strip().isdigit()]
 
 
     # =====================================================
@@ -169,14 +192,8 @@ def get_locations(
     # =====================================================
     if shelf:
 
-        shelf_conditions = []
-
-        for i, s in enumerate(shelf):
-            key = f"shelf_{i}"
-            shelf_conditions.append(f"UPPER(ls.location_code) LIKE :{key}")
-            params[key] = f"%-{s.upper()}%"
-
-        query += " AND (" + " OR ".join(shelf_conditions) + ")"
+        query += " AND l.shelf = ANY(:shelves)"
+        params["shelves"] = [s.strip().upper() for s in shelf]
 
 
     # =====================================================
@@ -227,6 +244,8 @@ def get_locations(
     # =====================================================
     # SMART SEARCH
     # =====================================================
+    # every word must appear in the SKU / product name or in the
+    # location code; each side is answered from its trigram index
     if search:
 
         words = search.strip().split()
@@ -237,158 +256,270 @@ def get_locations(
 
             query += f"""
                 AND (
-                    ls.sku ILIKE :{key}
-                    OR p.product_name ILIKE :{key}
-                    OR ls.location_code ILIKE :{key}
+                    ls.sku IN (
+                        SELECT sku FROM products
+                        WHERE search_text ILIKE :{key}
+                    )
+                    OR ls.location_code IN (
+                        SELECT location_code FROM locations
+                        WHERE location_code ILIKE :{key}
+                    )
                 )
             """
 
             params[key] = f"%{word}%"
 
 
-    with engine.begin() as conn:
-
-        rows = conn.execute(text(query), params).mappings().all()
-
-        sku_counts = conn.execute(text("""
-            SELECT UPPER(location_code) AS location_code,
-                   COUNT(DISTINCT sku) AS sku_count
-            FROM location_stock
-            GROUP BY location_code
-        """)).mappings().all()
-
-        group_overrides = conn.execute(text("""
-            SELECT brand, category, max_cartons
-            FROM product_group_capacity
-        """)).mappings().all()
-
-        location_overrides = conn.execute(text("""
-            SELECT UPPER(location_code) AS location_code,
-                   max_cartons
-            FROM location_capacity
-        """)).mappings().all()
-
-
-    sku_map = {r["location_code"]: r["sku_count"] for r in sku_counts}
-
-
-    group_map = {
-        (r["brand"].strip().lower(), r["category"].strip().lower()):
-        int(r["max_cartons"])
-        for r in group_overrides
-    }
-
-
-    location_map = {
-        r["location_code"]: int(r["max_cartons"])
-        for r in location_overrides
-    }
-
-
-    grouped = defaultdict(list)
-
-    for row in rows:
-        grouped[row["location_code"]].append(row)
-
-
     # =====================================================
-    # GENERATE EMPTY PALLETS
+    # EMPTY PALLET GRID
     # =====================================================
-    if aisle:
-        aisles_to_generate = [aisle.upper()]
-    else:
-        aisles_to_generate = ALLOWED_AISLES
+    # ELECTRA {aisle}{1-9}-{A-D}{1-3} bins holding no stock at all
+    grid = """
+        SELECT 'ELECTRA ' || a || r || '-' || s || pos AS location_code
+        FROM unnest(CAST(:grid_aisles AS text[])) AS a,
+             generate_series(1, 9) AS r,
+             unnest(ARRAY['A', 'B', 'C', 'D']) AS s,
+             generate_series(1, 3) AS pos
+        WHERE 1=1
+    """
 
+    params["grid_aisles"] = [aisle.upper()] if aisle else ALLOWED_AISLES
 
-    all_locations = set()
+    if rack:
+        grid += " AND r = ANY(:racks)"
 
-    for aisle_letter in aisles_to_generate:
-        for rack_num in range(1, 10):
-            for shelf_letter in ["A", "B", "C", "D"]:
-                for pos in range(1, 4):
+    if shelf:
+        grid += " AND s = ANY(:shelves)"
 
-                    code = f"ELECTRA {aisle_letter}{rack_num}-{shelf_letter}{pos}"
-                    all_locations.add(code)
 
+    # =====================================================
+    # PER-LOCATION TOTALS + CAPACITY
+    # =====================================================
+    candidates = []
+
+    if empty is not True:
+        candidates.append("""
+            SELECT
+                location_code,
+                SUM(cartons)::int AS total_cartons,
+                (ARRAY_AGG(brand ORDER BY product_name, sku))[1] AS brand,
+                (ARRAY_AGG(category ORDER BY product_name, sku))[1] AS category,
+                MAX(score) AS score,
+                json_agg(
+                    json_build_object(
+                        'location_code', location_code,
+                        'sku', sku,
+                        'product_name', product_name,
+                        'brand', brand,
+                        'category', category,
+                        'cartons', cartons
+                    )
+                    ORDER BY product_name, sku
+                ) AS items
+            FROM matched
+            GROUP BY location_code
+        """)
+
+    if empty is not False:
+        candidates.append("""
+            SELECT
+                g.location_code,
+                0 AS total_cartons,
+                NULL::text AS brand,
+                NULL::text AS category,
+                0::real AS score,
+                '[]'::json AS items
+            FROM grid g
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bin_occupancy b
+                WHERE b.location_code = g.location_code
+            )
+        """)
 
-    existing_locations = set(grouped.keys())
+    # =====================================================
+    # SORT
+    # =====================================================
+    # default: best search matches first, else by location
+    sort = sort or ("relevance" if search and search.strip() else "location")
+    order = order or SORT_KEYS[sort][2]
+
+    key, key_type, _ = SORT_KEYS[sort]
+    direction = "DESC" if order == "desc" else "ASC"
+
+    final = f"""
+        WITH matched AS ({query}),
+        grid AS ({grid}),
+        candidates AS (
+            {" UNION ALL ".join(candidates)}
+        )
+        SELECT
+            c.location_code,
+            c.total_cartons,
+            cap.capacity AS max_cartons,
+            cap.source AS capacity_source,
+            occ.percent AS occupancy_percent,
+            COALESCE(b.sku_count, 0) > 1 AS is_mixed,
+            occ.percent < 60 AS needs_merge,
+            json_array_length(c.items) = 0 AS is_empty,
+            c.items,
+            {key} AS sort_key
+        FROM candidates c
+        LEFT JOIN bin_occupancy b ON b.location_code = c.location_code
+        LEFT JOIN location_capacity lc ON lc.location_code = c.location_code
+        LEFT JOIN product_group_capacity g
+            ON LOWER(TRIM(g.brand)) = LOWER(TRIM(c.brand))
+           AND LOWER(TRIM(g.category)) = LOWER(TRIM(c.category))
+        CROSS JOIN LATERAL (
+            SELECT
+                COALESCE(lc.max_cartons, g.max_cartons, :default_capacity) AS capacity,
+                CASE
+                    WHEN lc.max_cartons IS NOT NULL THEN 'location-override'
+                    WHEN g.max_cartons IS NOT NULL THEN 'group-override'
+                    ELSE 'default'
+                END AS source
+        ) cap
+        CROSS JOIN LATERAL (
+            SELECT
+                CASE
+                    WHEN cap.capacity <> 0
+                    THEN ROUND(c.total_cartons * 100.0 / cap.capacity, 1)::float
+                    ELSE 0
+                END AS percent
+        ) occ
+        WHERE 1=1
+    """
 
-    for loc in all_locations - existing_locations:
-        grouped[loc] = []
+    params["default_capacity"] = DEFAULT_BIN_CAPACITY
 
+    if pallet_type == "mixed":
+        final += " AND COALESCE(b.sku_count, 0) > 1"
 
-    result = []
+    if pallet_type == "single":
+        final += " AND COALESCE(b.sku_count, 0) <= 1"
 
-    for location_code, items in grouped.items():
+    # =====================================================
+    # KEYSET PAGE
+    # =====================================================
+    if cursor:
+        after = decode_cursor(cursor, sort, order)
 
-        total_cartons = sum(int(i["cartons"] or 0) for i in items) if items else 0
+        final += f"""
+            AND ({key}, c.location_code) {"<" if order == "desc" else ">"}
+                (CAST(:cursor_key AS {key_type}), :cursor_location)
+        """
+        params["cursor_key"] = after["key"]
+        params["cursor_location"] = after["location_code"]
 
-        if empty is True and items:
-            continue
+    final += f" ORDER BY {key} {direction}, c.location_code {direction}"
 
-        if empty is False and not items:
-            continue
+    if limit:
+        final += " LIMIT :limit"
+        params["limit"] = limit + 1
 
+    with engine.begin() as conn:
+        rows = [dict(row) for row in conn.execute(text(final), params).mappings().all()]
 
-        sku_count = sku_map.get(location_code, 0)
-        is_mixed = sku_count > 1
+    next_cursor = None
 
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, order, rows[-1]["sort_key"], rows[-1]["location_code"])
 
-        if items:
-            brand_val = items[0]["brand"].strip().lower()
-            category_val = items[0]["category"].strip().lower()
-        else:
-            brand_val = ""
-            category_val = ""
+    for row in rows:
+        row.pop("sort_key")
 
+    # no limit: the whole list, as before
+    if not limit:
+        return rows
 
-        # =====================================================
-        # CAPACITY PRIORITY
-        # =====================================================
-        if location_code in location_map:
+    return {"items": rows, "next_cursor": next_cursor}
 
-            capacity = location_map[location_code]
-            source = "location-override"
 
-        elif (brand_val, category_val) in group_map:
+# =====================================================
+# CONSOLIDATION PLAN
+# =====================================================
+@router.get("/consolidation")
+def get_consolidation(
+    aisle: str | None = None,
+    threshold: int = Query(MERGE_THRESHOLD, ge=1, le=100),
+    allow_mixed: bool = False,
+    same_aisle: bool = False,
+):
+    """
+    Merge plan for under-filled bins. Each step's `moves` can be posted
+    to /scanner/move as-is, in order.
+    """
+    if aisle and aisle.upper() not in ALLOWED_AISLES:
+        raise HTTPException(status_code=400, detail="Invalid aisle")
 
-            capacity = group_map[(brand_val, category_val)]
-            source = "group-override"
+    with engine.begin() as conn:
+        bins = load_bins(conn, aisle)
 
-        else:
+    return plan_consolidation(
+        bins,
+        threshold=threshold,
+        allow_mixed=allow_mixed,
+        same_aisle=same_aisle,
+    )
 
-            capacity = 30
-            source = "default"
 
+# =====================================================
+# SLOTTING
+# =====================================================
+@router.get("/slotting")
+def get_slotting(limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    ABC velocity bands from the last /purchase/analyze run and a ranked
+    list of relocations moving fast movers into the most accessible bins.
+    """
+    with engine.begin() as conn:
+        slots, stock, velocity = load_slotting_data(conn)
 
-        occupancy = round((total_cartons / capacity) * 100, 1) if capacity else 0
+    if velocity.empty:
+        raise HTTPException(
+            status_code=400,
+            detail="No sales velocity yet, run a purchase analysis first"
+        )
 
+    return recommend(slots, stock, velocity, limit=limit)
 
-        if pallet_type == "mixed" and not is_mixed:
-            continue
 
-        if pallet_type == "single" and is_mixed:
-            continue
+# =====================================================
+# PICK ROUTE
+# =====================================================
+@router.post("/pick-route")
+def pick_route(data: PickList):
+    """
+    Resolve each pick line to stocked locations and return them in walk
+    order (S-shape / nearest neighbour start, improved with 2-opt).
+    """
+    lines = [
+        {"sku": line.sku.strip(), "cartons": line.cartons}
+        for line in data.lines
+    ]
 
+    if not lines:
+        raise HTTPException(status_code=400, detail="Pick list is empty")
 
-        result.append({
+    if len(lines) > MAX_PICK_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PICK_LINES} lines per pick list")
 
-            "location_code": location_code,
-            "total_cartons": total_cartons,
-            "max_cartons": capacity,
-            "capacity_source": source,
-            "occupancy_percent": occupancy,
-            "is_mixed": is_mixed,
-            "needs_merge": occupancy < 60,
-            "is_empty": len(items) == 0,
-            "items": items,
+    if any(not line["sku"] or line["cartons"] <= 0 for line in lines):
+        raise HTTPException(status_code=400, detail="Each line needs a SKU and cartons > 0")
 
-        })
+    with engine.begin() as conn:
+        candidates, aisle_length = load_candidates(conn, [line["sku"] for line in lines])
 
+    picks, unfulfilled = allocate(lines, candidates, aisle_length)
+    walk, summary = route(picks, candidates, aisle_length)
 
-    result.sort(key=lambda x: x["location_code"])
+    summary["lines"] = len(lines)
 
-    return result
+    return {
+        "route": walk,
+        "unfulfilled": unfulfilled,
+        "summary": summary,
+    }
 
 
 # =====================================================
@@ -407,6 +538,15 @@ def set_group_capacity(data: dict):
             DO UPDATE SET max_cartons = EXCLUDED.max_cartons
         """), data)
 
+        refresh_bins_for_skus(conn, conn.execute(text("""
+            SELECT sku
+            FROM products
+            WHERE LOWER(TRIM(brand)) = LOWER(TRIM(:brand))
+              AND LOWER(TRIM(category)) = LOWER(TRIM(:category))
+        """), data).scalars().all())
+
+    data_version.bump(data_version.STOCK, data_version.CAPACITY)
+
     return {"status": "updated"}
 
 
@@ -416,6 +556,8 @@ def set_group_capacity(data: dict):
 @router.post("/set-location-capacity")
 def set_location_capacity(data: dict):
 
+    location_code = normalize_code(data["location_code"])
+
     with engine.begin() as conn:
 
         conn.execute(text("""
@@ -424,6 +566,10 @@ def set_location_capacity(data: dict):
 
             ON CONFLICT (location_code)
             DO UPDATE SET max_cartons = EXCLUDED.max_cartons
-        """), data)
+        """), {**data, "location_code": location_code})
+
+        refresh_bins(conn, [location_code])
+
+    data_version.bump(data_version.STOCK, data_version.CAPACITY)
 
     return {"status": "updated"}
\ No newline at end of file
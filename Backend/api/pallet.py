@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy import text
-from db.database import engine
+from db.database import engine, run_transaction
 import uuid
+from services.locations import normalize_code, ensure_locations
+from services.occupancy import refresh_bins
+from services.stock_locks import lock_locations
+from services import data_version
 
 router = APIRouter(prefix="/pallet", tags=["Pallet Builder"])
 
@@ -22,6 +26,29 @@ class MovePallet(BaseModel):
     location: str
 
 
+# -------------------------
+# PALLET LOCK
+# -------------------------
+
+def lock_open_pallet(conn, pallet_id):
+    """
+    FOR UPDATE on the pallet row; stored pallets can't change any more.
+    Taken before any stock row so pallet writes lock in one order.
+    """
+    status = conn.execute(text("""
+    SELECT status
+    FROM pallets
+    WHERE pallet_id=:p
+    FOR UPDATE
+    """), {"p": pallet_id}).first()
+
+    if status is None:
+        raise HTTPException(status_code=404, detail="Pallet not found")
+
+    if status[0] == "stored":
+        raise HTTPException(status_code=400, detail="Pallet already stored")
+
+
 # -------------------------
 # CREATE PALLET
 # -------------------------
@@ -38,6 +65,8 @@ def create_pallet():
         VALUES (:pallet,'building')
         """), {"pallet": pallet_id})
 
+    data_version.bump(data_version.PALLETS)
+
     return {"pallet_id": pallet_id}
 
 
@@ -51,7 +80,7 @@ def add_item(data: AddItem):
     if data.cartons <= 0:
         raise HTTPException(status_code=400, detail="Invalid cartons")
 
-    with engine.begin() as conn:
+    def work(conn):
 
         product = conn.execute(text("""
         SELECT product_name
@@ -62,6 +91,9 @@ def add_item(data: AddItem):
         if not product:
             raise HTTPException(status_code=404, detail="SKU not found")
 
+        # holds off a concurrent move until the item is in
+        lock_open_pallet(conn, data.pallet_id)
+
         conn.execute(text("""
         INSERT INTO pallet_items (pallet_id,sku,cartons)
         VALUES (:pallet,:sku,:cartons)
@@ -73,6 +105,10 @@ def add_item(data: AddItem):
             "cartons": data.cartons
         })
 
+    run_transaction(work)
+
+    data_version.bump(data_version.PALLETS)
+
     return {"status": "added"}
 
 
@@ -83,7 +119,9 @@ def add_item(data: AddItem):
 @router.post("/verify/{pallet_id}")
 def verify_pallet(pallet_id: str):
 
-    with engine.begin() as conn:
+    def work(conn):
+
+        lock_open_pallet(conn, pallet_id)
 
         conn.execute(text("""
         UPDATE pallets
@@ -91,6 +129,10 @@ def verify_pallet(pallet_id: str):
         WHERE pallet_id=:p
         """), {"p": pallet_id})
 
+    run_transaction(work)
+
+    data_version.bump(data_version.PALLETS)
+
     return {"status": "verified"}
 
 
@@ -101,26 +143,32 @@ def verify_pallet(pallet_id: str):
 @router.post("/move")
 def move_pallet(data: MovePallet):
 
-    with engine.begin() as conn:
+    data.location = normalize_code(data.location)
+
+    def work(conn):
+
+        # a pallet is stored once: a second (or concurrent) move of the
+        # same pallet waits here and is then rejected
+        lock_open_pallet(conn, data.pallet_id)
 
         items = conn.execute(text("""
-        SELECT sku, cartons
-        FROM pallet_items
-        WHERE pallet_id=:pallet
+        SELECT pi.sku, pi.cartons, p.units_per_carton
+        FROM pallet_items pi
+        LEFT JOIN products p ON p.sku = pi.sku
+        WHERE pi.pallet_id=:pallet
+        ORDER BY pi.sku
         """), {"pallet": data.pallet_id}).mappings().all()
 
         if not items:
             raise HTTPException(status_code=400, detail="Empty pallet")
 
-        for item in items:
+        lock_locations(conn, [data.location])
+
+        ensure_locations(conn, [data.location])
 
-            units_per_carton = conn.execute(text("""
-            SELECT units_per_carton
-            FROM products
-            WHERE sku = :sku
-            """), {"sku": item["sku"]}).scalar()
+        for item in items:
 
-            units = units_per_carton * item["cartons"]
+            units = item["units_per_carton"] * item["cartons"]
 
             conn.execute(text("""
             INSERT INTO location_stock (location_code,sku,units)
@@ -133,12 +181,18 @@ def move_pallet(data: MovePallet):
                 "units": units
             })
 
+        refresh_bins(conn, [data.location])
+
         conn.execute(text("""
         UPDATE pallets
         SET status='stored'
         WHERE pallet_id=:pallet
         """), {"pallet": data.pallet_id})
 
+    run_transaction(work)
+
+    data_version.bump(data_version.STOCK, data_version.PALLETS)
+
     return {"status": "pallet stored"}
 
 
@@ -147,7 +201,11 @@ def move_pallet(data: MovePallet):
 # -------------------------
 
 @router.get("/dashboard")
-def pallet_dashboard():
+def pallet_dashboard(request: Request, response: Response):
+
+    cached = data_version.not_modified(request, response, data_version.PALLETS)
+    if cached:
+        return cached
 
     with engine.begin() as conn:
 
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Query
 from sqlalchemy import text
 from db.database import engine
+from services import jobs
+from services.csv_reader import read_csv
 import pandas as pd
-import io
 import math
 
 router = APIRouter(
@@ -14,6 +15,17 @@ router = APIRouter(
 # Helpers
 # --------------------------------------------------
 
+PO_ALIASES = {
+    "sku": ["sku", "skus"],
+    "qty_outstanding": ["qtyoutstanding", "outstandingqty"],
+}
+
+PO_DTYPES = {
+    "sku": "string",
+    "qty_outstanding": "number",
+}
+
+
 def parse_qty(val):
     """
     Parse quantities like:
@@ -21,49 +33,37 @@ def parse_qty(val):
     1,400
     2,100
     """
-    if val is None:
+    if val is None or pd.isna(val):
         return 0
     try:
-        return int(str(val).replace(",", "").strip())
+        return int(float(str(val).replace(",", "").strip()))
     except Exception:
         return 0
 
 
 def clean_barcode(val):
+    """
+    Barcodes are stored as text now; older uploads saved them
+    through a float and left a trailing ".0".
+    """
     if val is None:
         return None
-    return str(val).replace(".0", "").strip()
+    val = str(val).strip()
+    return val[:-2] if val.endswith(".0") else val
 
 
 # --------------------------------------------------
 # POST /po/labels
 # --------------------------------------------------
 
-@router.post("/labels")
-def generate_labels(file: UploadFile = File(...)):
-
-    df = pd.read_csv(io.StringIO(file.file.read().decode("utf-8")))
-
-    # normalize headers ONLY (do not touch values)
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(" ", "")
-        .str.replace("_", "")
-    )
-
-    # detect required columns
-    sku_col = None
-    qty_col = None
-
-    for c in df.columns:
-        if c in ["sku", "skus"]:
-            sku_col = c
-        if c in ["qtyoutstanding", "outstandingqty"]:
-            qty_col = c
-
-    if not sku_col or not qty_col:
+def build_labels(job_id, fileobj):
+
+    df = read_csv(fileobj, aliases=PO_ALIASES, dtypes=PO_DTYPES)
+
+    sku_col = "sku"
+    qty_col = "qty_outstanding"
+
+    if sku_col not in df.columns or qty_col not in df.columns:
         return {
             "error": "CSV must contain SKU and Qty Outstanding",
             "columns_found": list(df.columns),
@@ -128,4 +128,17 @@ def generate_labels(file: UploadFile = File(...)):
     return {
         "total_rows": len(df),
         "labels": results,
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/labels")
+def generate_labels(
+    file: UploadFile = File(...),
+    background: bool = Query(False),
+):
+
+    if background:
+        job_id = jobs.submit("po-labels", build_labels, uploads=[file])
+        return {"status": "queued", "job_id": job_id}
+
+    return build_labels(None, file.file)
@@ -1,47 +1,30 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from db.database import engine
+from services import jobs
+from services.csv_reader import read_csv
+from services.slotting import store_velocity
 import pandas as pd
 import numpy as np
 
 router = APIRouter(prefix="/purchase", tags=["Purchase Analysis"])
 
 
-@router.post("/analyze")
-async def analyze_purchase(
-    sales_file: UploadFile | None = File(None),
-    stock_file: UploadFile | None = File(None),
-    supplier_file: UploadFile | None = File(None)
-):
-    try:
+NUMERIC_DTYPES = {
+    "qty_sold": "number",
+    "current_stock": "number",
+    "lead_time_days": "number",
+    "moq": "number",
+    "unit_cost": "number",
+    "safety_stock": "number",
+}
 
-        # ===============================
-        # FILE VALIDATION
-        # ===============================
-        if not sales_file or not stock_file or not supplier_file:
-            raise HTTPException(
-                status_code=400,
-                detail="All three files (sales, stock, supplier) are required"
-            )
 
-        # ===============================
-        # READ FILES SAFELY
-        # ===============================
-        def safe_read(file):
-            try:
-                return pd.read_csv(file.file)
-            except:
-                file.file.seek(0)
-                return pd.read_csv(file.file, encoding="latin1")
-
-        sales_df = safe_read(sales_file)
-        stock_df = safe_read(stock_file)
-        supplier_df = safe_read(supplier_file)
+def run_analysis(job_id, sales_file, stock_file, supplier_file):
+    try:
 
-        # ===============================
-        # CLEAN COLUMN NAMES
-        # ===============================
-        sales_df.columns = sales_df.columns.str.strip().str.lower()
-        stock_df.columns = stock_df.columns.str.strip().str.lower()
-        supplier_df.columns = supplier_df.columns.str.strip().str.lower()
+        sales_df = read_csv(sales_file, dtypes=NUMERIC_DTYPES)
+        stock_df = read_csv(stock_file, dtypes=NUMERIC_DTYPES)
+        supplier_df = read_csv(supplier_file, dtypes=NUMERIC_DTYPES)
 
         # ===============================
         # REQUIRED COLUMNS
@@ -81,6 +64,8 @@ async def analyze_purchase(
         )
 
         avg_sales["avg_daily_sales"] = avg_sales["qty_sold"] / total_days
+
+        velocity = avg_sales
         avg_sales = avg_sales[["sku", "avg_daily_sales"]]
 
         # ===============================
@@ -163,10 +148,43 @@ async def analyze_purchase(
         ]]
 
         result = result.replace([np.inf, -np.inf], 0).fillna(0)
+        records = result.to_dict(orient="records")
+
+        # keep the velocity for the slotting recommender, only once the
+        # whole analysis has gone through
+        with engine.begin() as conn:
+            store_velocity(conn, velocity, sales_df["date"].min(), sales_df["date"].max())
 
-        return result.to_dict(orient="records")
+        return records
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze")
+def analyze_purchase(
+    sales_file: UploadFile | None = File(None),
+    stock_file: UploadFile | None = File(None),
+    supplier_file: UploadFile | None = File(None),
+    background: bool = Query(False),
+):
+
+    # ===============================
+    # FILE VALIDATION
+    # ===============================
+    if not sales_file or not stock_file or not supplier_file:
+        raise HTTPException(
+            status_code=400,
+            detail="All three files (sales, stock, supplier) are required"
+        )
+
+    if background:
+        job_id = jobs.submit(
+            "purchase-analysis", run_analysis,
+            uploads=[sales_file, stock_file, supplier_file]
+        )
+        return {"status": "queued", "job_id": job_id}
+
+    return run_analysis(None, sales_file.file, stock_file.file, supplier_file.file)
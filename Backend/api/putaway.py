@@ -0,0 +1,75 @@
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import text
+from db.database import engine
+from services.locations import ALLOWED_AISLES
+from services import putaway
+
+router = APIRouter(prefix="/putaway", tags=["Putaway"])
+
+MAX_SUGGESTIONS = 50
+
+
+# ------------------------------------------------
+# SUGGEST DESTINATION
+# ------------------------------------------------
+@router.get("/suggest")
+def suggest_destination(
+    pallet_id: str | None = None,
+    sku: str | None = None,
+    cartons: int | None = Query(None, ge=1),
+    aisle: str | None = None,
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+):
+    """
+    Best bins for a pallet (all its items) or for `cartons` of one SKU,
+    ranked by same-SKU co-location, aisle preference and fit.
+    """
+    if aisle:
+        aisle = aisle.strip().upper()
+        if aisle not in ALLOWED_AISLES:
+            raise HTTPException(status_code=400, detail="Invalid aisle")
+
+    with engine.begin() as conn:
+
+        if pallet_id:
+            items = conn.execute(text("""
+                SELECT pi.sku, pi.cartons, p.brand, p.category
+                FROM pallet_items pi
+                LEFT JOIN products p ON p.sku = pi.sku
+                WHERE pi.pallet_id = :pallet
+                ORDER BY p.product_name, pi.sku
+            """), {"pallet": pallet_id}).mappings().all()
+
+            if not items:
+                raise HTTPException(status_code=400, detail="Empty pallet")
+
+            skus = [item["sku"] for item in items]
+            need = sum(item["cartons"] for item in items)
+            product = items[0]
+
+        elif sku and cartons:
+            sku = sku.strip()
+
+            product = conn.execute(text("""
+                SELECT brand, category
+                FROM products
+                WHERE sku = :sku
+            """), {"sku": sku}).mappings().first()
+
+            if not product:
+                raise HTTPException(status_code=404, detail="SKU not found")
+
+            skus = [sku]
+            need = cartons
+
+        else:
+            raise HTTPException(status_code=400, detail="Give a pallet_id, or a sku and cartons")
+
+    return putaway.suggest(
+        skus,
+        need,
+        brand=product["brand"],
+        category=product["category"],
+        aisle=aisle,
+        limit=limit,
+    )
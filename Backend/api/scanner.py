@@ -1,10 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from sqlalchemy import text
-from db.database import engine
+from db.database import engine, run_transaction
+import uuid
+from services.locations import normalize_code, ensure_locations
+from services.occupancy import refresh_bins
+from services.bulk_ingest import create_staging_table
+from services.stock_locks import lock_locations, stock_exists
+from services import data_version
 
 router = APIRouter(prefix="/scanner", tags=["Scanner"])
 
+MAX_BATCH_MOVES = 1000
+
 
 # ------------------------------------------------
 # MODELS
@@ -18,6 +26,10 @@ class MoveRequest(BaseModel):
     user_name: str | None = "scanner"
 
 
+class MoveBatchRequest(BaseModel):
+    moves: list[MoveRequest]
+
+
 class RemoveRequest(BaseModel):
     sku: str
     location: str
@@ -36,6 +48,8 @@ class SwapRequest(BaseModel):
 @router.get("/location/{location_code}")
 def get_location(location_code: str):
 
+    location_code = normalize_code(location_code)
+
     with engine.begin() as conn:
 
         rows = conn.execute(text("""
@@ -47,7 +61,7 @@ def get_location(location_code: str):
                 p.units_per_carton
             FROM location_stock ls
             JOIN products p ON p.sku = ls.sku
-            WHERE UPPER(ls.location_code) = UPPER(:loc)
+            WHERE ls.location_code = :loc
         """), {"loc": location_code}).mappings().all()
 
         if not rows:
@@ -88,10 +102,15 @@ def move_stock(data: MoveRequest):
     if data.cartons <= 0:
         raise HTTPException(status_code=400, detail="Invalid carton quantity")
 
-    if data.from_location.upper() == data.to_location.upper():
+    # same normalisation as each line of /move-batch
+    data.sku = data.sku.strip()
+    data.from_location = normalize_code(data.from_location)
+    data.to_location = normalize_code(data.to_location)
+
+    if data.from_location == data.to_location:
         raise HTTPException(status_code=400, detail="Source and destination cannot be the same")
 
-    with engine.begin() as conn:
+    def work(conn):
 
         product = conn.execute(text("""
             SELECT units_per_carton, product_name
@@ -105,35 +124,28 @@ def move_stock(data: MoveRequest):
         units_per_carton = product["units_per_carton"]
         units_to_move = units_per_carton * data.cartons
 
+        lock_locations(conn, [data.from_location, data.to_location])
 
-        source = conn.execute(text("""
-            SELECT units
-            FROM location_stock
-            WHERE location_code = :loc
-            AND sku = :sku
-        """), {
-            "loc": data.from_location,
-            "sku": data.sku
-        }).mappings().first()
-
-        if not source:
-            raise HTTPException(status_code=400, detail="SKU not in source")
-
-        if source["units"] < units_to_move:
-            raise HTTPException(status_code=400, detail="Not enough stock")
-
-
-        conn.execute(text("""
+        # conditional: never takes the source below zero
+        moved = conn.execute(text("""
             UPDATE location_stock
             SET units = units - :u
             WHERE location_code = :loc
             AND sku = :sku
+            AND units >= :u
+            RETURNING units
         """), {
             "u": units_to_move,
             "loc": data.from_location,
             "sku": data.sku
-        })
+        }).first()
+
+        if moved is None:
+            if not stock_exists(conn, data.from_location, data.sku):
+                raise HTTPException(status_code=400, detail="SKU not in source")
+            raise HTTPException(status_code=400, detail="Not enough stock")
 
+        ensure_locations(conn, [data.to_location])
 
         conn.execute(text("""
             INSERT INTO location_stock(location_code,sku,units)
@@ -162,9 +174,204 @@ def move_stock(data: MoveRequest):
             "u": data.user_name
         })
 
+        refresh_bins(conn, [data.from_location, data.to_location])
+
+    run_transaction(work)
+
+    data_version.bump(data_version.STOCK)
+
     return {"status": "success"}
     
 
+# ------------------------------------------------
+# MOVE STOCK (BATCH)
+# ------------------------------------------------
+
+# Running balance of every (location, sku) a batch touches, line by
+# line, so chained moves (A -> B, then B -> C) validate in order.
+BATCH_CHECK = """
+WITH lines AS (
+    SELECT
+        m.line,
+        m.sku,
+        m.from_location,
+        m.to_location,
+        p.sku IS NOT NULL AS known,
+        m.cartons * COALESCE(p.units_per_carton, 0) AS units
+    FROM move_batch m
+    LEFT JOIN products p ON p.sku = m.sku
+),
+events AS (
+    SELECT line, sku, from_location AS location_code, -units AS delta, 0 AS leg
+    FROM lines
+    WHERE known
+    UNION ALL
+    SELECT line, sku, to_location, units, 1
+    FROM lines
+    WHERE known
+),
+running AS (
+    SELECT
+        e.line,
+        e.leg,
+        ls.location_code IS NOT NULL
+            OR COUNT(*) FILTER (WHERE e.leg = 1) OVER w > 0 AS present,
+        COALESCE(ls.units, 0) + SUM(e.delta) OVER w AS balance
+    FROM events e
+    LEFT JOIN location_stock ls
+        ON ls.location_code = e.location_code
+       AND ls.sku = e.sku
+    WINDOW w AS (
+        PARTITION BY e.location_code, e.sku
+        ORDER BY e.line, e.leg
+        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    )
+)
+SELECT
+    l.line,
+    l.known,
+    l.units,
+    r.present,
+    r.balance
+FROM lines l
+LEFT JOIN running r ON r.line = l.line AND r.leg = 0
+ORDER BY l.line
+"""
+
+
+@router.post("/move-batch")
+def move_stock_batch(data: MoveBatchRequest):
+    """
+    Apply many scanner moves in one transaction. Lines run in order, so
+    later lines may move stock that earlier lines brought in. Any bad
+    line rejects the whole batch (400, per-line results in detail).
+    """
+    if not data.moves:
+        raise HTTPException(status_code=400, detail="No moves")
+
+    if len(data.moves) > MAX_BATCH_MOVES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_MOVES} moves per batch")
+
+    results = []
+
+    for line, move in enumerate(data.moves, start=1):
+        move.sku = move.sku.strip()
+        move.from_location = normalize_code(move.from_location)
+        move.to_location = normalize_code(move.to_location)
+
+        error = None
+        if move.cartons <= 0:
+            error = "Invalid carton quantity"
+        elif move.from_location == move.to_location:
+            error = "Source and destination cannot be the same"
+
+        results.append({
+            "line": line,
+            "sku": move.sku,
+            "from_location": move.from_location,
+            "to_location": move.to_location,
+            "cartons": move.cartons,
+            "status": "error" if error else "ok",
+            "detail": error,
+        })
+
+    valid = [(r["line"], move) for r, move in zip(results, data.moves) if r["status"] == "ok"]
+
+    def work(conn):
+
+        create_staging_table(conn, "move_batch", {
+            "line": "INTEGER",
+            "sku": "TEXT",
+            "from_location": "TEXT",
+            "to_location": "TEXT",
+            "cartons": "INTEGER",
+            "user_name": "TEXT",
+        })
+
+        conn.execute(text("""
+            INSERT INTO move_batch (line, sku, from_location, to_location, cartons, user_name)
+            SELECT *
+            FROM unnest(
+                CAST(:lines AS int[]),
+                CAST(:skus AS text[]),
+                CAST(:froms AS text[]),
+                CAST(:tos AS text[]),
+                CAST(:cartons AS int[]),
+                CAST(:users AS text[])
+            )
+        """), {
+            "lines": [line for line, _ in valid],
+            "skus": [m.sku for _, m in valid],
+            "froms": [m.from_location for _, m in valid],
+            "tos": [m.to_location for _, m in valid],
+            "cartons": [m.cartons for _, m in valid],
+            "users": [m.user_name for _, m in valid],
+        })
+
+        lock_locations(
+            conn,
+            [m.from_location for _, m in valid] + [m.to_location for _, m in valid]
+        )
+
+        checks = conn.execute(text(BATCH_CHECK)).mappings().all()
+
+        for check in checks:
+            r = results[check["line"] - 1]
+            r["units"] = check["units"]
+
+            if not check["known"]:
+                r["status"], r["detail"] = "error", "SKU not found"
+            elif not check["present"]:
+                r["status"], r["detail"] = "error", "SKU not in source"
+            elif check["balance"] < 0:
+                r["status"], r["detail"] = "error", "Not enough stock"
+
+        failed = [r for r in results if r["status"] != "ok"]
+
+        if failed:
+            raise HTTPException(status_code=400, detail={
+                "message": f"{len(failed)} of {len(results)} moves invalid, nothing applied",
+                "results": results,
+            })
+
+        ensure_locations(conn, [m.to_location for _, m in valid])
+
+        conn.execute(text("""
+            INSERT INTO location_stock (location_code, sku, units)
+            SELECT location_code, sku, SUM(delta)
+            FROM (
+                SELECT m.from_location AS location_code, m.sku, -m.cartons * p.units_per_carton AS delta
+                FROM move_batch m
+                JOIN products p ON p.sku = m.sku
+                UNION ALL
+                SELECT m.to_location, m.sku, m.cartons * p.units_per_carton
+                FROM move_batch m
+                JOIN products p ON p.sku = m.sku
+            ) d
+            GROUP BY location_code, sku
+            ON CONFLICT (location_code, sku)
+            DO UPDATE SET units = location_stock.units + EXCLUDED.units
+        """))
+
+        conn.execute(text("""
+            INSERT INTO stock_movements (sku, from_location, to_location, cartons, user_name)
+            SELECT sku, from_location, to_location, cartons, user_name
+            FROM move_batch
+            ORDER BY line
+        """))
+
+        refresh_bins(
+            conn,
+            [m.from_location for _, m in valid] + [m.to_location for _, m in valid]
+        )
+
+    run_transaction(work)
+
+    data_version.bump(data_version.STOCK)
+
+    return {"status": "success", "moved": len(results), "results": results}
+
+
 # ------------------------------------------------
 # REMOVE STOCK
 # ------------------------------------------------
@@ -175,7 +382,10 @@ def remove_stock(data: RemoveRequest):
     if data.cartons <= 0:
         raise HTTPException(status_code=400, detail="Invalid quantity")
 
-    with engine.begin() as conn:
+    data.sku = data.sku.strip()
+    data.location = normalize_code(data.location)
+
+    def work(conn):
 
         product = conn.execute(text("""
             SELECT units_per_carton
@@ -183,18 +393,36 @@ def remove_stock(data: RemoveRequest):
             WHERE sku = :sku
         """), {"sku": data.sku}).scalar()
 
+        if product is None:
+            raise HTTPException(status_code=404, detail="SKU not found")
+
         units = product * data.cartons
 
-        conn.execute(text("""
+        lock_locations(conn, [data.location])
+
+        removed = conn.execute(text("""
             UPDATE location_stock
             SET units = units - :u
             WHERE location_code = :loc
             AND sku = :sku
+            AND units >= :u
+            RETURNING units
         """), {
             "u": units,
             "loc": data.location,
             "sku": data.sku
-        })
+        }).first()
+
+        if removed is None:
+            if not stock_exists(conn, data.location, data.sku):
+                raise HTTPException(status_code=400, detail="SKU not in location")
+            raise HTTPException(status_code=400, detail="Not enough stock")
+
+        refresh_bins(conn, [data.location])
+
+    run_transaction(work)
+
+    data_version.bump(data_version.STOCK)
 
     return {"status": "removed"}
 
@@ -206,13 +434,27 @@ def remove_stock(data: RemoveRequest):
 @router.post("/swap")
 def swap_locations(data: SwapRequest):
 
-    with engine.begin() as conn:
+    data.location_a = normalize_code(data.location_a)
+    data.location_b = normalize_code(data.location_b)
+
+    if data.location_a == data.location_b:
+        raise HTTPException(status_code=400, detail="Cannot swap a location with itself")
+
+    # parking code private to this transaction, so concurrent swaps
+    # holding the same SKU can't collide on it
+    parking = f"TEMP-{uuid.uuid4().hex}"
+
+    def work(conn):
+
+        lock_locations(conn, [data.location_a, data.location_b])
+
+        ensure_locations(conn, [data.location_a, data.location_b])
 
         conn.execute(text("""
             UPDATE location_stock
-            SET location_code = 'TEMP'
+            SET location_code = :temp
             WHERE location_code = :a
-        """), {"a": data.location_a})
+        """), {"a": data.location_a, "temp": parking})
 
         conn.execute(text("""
             UPDATE location_stock
@@ -223,7 +465,13 @@ def swap_locations(data: SwapRequest):
         conn.execute(text("""
             UPDATE location_stock
             SET location_code = :b
-            WHERE location_code = 'TEMP'
-        """), {"b": data.location_b})
+            WHERE location_code = :temp
+        """), {"b": data.location_b, "temp": parking})
+
+        refresh_bins(conn, [data.location_a, data.location_b])
+
+    run_transaction(work)
+
+    data_version.bump(data_version.STOCK)
 
     return {"status": "swapped"}
\ No newline at end of file
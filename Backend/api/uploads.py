@@ -1,207 +1,616 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from sqlalchemy import text
 from db.database import engine
+from services.bulk_ingest import create_staging_table, copy_dataframe, LoadTimer
+from services.location_snapshot import normalize_location_rows
+from services.csv_reader import iter_csv
+from services.locations import (
+    export_location_rows,
+    ensure_locations,
+    MERGE_LOCATIONS,
+    CODE_PATTERN,
+    LOCATION_COLUMNS as LOCATION_MASTER_COLUMNS,
+)
+from services.occupancy import refresh_bins, refresh_bins_for_skus
+from services.snapshot_swap import (
+    create_shadow_table,
+    build_shadow_indexes,
+    swap_shadow_table,
+)
+from services import progress, jobs, data_version
 import pandas as pd
-import io
+import uuid
 from datetime import datetime
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
+# Bytes per CSV block. Each block is normalized and COPY'd before the
+# next one is read, so memory stays bounded by the block size.
+DEFAULT_CHUNK_KB = 4096
+
+PRODUCT_ALIASES = {
+    "sku": ["sku"],
+    "product_name": ["product name"],
+    "category": ["category"],
+    "units_per_carton": ["hidden carton qty"],
+    "unit_barcode": ["hidden barcode unit"],
+    "carton_barcode": ["hidden barcode carton"],
+    "outer_barcode": ["hidden barcode outer"],
+}
+
+PRODUCT_DTYPES = {
+    "sku": "string",
+    "product_name": "string",
+    "category": "category",
+    "units_per_carton": "number",
+    "unit_barcode": "string",
+    "carton_barcode": "string",
+    "outer_barcode": "string",
+}
+
+LOCATION_ALIASES = {
+    "location": ["location"],
+    "skus": ["sku(s)", "skus"],
+    "qty": ["qty"],
+    "building": ["building"],
+    "aisle": ["aisle"],
+    "rack": ["rack"],
+    "shelf": ["shelf"],
+    "bin": ["bin"],
+}
+
+LOCATION_DTYPES = {
+    "location": "category",
+    "skus": "string",
+    "qty": "string",
+    "building": "category",
+    "aisle": "category",
+    "shelf": "category",
+}
+
 
 # -------------------------------------------------
-# SAFE INTEGER
+# NORMALIZE PRODUCT CHUNK
 # -------------------------------------------------
-def safe_int(value):
-    try:
-        if value in ["", "-", "nan", None]:
-            return 0
-        return int(float(str(value).strip()))
-    except:
-        return 0
+def normalize_product_rows(products):
+
+    products = products.dropna(
+        subset=["sku", "product_name", "units_per_carton"]
+    ).copy()
+
+    products["units_per_carton"] = products["units_per_carton"].round().astype("int64")
+
+    products["sku"] = products["sku"].str.strip()
+
+    # Optional columns
+    for optional in [
+        "category",
+        "unit_barcode",
+        "carton_barcode",
+        "outer_barcode"
+    ]:
+        if optional not in products.columns:
+            products[optional] = None
+
+    return products.drop_duplicates(subset=["sku"])
 
 
 # -------------------------------------------------
-# AUTO MAP COLUMN
+# PRODUCT ROW FINGERPRINT
 # -------------------------------------------------
-def auto_map_column(df, expected_name):
-    for col in df.columns:
-        if expected_name in col:
-            df.rename(columns={col: expected_name}, inplace=True)
-            return
+HASH_COLUMNS = [
+    "product_name",
+    "category",
+    "units_per_carton",
+    "unit_barcode",
+    "carton_barcode",
+    "outer_barcode"
+]
+
+
+def product_row_hash(products):
+    """
+    64-bit hash of the product master columns, one per row.
+    Stored in products.row_hash to skip unchanged SKUs.
+    """
+    values = products[HASH_COLUMNS].astype("string").fillna("")
+
+    return pd.util.hash_pandas_object(values, index=False).to_numpy().view("int64")
+
+
+def load_product_hashes(conn):
+    rows = conn.execute(text("SELECT sku, row_hash FROM products")).all()
+    return pd.Series(dict(rows), dtype="Int64")
+
+
+def file_size(fileobj):
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def read_upload_chunks(fileobj, upload_id, chunk_kb, aliases, dtypes, required):
+    """
+    Yield DataFrame blocks of the uploaded CSV and record
+    bytes/rows read for the progress endpoint.
+    """
+    rows_read = 0
+
+    try:
+        chunks = iter_csv(
+            fileobj,
+            aliases=aliases,
+            dtypes=dtypes,
+            required=required,
+            block_bytes=chunk_kb * 1024,
+        )
+
+        for chunk in chunks:
+            rows_read += len(chunk)
+            progress.update(
+                upload_id,
+                rows_read=rows_read,
+                bytes_read=fileobj.tell()
+            )
+            yield chunk
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # =================================================
 # 1️⃣ UPLOAD PRODUCT MASTER
 # =================================================
-@router.post("/products")
-async def upload_products(products_file: UploadFile = File(...)):
+PRODUCT_COLUMNS = [
+    "sku",
+    "product_name",
+    "category",
+    "units_per_carton",
+    "unit_barcode",
+    "carton_barcode",
+    "outer_barcode",
+    "row_hash"
+]
+
+# Only changed rows reach the staging table; the WHERE on the update
+# guards against a concurrent upload having written the same content.
+MERGE_PRODUCTS = """
+INSERT INTO products (
+    sku,
+    product_name,
+    category,
+    units_per_carton,
+    unit_barcode,
+    carton_barcode,
+    outer_barcode,
+    row_hash
+)
+SELECT DISTINCT ON (sku)
+    sku,
+    product_name,
+    category,
+    units_per_carton::int,
+    unit_barcode,
+    carton_barcode,
+    outer_barcode,
+    row_hash
+FROM products_staging
+ORDER BY sku, seq
+ON CONFLICT (sku) DO UPDATE SET
+    product_name = EXCLUDED.product_name,
+    category = EXCLUDED.category,
+    units_per_carton = EXCLUDED.units_per_carton,
+    unit_barcode = EXCLUDED.unit_barcode,
+    carton_barcode = EXCLUDED.carton_barcode,
+    outer_barcode = EXCLUDED.outer_barcode,
+    row_hash = EXCLUDED.row_hash
+WHERE products.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+RETURNING sku, (xmax = 0) AS inserted;
+"""
+
+
+def ingest_products(upload_id, fileobj, chunk_kb=DEFAULT_CHUNK_KB):
+
+    progress.start(upload_id, total_bytes=file_size(fileobj))
 
     try:
-        products_df = pd.read_csv(io.BytesIO(await products_file.read()))
-        products_df.columns = products_df.columns.str.strip().str.lower()
+        with LoadTimer() as timer, engine.begin() as conn:
+
+            create_staging_table(conn, "products_staging", {
+                "seq": "BIGSERIAL",
+                "sku": "TEXT",
+                "product_name": "TEXT",
+                "category": "TEXT",
+                "units_per_carton": "NUMERIC",
+                "unit_barcode": "TEXT",
+                "carton_barcode": "TEXT",
+                "outer_barcode": "TEXT",
+                "row_hash": "BIGINT",
+            })
 
-        auto_map_column(products_df, "sku")
-        auto_map_column(products_df, "product name")
-        auto_map_column(products_df, "category")
-        auto_map_column(products_df, "hidden carton qty")
+            stored_hashes = load_product_hashes(conn)
 
-        required = ["sku", "product name", "hidden carton qty"]
+            product_rows = 0
+            rows_loaded = 0
+            seen = set()
 
-        for col in required:
-            if col not in products_df.columns:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required column: {col}"
+            chunks = read_upload_chunks(
+                fileobj, upload_id, chunk_kb,
+                PRODUCT_ALIASES, PRODUCT_DTYPES,
+                required=["sku", "product_name", "units_per_carton"]
+            )
+
+            for chunk in chunks:
+                products = normalize_product_rows(chunk)
+
+                # first occurrence of a SKU wins across chunks
+                products = products[~products["sku"].isin(seen)]
+                seen.update(products["sku"])
+                product_rows += len(products)
+
+                products["row_hash"] = product_row_hash(products)
+
+                stored = stored_hashes.reindex(products["sku"])
+                changed = products[(
+                    stored.isna().to_numpy()
+                    | (stored.fillna(0).to_numpy("int64") != products["row_hash"].to_numpy())
+                )]
+
+                rows_loaded += copy_dataframe(
+                    conn, changed, "products_staging", PRODUCT_COLUMNS
                 )
+                progress.update(upload_id, rows_loaded=rows_loaded)
 
-        products = products_df.dropna(
-            subset=["sku", "product name", "hidden carton qty"]
-        ).copy()
-
-        products["sku"] = products["sku"].astype(str).str.strip()
-
-        products = products.rename(columns={
-            "product name": "product_name",
-            "hidden carton qty": "units_per_carton"
-        })
-
-        # Optional barcode columns
-        for optional in [
-            "hidden barcode unit",
-            "hidden barcode carton",
-            "hidden barcode outer"
-        ]:
-            if optional not in products.columns:
-                products[optional] = None
-
-        products = products.rename(columns={
-            "hidden barcode unit": "unit_barcode",
-            "hidden barcode carton": "carton_barcode",
-            "hidden barcode outer": "outer_barcode"
-        })
-
-        products = products.drop_duplicates(subset=["sku"])
-
-        UPSERT_PRODUCTS = """
-        INSERT INTO products (
-            sku,
-            product_name,
-            category,
-            units_per_carton,
-            unit_barcode,
-            carton_barcode,
-            outer_barcode
-        )
-        VALUES (
-            :sku,
-            :product_name,
-            :category,
-            :units_per_carton,
-            :unit_barcode,
-            :carton_barcode,
-            :outer_barcode
-        )
-        ON CONFLICT (sku) DO UPDATE SET
-            product_name = EXCLUDED.product_name,
-            category = EXCLUDED.category,
-            units_per_carton = EXCLUDED.units_per_carton,
-            unit_barcode = EXCLUDED.unit_barcode,
-            carton_barcode = EXCLUDED.carton_barcode,
-            outer_barcode = EXCLUDED.outer_barcode;
-        """
-
-        with engine.begin() as conn:
-            for _, row in products.iterrows():
-                conn.execute(text(UPSERT_PRODUCTS), row.to_dict())
+            progress.update(upload_id, phase="merging")
+
+            merged = conn.execute(text(MERGE_PRODUCTS)).mappings().all()
+            inserted = sum(1 for row in merged if row["inserted"])
+            updated = len(merged) - inserted
+
+            # carton counts / names shown on the layout page
+            refresh_bins_for_skus(conn, [row["sku"] for row in merged])
 
             conn.execute(text("""
-                INSERT INTO upload_history (product_rows, location_rows, upload_time)
-                VALUES (:p, 0, :t)
+                INSERT INTO upload_history (
+                    product_rows, location_rows, upload_time,
+                    load_mode, rows_inserted, rows_updated
+                )
+                VALUES (:p, 0, :t, 'fingerprint', :ins, :upd)
             """), {
-                "p": len(products),
-                "t": datetime.utcnow()
+                "p": product_rows,
+                "t": datetime.utcnow(),
+                "ins": inserted,
+                "upd": updated
             })
 
+        data_version.bump(data_version.STOCK, data_version.PRODUCTS)
+        progress.finish(upload_id)
+
         return {
             "status": "product master updated",
-            "rows": len(products)
+            "upload_id": upload_id,
+            "rows": product_rows,
+            "inserted": inserted,
+            "updated": updated,
+            "unchanged": product_rows - inserted - updated,
+            **timer.stats(product_rows)
         }
 
+    except HTTPException as e:
+        progress.finish(upload_id, error=str(e.detail))
+        raise e
     except Exception as e:
+        progress.finish(upload_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/products")
+def upload_products(
+    products_file: UploadFile = File(...),
+    upload_id: str | None = Query(None),
+    chunk_kb: int = Query(DEFAULT_CHUNK_KB, ge=64),
+    background: bool = Query(False),
+):
+
+    if background:
+        job_id = jobs.submit(
+            "upload-products", ingest_products, chunk_kb,
+            uploads=[products_file]
+        )
+        return {"status": "queued", "job_id": job_id}
+
+    return ingest_products(
+        upload_id or uuid.uuid4().hex,
+        products_file.file,
+        chunk_kb
+    )
+
+
 # =================================================
 # 2️⃣ UPLOAD LOCATION STOCK (SNAPSHOT)
 # =================================================
-@router.post("/location-stock")
-async def upload_location_stock(location_file: UploadFile = File(...)):
+LOCATION_COLUMNS = ["location_code", "sku", "units"]
+
+MERGE_LOCATION = """
+INSERT INTO location_stock (location_code, sku, units)
+SELECT DISTINCT ON (location_code, sku)
+    location_code, sku, units
+FROM location_staging
+ORDER BY location_code, sku, seq
+ON CONFLICT (location_code, sku)
+DO UPDATE SET units = EXCLUDED.units;
+"""
+
+# Delta mode: only touch rows whose (location_code, sku, units) changed
+INCOMING_LOCATION = """
+CREATE TEMP TABLE location_incoming ON COMMIT DROP AS
+SELECT DISTINCT ON (location_code, sku)
+    location_code, sku, units
+FROM location_staging
+ORDER BY location_code, sku, seq;
+
+ANALYZE location_incoming;
+"""
+
+DELTA_DELETE = """
+DELETE FROM location_stock ls
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM location_incoming i
+    WHERE i.location_code = ls.location_code
+      AND i.sku = ls.sku
+)
+RETURNING ls.location_code;
+"""
+
+DELTA_UPDATE = """
+UPDATE location_stock ls
+SET units = i.units
+FROM location_incoming i
+WHERE i.location_code = ls.location_code
+  AND i.sku = ls.sku
+  AND ls.units IS DISTINCT FROM i.units
+RETURNING ls.location_code;
+"""
+
+DELTA_INSERT = """
+INSERT INTO location_stock (location_code, sku, units)
+SELECT i.location_code, i.sku, i.units
+FROM location_incoming i
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM location_stock ls
+    WHERE ls.location_code = i.location_code
+      AND ls.sku = i.sku
+)
+RETURNING location_code;
+"""
+
+# Swap mode: build the snapshot beside the live table, swap at the end
+SHADOW_LOCATION = """
+INSERT INTO {shadow} (location_code, sku, units)
+SELECT DISTINCT ON (location_code, sku)
+    location_code, sku, units
+FROM location_staging
+ORDER BY location_code, sku, seq;
+"""
+
+
+def apply_location_snapshot(conn):
+    conn.execute(text("TRUNCATE TABLE location_stock"))
+    inserted = conn.execute(text(MERGE_LOCATION)).rowcount
+
+    return {"rows": inserted, "inserted": inserted, "updated": None, "deleted": None}
+
+
+def apply_location_delta(conn):
+    conn.execute(text(INCOMING_LOCATION))
+
+    deleted = conn.execute(text(DELTA_DELETE)).scalars().all()
+    updated = conn.execute(text(DELTA_UPDATE)).scalars().all()
+    inserted = conn.execute(text(DELTA_INSERT)).scalars().all()
+
+    return {
+        "rows": conn.execute(text("SELECT COUNT(*) FROM location_incoming")).scalar(),
+        "deleted": len(deleted),
+        "updated": len(updated),
+        "inserted": len(inserted),
+        # only these bins need their occupancy recomputed
+        "changed_codes": set(deleted) | set(updated) | set(inserted),
+    }
+
+
+def apply_location_swap(conn):
+    shadow = create_shadow_table(conn, "location_stock")
+    inserted = conn.execute(text(SHADOW_LOCATION.format(shadow=shadow))).rowcount
+
+    # the caller swaps at the very end of its transaction
+    renames = build_shadow_indexes(conn, "location_stock")
+
+    return {
+        "rows": inserted,
+        "inserted": inserted,
+        "updated": None,
+        "deleted": None,
+        "renames": renames,
+    }
+
+
+LOAD_MODES = {
+    "snapshot": apply_location_snapshot,
+    "delta": apply_location_delta,
+    "swap": apply_location_swap,
+}
+
+
+def ingest_location_stock(upload_id, fileobj, mode="snapshot", chunk_kb=DEFAULT_CHUNK_KB):
+
+    progress.start(upload_id, total_bytes=file_size(fileobj))
 
     try:
-        location_df = pd.read_csv(io.BytesIO(await location_file.read()))
-        location_df.columns = location_df.columns.str.strip()
-
-        normalized_rows = []
+        with LoadTimer() as timer:
+            with engine.begin() as conn:
+
+                create_staging_table(conn, "location_staging", {
+                    "seq": "BIGSERIAL",
+                    "location_code": "TEXT",
+                    "sku": "TEXT",
+                    "units": "INTEGER",
+                })
 
-        for _, row in location_df.iterrows():
+                create_staging_table(conn, "locations_staging", {
+                    "seq": "BIGSERIAL",
+                    "location_code": "TEXT",
+                    "building": "TEXT",
+                    "aisle": "TEXT",
+                    "rack": "INTEGER",
+                    "shelf": "TEXT",
+                    "bin": "INTEGER",
+                    "side": "TEXT",
+                })
 
-            location = str(row.get("Location", "")).strip().upper()
-            skus_raw = str(row.get("SKU(s)", "")).strip()
-            qty_raw = str(row.get("QTY", "")).strip()
+                rows_loaded = 0
+                mismatched = []
 
-            if not location or skus_raw in ["", "-", "nan"]:
-                continue
+                chunks = read_upload_chunks(
+                    fileobj, upload_id, chunk_kb,
+                    LOCATION_ALIASES, LOCATION_DTYPES,
+                    required=["location", "skus", "qty"]
+                )
 
-            skus = skus_raw.split()
-            qtys = qty_raw.split()
+                for chunk in chunks:
+                    location_rows, chunk_mismatched = normalize_location_rows(chunk)
+                    mismatched.extend(chunk_mismatched)
+
+                    rows_loaded += copy_dataframe(
+                        conn, location_rows, "location_staging", LOCATION_COLUMNS
+                    )
+                    copy_dataframe(
+                        conn, export_location_rows(chunk), "locations_staging",
+                        LOCATION_MASTER_COLUMNS
+                    )
+                    progress.update(upload_id, rows_loaded=rows_loaded)
+
+                progress.update(upload_id, phase="merging")
+
+                # location master first, so every stocked code has a row
+                relaid = conn.execute(
+                    text(MERGE_LOCATIONS), {"pattern": CODE_PATTERN}
+                ).scalars().all()
+                ensure_locations(conn, conn.execute(text(
+                    "SELECT DISTINCT location_code FROM location_staging"
+                )).scalars().all())
+
+                delta = LOAD_MODES[mode](conn)
+                location_rows = delta.pop("rows")
+                renames = delta.pop("renames", None)
+
+                # full reload -> rebuild every bin; delta -> only touched bins;
+                # swap -> rebuilt after the rename has committed (below)
+                changed_codes = delta.pop("changed_codes", None)
+                if changed_codes is not None:
+                    refresh_bins(conn, changed_codes | set(relaid))
+                elif renames is None:
+                    refresh_bins(conn)
+
+                conn.execute(text("""
+                    INSERT INTO upload_history (
+                        product_rows, location_rows, upload_time,
+                        load_mode, rows_inserted, rows_updated, rows_deleted
+                    )
+                    VALUES (0, :l, :t, :mode, :ins, :upd, :del)
+                """), {
+                    "l": location_rows,
+                    "t": datetime.utcnow(),
+                    "mode": mode,
+                    "ins": delta["inserted"],
+                    "upd": delta["updated"],
+                    "del": delta["deleted"]
+                })
 
-            if len(skus) != len(qtys):
-                continue
+                # last statement: the rename's ACCESS EXCLUSIVE lock is
+                # released by the commit right after it
+                if renames is not None:
+                    swap_shadow_table(conn, "location_stock", renames)
+
+            # the new stock is live: stop answering 304 for it even if
+            # the occupancy rebuild below fails
+            data_version.bump(data_version.STOCK)
+
+            # the occupancy rebuild reads location_stock like any reader,
+            # so it gets its own short transaction once the swap is in
+            occupancy_error = None
+            if renames is not None:
+                try:
+                    with engine.begin() as conn:
+                        refresh_bins(conn)
+                except Exception as e:
+                    occupancy_error = str(e)
+                else:
+                    data_version.bump(data_version.STOCK)
+
+        progress.finish(upload_id)
 
-            for sku, qty in zip(skus, qtys):
-                normalized_rows.append({
-                    "location_code": location,
-                    "sku": sku.strip(),
-                    "units": safe_int(qty)
-                })
+        return {
+            "status": (
+                "location stock updated" if occupancy_error is None
+                else "location stock loaded, occupancy rebuild failed"
+            ),
+            "occupancy_error": occupancy_error,
+            "upload_id": upload_id,
+            "mode": mode,
+            "rows": location_rows,
+            "delta": delta,
+            "mismatched_rows": len(mismatched),
+            "mismatched_locations": mismatched[:50],
+            **timer.stats(location_rows)
+        }
 
-        location_df_clean = pd.DataFrame(normalized_rows)
+    except HTTPException as e:
+        progress.finish(upload_id, error=str(e.detail))
+        raise e
+    except Exception as e:
+        progress.finish(upload_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if not location_df_clean.empty:
-            location_df_clean = location_df_clean.drop_duplicates(
-                subset=["location_code", "sku"]
-            )
 
-        UPSERT_LOCATION = """
-        INSERT INTO location_stock (location_code, sku, units)
-        VALUES (:location_code, :sku, :units)
-        ON CONFLICT (location_code, sku)
-        DO UPDATE SET units = EXCLUDED.units;
-        """
+@router.post("/location-stock")
+def upload_location_stock(
+    location_file: UploadFile = File(...),
+    mode: str = Query("snapshot", pattern="^(snapshot|delta|swap)$"),
+    upload_id: str | None = Query(None),
+    chunk_kb: int = Query(DEFAULT_CHUNK_KB, ge=64),
+    background: bool = Query(False),
+):
+
+    if background:
+        job_id = jobs.submit(
+            "upload-location-stock", ingest_location_stock, mode, chunk_kb,
+            uploads=[location_file]
+        )
+        return {"status": "queued", "job_id": job_id}
 
-        with engine.begin() as conn:
+    return ingest_location_stock(
+        upload_id or uuid.uuid4().hex,
+        location_file.file,
+        mode,
+        chunk_kb
+    )
 
-            # Snapshot mode
-            conn.execute(text("TRUNCATE TABLE location_stock"))
 
-            for _, row in location_df_clean.iterrows():
-                conn.execute(text(UPSERT_LOCATION), row.to_dict())
+# =================================================
+# UPLOAD PROGRESS
+# =================================================
+@router.get("/progress/{upload_id}")
+def get_upload_progress(upload_id: str):
 
-            conn.execute(text("""
-                INSERT INTO upload_history (product_rows, location_rows, upload_time)
-                VALUES (0, :l, :t)
-            """), {
-                "l": len(location_df_clean),
-                "t": datetime.utcnow()
-            })
+    entry = progress.get(upload_id)
 
-        return {
-            "status": "location stock updated",
-            "rows": len(location_df_clean)
-        }
+    if not entry:
+        raise HTTPException(status_code=404, detail="Upload not found")
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return entry
 
 
 # =================================================
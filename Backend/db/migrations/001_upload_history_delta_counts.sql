@@ -0,0 +1,6 @@
+-- Delta-apply location uploads record what actually changed
+ALTER TABLE upload_history
+    ADD COLUMN IF NOT EXISTS load_mode TEXT,
+    ADD COLUMN IF NOT EXISTS rows_inserted INTEGER,
+    ADD COLUMN IF NOT EXISTS rows_updated INTEGER,
+    ADD COLUMN IF NOT EXISTS rows_deleted INTEGER;
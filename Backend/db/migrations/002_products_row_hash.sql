@@ -0,0 +1,4 @@
+-- Content fingerprint of the product master columns written by
+-- /upload/products; unchanged rows are skipped on re-upload
+ALTER TABLE products
+    ADD COLUMN IF NOT EXISTS row_hash BIGINT;
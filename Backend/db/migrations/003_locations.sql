@@ -0,0 +1,66 @@
+-- Canonical location master. Codes are stored upper-case and trimmed,
+-- e.g. 'ELECTRA P1-A1' -> building ELECTRA, aisle P, rack 1, shelf A, bin 1.
+-- Side follows rack parity: odd racks LEFT, even racks RIGHT.
+CREATE TABLE IF NOT EXISTS locations (
+    location_code TEXT PRIMARY KEY,
+    building TEXT,
+    aisle TEXT,
+    rack INTEGER,
+    shelf TEXT,
+    bin INTEGER,
+    side TEXT,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS locations_layout_idx
+    ON locations (building, aisle, rack, shelf, bin);
+
+CREATE INDEX IF NOT EXISTS locations_shelf_idx
+    ON locations (building, aisle, shelf);
+
+
+-- location_stock / location_capacity join locations by exact key,
+-- so fold any mixed-case codes written before this migration
+WITH moved AS (
+    DELETE FROM location_stock
+    WHERE location_code <> UPPER(TRIM(location_code))
+    RETURNING UPPER(TRIM(location_code)) AS location_code, sku, units
+)
+INSERT INTO location_stock (location_code, sku, units)
+SELECT location_code, sku, SUM(units)
+FROM moved
+GROUP BY location_code, sku
+ON CONFLICT (location_code, sku)
+DO UPDATE SET units = location_stock.units + EXCLUDED.units;
+
+WITH moved AS (
+    DELETE FROM location_capacity
+    WHERE location_code <> UPPER(TRIM(location_code))
+    RETURNING UPPER(TRIM(location_code)) AS location_code, max_cartons
+)
+INSERT INTO location_capacity (location_code, max_cartons)
+SELECT location_code, MAX(max_cartons)
+FROM moved
+GROUP BY location_code
+ON CONFLICT (location_code) DO NOTHING;
+
+
+-- backfill from codes already in use
+INSERT INTO locations (location_code, building, aisle, rack, shelf, bin, side)
+SELECT
+    code,
+    m[1],
+    m[2],
+    m[3]::int,
+    m[4],
+    m[5]::int,
+    CASE WHEN m[3]::int % 2 = 0 THEN 'RIGHT' ELSE 'LEFT' END
+FROM (
+    SELECT location_code AS code FROM location_stock
+    UNION
+    SELECT location_code FROM location_capacity
+) codes
+LEFT JOIN LATERAL regexp_match(
+    code, '^(.+) ([A-Z]+)([0-9]+)-([A-Z]+)([0-9]+)$'
+) AS m ON true
+ON CONFLICT (location_code) DO NOTHING;
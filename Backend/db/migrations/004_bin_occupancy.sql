@@ -0,0 +1,60 @@
+-- Per-bin carton totals behind GET /bins, kept current by the write
+-- paths through services/occupancy.refresh_bins. One row per stocked
+-- location; layout columns are copied from locations for the filter.
+CREATE TABLE IF NOT EXISTS bin_occupancy (
+    location_code TEXT PRIMARY KEY,
+    building TEXT,
+    aisle TEXT,
+    rack INTEGER,
+    shelf TEXT,
+    bin INTEGER,
+    side TEXT,
+    total_cartons INTEGER NOT NULL DEFAULT 0,
+    max_cartons INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    items JSONB NOT NULL DEFAULT '[]',
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS bin_occupancy_layout_idx
+    ON bin_occupancy (building, aisle, rack, shelf, bin);
+
+
+-- initial fill (same aggregate as refresh_bins)
+INSERT INTO bin_occupancy (
+    location_code, building, aisle, rack, shelf, bin, side,
+    total_cartons, max_cartons, status, items
+)
+SELECT
+    l.location_code, l.building, l.aisle, l.rack, l.shelf, l.bin, l.side,
+    SUM(s.cartons),
+    COALESCE(lc.max_cartons, 0),
+    CASE
+        WHEN SUM(s.cartons) = 0 THEN 'EMPTY'
+        WHEN lc.max_cartons IS NOT NULL AND SUM(s.cartons) >= lc.max_cartons THEN 'FULL'
+        ELSE 'PARTIAL'
+    END,
+    jsonb_agg(
+        jsonb_build_object(
+            'sku', s.sku,
+            'product_name', s.product_name,
+            'cartons', s.cartons
+        )
+        ORDER BY s.product_name
+    )
+FROM (
+    SELECT
+        ls.location_code,
+        ls.sku,
+        p.product_name,
+        CASE
+            WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0 THEN 0
+            ELSE FLOOR(ls.units::float / p.units_per_carton)::int
+        END AS cartons
+    FROM location_stock ls
+    JOIN products p ON p.sku = ls.sku
+) s
+JOIN locations l ON l.location_code = s.location_code
+LEFT JOIN location_capacity lc ON lc.location_code = l.location_code
+GROUP BY l.location_code, lc.max_cartons
+ON CONFLICT (location_code) DO NOTHING;
@@ -0,0 +1,10 @@
+-- Change feed behind GET /bins/changes. One row per bin touched by a
+-- write; location_code NULL marks a full rebuild (clients resync).
+CREATE TABLE IF NOT EXISTS bin_changes (
+    version BIGSERIAL PRIMARY KEY,
+    location_code TEXT,
+    changed_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- start the feed with a reset marker so existing clients resync once
+INSERT INTO bin_changes (location_code) VALUES (NULL);
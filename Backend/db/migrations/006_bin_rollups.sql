@@ -0,0 +1,33 @@
+-- Resolved capacity per stocked bin (location override, group
+-- override, default 30) and its distinct SKU count, for the rollups.
+ALTER TABLE bin_occupancy
+    ADD COLUMN IF NOT EXISTS capacity INTEGER,
+    ADD COLUMN IF NOT EXISTS capacity_source TEXT,
+    ADD COLUMN IF NOT EXISTS sku_count INTEGER NOT NULL DEFAULT 0;
+
+-- warehouse -> building -> aisle -> rack aggregates, maintained by
+-- services/occupancy.refresh_rollups. node keys:
+--   ''                 warehouse
+--   'ELECTRA'          building
+--   'ELECTRA/P'        aisle
+--   'ELECTRA/P/5'      rack
+CREATE TABLE IF NOT EXISTS bin_rollups (
+    node TEXT PRIMARY KEY,
+    parent TEXT,
+    level TEXT NOT NULL,
+    building TEXT,
+    aisle TEXT,
+    rack INTEGER,
+    bins INTEGER NOT NULL DEFAULT 0,
+    empty_bins INTEGER NOT NULL DEFAULT 0,
+    mixed_bins INTEGER NOT NULL DEFAULT 0,
+    cartons BIGINT NOT NULL DEFAULT 0,
+    capacity BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS bin_rollups_parent_idx
+    ON bin_rollups (parent);
+
+-- Filled by migration 013 (or: python -m scripts.rebuild_occupancy)
+-- (the next snapshot / swap location upload does the same)
@@ -0,0 +1,27 @@
+-- Indexed substring search for /optimizer/locations and /optimizer/flavours.
+-- pg_trgm GIN indexes serve ILIKE '%word%' and rank with word_similarity.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- one document per product for the smart search (sku + name)
+ALTER TABLE products
+    ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (
+        COALESCE(sku, '') || ' ' || COALESCE(product_name, '')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS products_search_trgm_idx
+    ON products USING gin (search_text gin_trgm_ops);
+
+-- brand / category / flavour (product_name) filters
+CREATE INDEX IF NOT EXISTS products_brand_trgm_idx
+    ON products USING gin (brand gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS products_category_trgm_idx
+    ON products USING gin (category gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx
+    ON products USING gin (product_name gin_trgm_ops);
+
+-- location code part of the smart search
+CREATE INDEX IF NOT EXISTS locations_code_trgm_idx
+    ON locations USING gin (location_code gin_trgm_ops);
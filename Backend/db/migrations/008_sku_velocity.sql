@@ -0,0 +1,10 @@
+-- Sales velocity per SKU from the latest /purchase/analyze run,
+-- read by the slotting recommender (services/slotting.py).
+CREATE TABLE IF NOT EXISTS sku_velocity (
+    sku TEXT PRIMARY KEY,
+    qty_sold NUMERIC NOT NULL DEFAULT 0,
+    avg_daily_sales NUMERIC NOT NULL DEFAULT 0,
+    period_start DATE,
+    period_end DATE,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
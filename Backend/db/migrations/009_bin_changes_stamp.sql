@@ -0,0 +1,19 @@
+-- bin_changes rows are written without a version and stamped once
+-- committed (services/occupancy.stamp_changes), so writers no longer
+-- serialize on one lock to keep versions in commit order. id only
+-- orders the rows waiting for a stamp.
+ALTER TABLE bin_changes DROP CONSTRAINT IF EXISTS bin_changes_pkey;
+
+ALTER TABLE bin_changes
+    ALTER COLUMN version DROP DEFAULT,
+    ALTER COLUMN version DROP NOT NULL;
+
+ALTER TABLE bin_changes
+    ADD COLUMN IF NOT EXISTS id BIGSERIAL PRIMARY KEY;
+
+CREATE UNIQUE INDEX IF NOT EXISTS bin_changes_version_idx
+    ON bin_changes (version);
+
+CREATE INDEX IF NOT EXISTS bin_changes_unstamped_idx
+    ON bin_changes (id)
+    WHERE version IS NULL;
@@ -0,0 +1,45 @@
+-- The write paths now keep only the rack rows of bin_rollups. Aisle,
+-- building and warehouse totals are summed from them on read, so
+-- writers in different racks never update a shared ancestor row.
+DELETE FROM bin_rollups WHERE level <> 'rack';
+
+CREATE OR REPLACE VIEW bin_rollup_tree AS
+SELECT
+    node, parent, level, building, aisle, rack,
+    bins::bigint AS bins,
+    empty_bins::bigint AS empty_bins,
+    mixed_bins::bigint AS mixed_bins,
+    cartons,
+    capacity
+FROM bin_rollups
+WHERE level = 'rack'
+
+UNION ALL
+
+SELECT
+    building || '/' || aisle, building, 'aisle', building, aisle, NULL,
+    SUM(bins)::bigint, SUM(empty_bins)::bigint, SUM(mixed_bins)::bigint,
+    SUM(cartons)::bigint, SUM(capacity)::bigint
+FROM bin_rollups
+WHERE level = 'rack'
+GROUP BY building, aisle
+
+UNION ALL
+
+SELECT
+    building, '', 'building', building, NULL, NULL,
+    SUM(bins)::bigint, SUM(empty_bins)::bigint, SUM(mixed_bins)::bigint,
+    SUM(cartons)::bigint, SUM(capacity)::bigint
+FROM bin_rollups
+WHERE level = 'rack'
+GROUP BY building
+
+UNION ALL
+
+SELECT
+    '', NULL, 'warehouse', NULL, NULL, NULL,
+    COALESCE(SUM(bins), 0)::bigint, COALESCE(SUM(empty_bins), 0)::bigint,
+    COALESCE(SUM(mixed_bins), 0)::bigint, COALESCE(SUM(cartons), 0)::bigint,
+    COALESCE(SUM(capacity), 0)::bigint
+FROM bin_rollups
+WHERE level = 'rack';
@@ -0,0 +1,5 @@
+-- Change counters behind the ETags of the polled read endpoints
+-- (services/data_version). Sequences, so every API worker reads the
+-- same version and a bump never waits on another transaction.
+CREATE SEQUENCE IF NOT EXISTS data_version_stock;
+CREATE SEQUENCE IF NOT EXISTS data_version_pallets;
@@ -0,0 +1,3 @@
+-- Product master version (services/data_version.PRODUCTS), so caches
+-- of product columns only reload after a product upload.
+CREATE SEQUENCE IF NOT EXISTS data_version_products;
@@ -0,0 +1,68 @@
+-- Initial fill for the columns 006 added: bins written before it have
+-- a NULL capacity until refresh_bins touches them again. Same rules as
+-- services/occupancy.REFRESH_BINS (30 = capacity.DEFAULT_BIN_CAPACITY).
+WITH per_bin AS (
+    SELECT
+        ls.location_code,
+        COUNT(DISTINCT ls.sku) AS sku_count,
+        (ARRAY_AGG(p.brand ORDER BY p.product_name, p.sku))[1] AS brand,
+        (ARRAY_AGG(p.category ORDER BY p.product_name, p.sku))[1] AS category
+    FROM location_stock ls
+    JOIN products p ON p.sku = ls.sku
+    GROUP BY ls.location_code
+)
+UPDATE bin_occupancy b
+SET
+    capacity = COALESCE(f.location_cap, f.group_cap, 30),
+    capacity_source = CASE
+        WHEN f.location_cap IS NOT NULL THEN 'location-override'
+        WHEN f.group_cap IS NOT NULL THEN 'group-override'
+        ELSE 'default'
+    END,
+    sku_count = COALESCE(f.sku_count, 0)
+FROM (
+    SELECT
+        o.location_code,
+        s.sku_count,
+        lc.max_cartons AS location_cap,
+        g.max_cartons AS group_cap
+    FROM bin_occupancy o
+    LEFT JOIN per_bin s ON s.location_code = o.location_code
+    LEFT JOIN location_capacity lc ON lc.location_code = o.location_code
+    LEFT JOIN product_group_capacity g
+        ON LOWER(TRIM(g.brand)) = LOWER(TRIM(s.brand))
+       AND LOWER(TRIM(g.category)) = LOWER(TRIM(s.category))
+    WHERE o.capacity IS NULL
+) f
+WHERE f.location_code = b.location_code;
+
+-- every rack row, from the filled capacities (services/occupancy.ROLLUP_RACKS)
+INSERT INTO bin_rollups (
+    node, parent, level, building, aisle, rack,
+    bins, empty_bins, mixed_bins, cartons, capacity, updated_at
+)
+SELECT
+    l.building || '/' || l.aisle || '/' || l.rack,
+    l.building || '/' || l.aisle,
+    'rack',
+    l.building, l.aisle, l.rack,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE COALESCE(b.total_cartons, 0) = 0),
+    COUNT(*) FILTER (WHERE b.sku_count > 1),
+    COALESCE(SUM(b.total_cartons), 0),
+    SUM(COALESCE(b.capacity, lc.max_cartons, 30)),
+    now()
+FROM locations l
+LEFT JOIN bin_occupancy b ON b.location_code = l.location_code
+LEFT JOIN location_capacity lc ON lc.location_code = l.location_code
+WHERE l.building IS NOT NULL
+  AND l.aisle IS NOT NULL
+  AND l.rack IS NOT NULL
+GROUP BY l.building, l.aisle, l.rack
+ON CONFLICT (node) DO UPDATE SET
+    bins = EXCLUDED.bins,
+    empty_bins = EXCLUDED.empty_bins,
+    mixed_bins = EXCLUDED.mixed_bins,
+    cartons = EXCLUDED.cartons,
+    capacity = EXCLUDED.capacity,
+    updated_at = EXCLUDED.updated_at;
@@ -0,0 +1,3 @@
+-- Capacity override version (services/data_version.CAPACITY), so every
+-- API worker reloads its services/capacity cache after an override changes.
+CREATE SEQUENCE IF NOT EXISTS data_version_capacity;
@@ -11,6 +11,8 @@ from api.uploads import router as upload_router
 from api.purchase_analysis import router as purchase_router
 from api.scanner import router as scanner_router
 from api.pallet import router as pallet_router   # Pallet builder API
+from api.jobs import router as jobs_router
+from api.putaway import router as putaway_router
 
 
 app = FastAPI(title="Warehouse API")
@@ -46,6 +48,8 @@ app.include_router(upload_router)
 app.include_router(purchase_router)
 app.include_router(scanner_router)
 app.include_router(pallet_router)   # NEW pallet system
+app.include_router(jobs_router)
+app.include_router(putaway_router)
 
 
 # -----------------------------
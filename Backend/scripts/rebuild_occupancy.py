@@ -0,0 +1,12 @@
+# Rebuild bin_occupancy, the rack rollups and reset the /bins change feed.
+# Run from Backend/:  python -m scripts.rebuild_occupancy
+from db.database import engine
+from services import data_version
+from services.occupancy import refresh_bins
+
+with engine.begin() as conn:
+    refresh_bins(conn)
+
+data_version.bump(data_version.STOCK)
+
+print("✅ Bin occupancy rebuilt")
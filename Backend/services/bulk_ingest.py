@@ -0,0 +1,73 @@
+# services/bulk_ingest.py
+import io
+import time
+from sqlalchemy import text
+
+
+# -------------------------------------------------
+# STAGING TABLE
+# -------------------------------------------------
+def create_staging_table(conn, name, columns):
+    """
+    Temp table that only lives for the current transaction.
+    columns = {"sku": "TEXT", "units": "INTEGER", ...}
+    """
+    column_sql = ",\n".join(f"{col} {col_type}" for col, col_type in columns.items())
+
+    conn.execute(text(f"""
+        CREATE TEMP TABLE {name} (
+            {column_sql}
+        ) ON COMMIT DROP
+    """))
+
+
+# -------------------------------------------------
+# COPY DATAFRAME
+# -------------------------------------------------
+def copy_dataframe(conn, df, table, columns):
+    """
+    Stream a DataFrame into `table` with COPY FROM STDIN.
+    Runs on the same DB connection (and transaction) as `conn`.
+    """
+    if df.empty:
+        return 0
+
+    buffer = io.StringIO()
+    df[columns].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+    return len(df)
+
+
+# -------------------------------------------------
+# LOAD TIMER
+# -------------------------------------------------
+class LoadTimer:
+    """
+    with LoadTimer() as timer: ...
+    timer.stats(rows) -> {"seconds": .., "rows_per_sec": ..}
+    """
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        return False
+
+    def stats(self, rows):
+        return {
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(rows / self.seconds) if self.seconds else rows,
+        }
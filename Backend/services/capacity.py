@@ -0,0 +1,102 @@
+# services/capacity.py
+import threading
+
+from sqlalchemy import text
+
+from db.database import engine
+from services import data_version
+
+# Bins with no location / group override hold this many cartons
+DEFAULT_BIN_CAPACITY = 30
+
+# Process-level copy of location_capacity and product_group_capacity.
+# Loaded on first use and reloaded once the CAPACITY version moves past
+# the one it was loaded at, so a write through any worker reaches all.
+_lock = threading.Lock()
+_overrides = None
+_version = None
+
+
+def _group_key(brand, category):
+    return (str(brand or "").strip().lower(), str(category or "").strip().lower())
+
+
+def _load():
+    with engine.connect() as conn:
+
+        locations = conn.execute(text("""
+            SELECT location_code, max_cartons
+            FROM location_capacity
+            WHERE max_cartons IS NOT NULL
+        """)).all()
+
+        groups = conn.execute(text("""
+            SELECT brand, category, max_cartons
+            FROM product_group_capacity
+            WHERE max_cartons IS NOT NULL
+        """)).all()
+
+    return {
+        "locations": {code: int(cap) for code, cap in locations},
+        "groups": {_group_key(b, c): int(cap) for b, c, cap in groups},
+    }
+
+
+def overrides():
+    global _overrides, _version
+
+    version = data_version.current(data_version.CAPACITY)[0]
+
+    with _lock:
+        if _overrides is None or _version < version:
+            _overrides, _version = _load(), version
+        return _overrides
+
+
+def invalidate():
+    """
+    Drop this worker's copy. Capacity writers bump CAPACITY instead;
+    this is for tables changed without a bump (tests, manual SQL).
+    """
+    global _overrides
+
+    with _lock:
+        _overrides = None
+
+
+# -------------------------------------------------
+# RESOLVE
+# -------------------------------------------------
+def resolve(locations):
+    """
+    [{"location_code", "brand", "category"}, ...] ->
+    [{"location_code", "max_cartons", "capacity_source"}, ...]
+
+    brand / category are those of the bin's first item (may be absent
+    for empty bins). Priority: location override, group override,
+    DEFAULT_BIN_CAPACITY.
+    """
+    current = overrides()
+    location_map = current["locations"]
+    group_map = current["groups"]
+
+    resolved = []
+
+    for loc in locations:
+        code = loc["location_code"]
+        group = _group_key(loc.get("brand"), loc.get("category"))
+
+        if code in location_map:
+            capacity, source = location_map[code], "location-override"
+        elif group in group_map:
+            capacity, source = group_map[group], "group-override"
+        else:
+            capacity, source = DEFAULT_BIN_CAPACITY, "default"
+
+        resolved.append({
+            "location_code": code,
+            "max_cartons": capacity,
+            "capacity_source": source,
+        })
+
+    return resolved
@@ -0,0 +1,209 @@
+# services/consolidation.py
+import bisect
+import time
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+
+# Same cut-off as needs_merge on /optimizer/locations
+MERGE_THRESHOLD = 60
+
+
+# -------------------------------------------------
+# LOAD
+# -------------------------------------------------
+def load_bins(conn, aisle=None):
+    """
+    Stocked bins with resolved capacity (from bin_occupancy) and their
+    SKUs as whole cartons plus any loose units the scanner can't move.
+    """
+    rows = conn.execute(text("""
+        SELECT
+            b.location_code,
+            b.aisle,
+            b.rack,
+            b.capacity,
+            ls.sku,
+            CASE
+                WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0 THEN 0
+                ELSE ls.units / p.units_per_carton
+            END AS cartons,
+            CASE
+                WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0 THEN ls.units
+                ELSE ls.units % p.units_per_carton
+            END AS loose_units
+        FROM bin_occupancy b
+        JOIN location_stock ls ON ls.location_code = b.location_code
+        JOIN products p ON p.sku = ls.sku
+        WHERE b.building = :building
+          AND b.aisle = ANY(:aisles)
+          AND ls.units > 0
+        ORDER BY b.location_code, ls.sku
+    """), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": [aisle.upper()] if aisle else ALLOWED_AISLES,
+    }).mappings().all()
+
+    bins = {}
+
+    for r in rows:
+        b = bins.setdefault(r["location_code"], {
+            "location_code": r["location_code"],
+            "aisle": r["aisle"],
+            "rack": r["rack"],
+            "capacity": r["capacity"] or 0,
+            "cartons": 0,
+            "loose_units": 0,
+            "skus": {},
+        })
+        b["cartons"] += r["cartons"]
+        b["loose_units"] += r["loose_units"]
+        if r["cartons"]:
+            b["skus"][r["sku"]] = b["skus"].get(r["sku"], 0) + r["cartons"]
+
+    return list(bins.values())
+
+
+# -------------------------------------------------
+# PLAN
+# -------------------------------------------------
+def plan_consolidation(bins, threshold=MERGE_THRESHOLD, allow_mixed=False, same_aisle=False):
+    """
+    Greedy best-fit merge plan.
+
+    Sources are bins below `threshold` % occupancy, smallest first, and
+    each is moved whole (all its cartons) into the fullest bin that
+    still has room for it. A bin that has received stock is never
+    emptied later, and an emptied bin never receives stock.
+
+    Without allow_mixed a source must hold a single SKU and may only go
+    to a bin holding just that SKU; with it any pairing is allowed.
+    Bins with loose units (less than a carton) are never sources: the
+    scanner moves whole cartons only, so they could not be freed.
+
+    Returns {"moves": [...], "summary": {...}}; each move step lists the
+    MoveRequest payloads for /scanner/move in execution order.
+    """
+    started = time.perf_counter()
+
+    free = {b["location_code"]: b["capacity"] - b["cartons"] for b in bins}
+    by_code = {b["location_code"]: b for b in bins}
+
+    def pool_key(b):
+        if same_aisle:
+            scope = b["aisle"]
+        else:
+            scope = None
+
+        if allow_mixed:
+            return (scope, None)
+
+        if len(b["skus"]) != 1:
+            return None
+
+        return (scope, next(iter(b["skus"])))
+
+    # pool -> sorted [(free cartons, location_code)] of possible targets
+    pools = defaultdict(list)
+
+    for b in bins:
+        key = pool_key(b)
+        if key is not None and free[b["location_code"]] > 0:
+            pools[key].append((free[b["location_code"]], b["location_code"]))
+
+    for pool in pools.values():
+        pool.sort()
+
+    sources = sorted(
+        (
+            b for b in bins
+            if b["capacity"] > 0
+            and b["cartons"] > 0
+            and b["cartons"] * 100 < threshold * b["capacity"]
+        ),
+        key=lambda b: (b["cartons"], b["location_code"])
+    )
+
+    emptied = set()
+    received = set()
+    steps = []
+    skipped_loose = 0
+    skipped_mixed = 0
+
+    for src in sources:
+        code = src["location_code"]
+
+        if code in received:
+            continue
+
+        if src["loose_units"]:
+            skipped_loose += 1
+            continue
+
+        key = pool_key(src)
+        if key is None:
+            skipped_mixed += 1
+            continue
+
+        pool = pools[key]
+        need = src["cartons"]
+
+        # best fit: the least free space that still holds the whole source
+        i = bisect.bisect_left(pool, (need, ""))
+
+        while i < len(pool) and pool[i][1] == code:
+            i += 1
+
+        if i == len(pool):
+            continue
+
+        room, target = pool.pop(i)
+
+        # the source leaves the target pools for good
+        src_entry = (free[code], code)
+        j = bisect.bisect_left(pool, src_entry)
+        if j < len(pool) and pool[j] == src_entry:
+            pool.pop(j)
+
+        free[target] = room - need
+        if free[target] > 0:
+            bisect.insort(pool, (free[target], target))
+
+        emptied.add(code)
+        received.add(target)
+
+        steps.append({
+            "from_location": code,
+            "to_location": target,
+            "cartons": need,
+            "moves": [
+                {
+                    "sku": sku,
+                    "from_location": code,
+                    "to_location": target,
+                    "cartons": cartons,
+                }
+                for sku, cartons in sorted(src["skus"].items())
+            ],
+        })
+
+    for step in steps:
+        target = by_code[step["to_location"]]
+        step["target_occupancy_after"] = round(
+            (target["capacity"] - free[target["location_code"]]) * 100 / target["capacity"], 1
+        ) if target["capacity"] else 0
+
+    return {
+        "moves": steps,
+        "summary": {
+            "candidates": len(sources),
+            "bins_freed": len(emptied),
+            "cartons_moved": sum(s["cartons"] for s in steps),
+            "scanner_moves": sum(len(s["moves"]) for s in steps),
+            "skipped_loose_units": skipped_loose,
+            "skipped_mixed": skipped_mixed,
+            "planning_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    }
@@ -0,0 +1,166 @@
+# services/csv_reader.py
+import codecs
+import csv
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# Bytes sniffed up front for header detection
+SAMPLE_BYTES = 64 * 1024
+
+# Default block size for streamed reads (~ memory per chunk)
+DEFAULT_BLOCK_BYTES = 4 * 1024 * 1024
+
+ARROW_TYPES = {
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    # read as text, coerced with pd.to_numeric so bad cells become NaN
+    # instead of failing the whole file
+    "number": pa.string(),
+}
+
+
+# -------------------------------------------------
+# HEADER HELPERS
+# -------------------------------------------------
+def header_key(name):
+    """ " Qty_Outstanding " -> "qtyoutstanding" """
+    return str(name).strip().lower().replace(" ", "").replace("_", "")
+
+
+def map_headers(headers, aliases):
+    """
+    Raw header -> canonical name.
+
+    aliases = {"units_per_carton": ["hidden carton qty"], ...}
+    Exact matches (ignoring case, spaces, underscores) win; otherwise
+    the first header containing an alias is used. Unmatched headers
+    are kept, stripped and lower-cased.
+    """
+    mapping = {h: str(h).strip().lower() for h in headers}
+    claimed = set()
+
+    for canonical, names in aliases.items():
+        keys = [header_key(n) for n in names]
+
+        match = next((h for h in headers if h not in claimed and header_key(h) in keys), None)
+
+        if match is None:
+            match = next(
+                (h for h in headers if h not in claimed and any(k in header_key(h) for k in keys)),
+                None
+            )
+
+        if match is not None:
+            mapping[match] = canonical
+            claimed.add(match)
+
+    return mapping
+
+
+# -------------------------------------------------
+# ENCODING
+# -------------------------------------------------
+def detect_encoding(fileobj, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    "utf8" if the whole file decodes as UTF-8, else "latin1".
+
+    The full file is checked, not a sample: the streamed read commits to
+    one encoding, and a latin-1 byte past the sample would otherwise
+    fail it after earlier blocks were already loaded.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    try:
+        while True:
+            block = fileobj.read(block_bytes)
+            decoder.decode(block, final=not block)
+            if not block:
+                return "utf8"
+    except UnicodeDecodeError:
+        return "latin1"
+    finally:
+        fileobj.seek(0)
+
+
+def _sniff(fileobj):
+    sample = fileobj.read(SAMPLE_BYTES)
+    fileobj.seek(0)
+
+    if not sample.strip():
+        raise ValueError("CSV file is empty")
+
+    encoding = detect_encoding(fileobj)
+    text = sample.decode("utf-8-sig" if encoding == "utf8" else encoding, errors="ignore")
+    headers = next(csv.reader(io.StringIO(text)))
+
+    return encoding, headers
+
+
+# -------------------------------------------------
+# READ
+# -------------------------------------------------
+def iter_csv(
+    fileobj,
+    aliases=None,
+    dtypes=None,
+    required=(),
+    block_bytes=DEFAULT_BLOCK_BYTES,
+):
+    """
+    Stream a binary CSV file as pandas DataFrames of ~block_bytes each.
+
+    Columns are renamed via `aliases`; `dtypes` maps canonical names to
+    "string" / "category" / "number". Every other column is read as text
+    so type inference on the first block can't reject later blocks.
+    """
+    aliases = aliases or {}
+    dtypes = dtypes or {}
+
+    encoding, headers = _sniff(fileobj)
+    mapping = map_headers(headers, aliases)
+
+    missing = [c for c in required if c not in mapping.values()]
+    if missing:
+        raise ValueError(f"Missing required column: {missing[0]}")
+
+    column_types = {
+        raw: ARROW_TYPES[dtypes.get(name, "string")]
+        for raw, name in mapping.items()
+    }
+
+    numeric = [name for name, kind in dtypes.items() if kind == "number"]
+
+    reader = pacsv.open_csv(
+        fileobj,
+        read_options=pacsv.ReadOptions(encoding=encoding, block_size=block_bytes),
+        convert_options=pacsv.ConvertOptions(
+            column_types=column_types,
+            strings_can_be_null=True,
+        ),
+    )
+
+    empty = True
+
+    for batch in reader:
+        df = batch.to_pandas().rename(columns=mapping)
+
+        for col in numeric:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col].str.replace(",", ""), errors="coerce")
+
+        empty = False
+        yield df
+
+    if empty:
+        yield pd.DataFrame(columns=list(mapping.values()))
+
+
+def read_csv(fileobj, aliases=None, dtypes=None, required=()):
+    """Whole-file variant of iter_csv."""
+    return pd.concat(
+        list(iter_csv(fileobj, aliases, dtypes, required)),
+        ignore_index=True
+    )
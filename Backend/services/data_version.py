@@ -0,0 +1,69 @@
+# services/data_version.py
+from fastapi import Response
+from sqlalchemy import text
+
+from db.database import engine
+
+# Change counters behind the ETags of the polled read endpoints, one
+# Postgres sequence per scope (migration 011) so every API worker and
+# script sees the same version. Writers bump a scope AFTER their
+# transaction commits; readers compare If-None-Match against the
+# current version and answer 304 without running the query.
+STOCK = "stock"        # location_stock, products, capacities, locations
+PALLETS = "pallets"    # pallets, pallet_items
+PRODUCTS = "products"  # product master only (bumped with STOCK)
+CAPACITY = "capacity"  # location / group capacity overrides (bumped with STOCK)
+
+SEQUENCES = {
+    STOCK: "data_version_stock",
+    PALLETS: "data_version_pallets",
+    PRODUCTS: "data_version_products",
+    CAPACITY: "data_version_capacity",
+}
+
+
+def bump(*scopes):
+    with engine.begin() as conn:
+        for scope in scopes:
+            conn.execute(text(f"SELECT nextval('{SEQUENCES[scope]}')"))
+
+
+def current(*scopes):
+    """Versions of `scopes`, in order (0 until the first bump)."""
+    columns = ", ".join(
+        f"(SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SEQUENCES[scope]})"
+        for scope in scopes
+    )
+
+    with engine.connect() as conn:
+        return list(conn.execute(text(f"SELECT {columns}")).one())
+
+
+def etag(*scopes):
+    versions = "-".join(
+        f"{scope}{version}" for scope, version in zip(scopes, current(*scopes))
+    )
+    return f'W/"{versions}"'
+
+
+# -------------------------------------------------
+# CONDITIONAL GET
+# -------------------------------------------------
+def not_modified(request, response, *scopes):
+    """
+    Set ETag / Cache-Control on `response` and return a 304 Response
+    when the client already has this version, else None.
+
+    Take the tag before running the query: a write landing mid-query
+    then only costs the client one extra full fetch.
+    """
+    tag = etag(*scopes)
+
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    response.headers.update(headers)
+
+    sent = request.headers.get("if-none-match", "")
+    if tag in [t.strip() for t in sent.split(",")] or sent.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    return None
@@ -0,0 +1,196 @@
+# services/facets.py
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+
+from db.database import engine
+from services import data_version
+from services.occupancy import stamp_changes, changed_since
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+
+# In-memory brand / category / flavour (product_name) facets for the
+# optimizer dropdowns, with the number of occupied locations behind each
+# value. Products reload only after a product master upload; occupied
+# locations follow the bin_changes feed, re-reading just the bins
+# changed since the last call (a rebuild marker or a big gap reloads
+# them whole). One refresh runs at a time, beside the cache: requests
+# arriving meanwhile are answered from the previous copy.
+FACETS = ["brand", "category", "product_name"]
+
+MAX_SYNC_CODES = 2000
+
+STOCK_PAIRS = """
+    SELECT DISTINCT ls.sku, ls.location_code
+    FROM location_stock ls
+    JOIN locations l ON l.location_code = ls.location_code
+    WHERE l.building = :building
+      AND l.aisle = ANY(:aisles)
+      AND ls.units > 0
+      {where}
+"""
+
+_refresh = threading.Lock()
+_cache = {
+    "products_version": None,
+    "products": None,
+    "stock_version": None,
+    "stock": None,
+    "pairs": None,
+}
+
+
+def _load_products(conn):
+    products = pd.DataFrame(conn.execute(text("""
+        SELECT sku, brand, category, product_name
+        FROM products
+    """)).all(), columns=["sku", "brand", "category", "product_name"])
+
+    for col in FACETS:
+        values = products[col].astype("string").str.strip()
+        products[col] = values.mask(values == "").astype("category")
+
+    return products
+
+
+def _load_stock(conn, codes=None):
+    where = "" if codes is None else "AND ls.location_code = ANY(:codes)"
+
+    return pd.DataFrame(conn.execute(text(STOCK_PAIRS.format(where=where)), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+        "codes": codes,
+    }).all(), columns=["sku", "location_code"])
+
+
+def _stale(cache, products_version, stock_version):
+    return (
+        cache["pairs"] is None
+        or cache["products_version"] < products_version
+        or cache["stock_version"] < stock_version
+    )
+
+
+def _refreshed(cache, products_version, stock_version):
+    products, stock = cache["products"], cache["stock"]
+
+    with engine.connect() as conn:
+
+        if products is None or cache["products_version"] != products_version:
+            products = _load_products(conn)
+
+        if stock is None or cache["stock_version"] != stock_version:
+            codes = None
+            if stock is not None and cache["stock_version"] < stock_version:
+                codes = changed_since(conn, cache["stock_version"], stock_version, MAX_SYNC_CODES)
+
+            if codes is None:
+                stock = _load_stock(conn)
+            else:
+                stock = pd.concat(
+                    [stock[~stock["location_code"].isin(codes)], _load_stock(conn, codes)],
+                    ignore_index=True
+                )
+
+    # one row per (product, occupied location); location is NaN for unstocked products
+    return {
+        "products_version": products_version,
+        "products": products,
+        "stock_version": stock_version,
+        "stock": stock,
+        "pairs": products.merge(stock, on="sku", how="left"),
+    }
+
+
+def _pairs():
+    global _cache
+
+    products_version = data_version.current(data_version.PRODUCTS)[0]
+    with engine.begin() as conn:
+        stock_version = stamp_changes(conn)
+
+    if not _stale(_cache, products_version, stock_version):
+        return _cache["pairs"]
+
+    # only the very first load makes callers wait
+    if not _refresh.acquire(blocking=_cache["pairs"] is None):
+        return _cache["pairs"]
+
+    try:
+        if _stale(_cache, products_version, stock_version):
+            _cache = _refreshed(_cache, products_version, stock_version)
+        return _cache["pairs"]
+    finally:
+        _refresh.release()
+
+
+# -------------------------------------------------
+# FILTER MATCHING (same as the optimizer's ILIKE '%value%')
+# -------------------------------------------------
+def _match(column, wanted):
+    needles = [w.strip().lower() for w in (wanted or []) if w and w.strip()]
+
+    # nothing (or only blanks) selected -> no filter
+    if not needles:
+        return pd.Series(True, index=column.index)
+
+    matching = [
+        value for value in column.cat.categories
+        if any(n in value.lower() for n in needles)
+    ]
+
+    return column.isin(matching)
+
+
+def _counts(pairs, column):
+    counts = (
+        pairs.dropna(subset=[column])
+        .groupby(column, observed=True)["location_code"]
+        .nunique()
+    )
+    return [
+        {"value": value, "locations": int(n)}
+        for value, n in sorted(counts.items(), key=lambda kv: kv[0].lower())
+    ]
+
+
+# -------------------------------------------------
+# PUBLIC
+# -------------------------------------------------
+def facets(brand=None, category=None, flavour=None):
+    """
+    Cross-filtered facet counts: each facet is counted under the other
+    two facets' selections, so an option shows how many occupied
+    locations it would match if added.
+    """
+    pairs = _pairs()
+
+    masks = {
+        "brand": _match(pairs["brand"], brand),
+        "category": _match(pairs["category"], category),
+        "product_name": _match(pairs["product_name"], flavour),
+    }
+
+    def others(column):
+        mask = pd.Series(True, index=pairs.index)
+        for name, m in masks.items():
+            if name != column:
+                mask &= m
+        return pairs[mask]
+
+    return {
+        "brands": _counts(others("brand"), "brand"),
+        "categories": _counts(others("category"), "category"),
+        "flavours": _counts(others("product_name"), "product_name"),
+    }
+
+
+def values(column, **filters):
+    """Sorted distinct values of one facet under the given filters."""
+    pairs = _pairs()
+
+    mask = pd.Series(True, index=pairs.index)
+    for name, wanted in filters.items():
+        mask &= _match(pairs[name], wanted)
+
+    return sorted(pairs.loc[mask, column].dropna().unique(), key=str.lower)
@@ -0,0 +1,132 @@
+# services/jobs.py
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from services import progress
+
+# In-process worker pool for long uploads / analyses.
+# pandas parsing and COPY release the GIL for most of their time,
+# so a thread pool is enough to keep several files moving at once.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 2))
+MAX_JOBS = 100
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_lock = threading.Lock()
+_jobs = {}
+
+
+# -------------------------------------------------
+# SPOOL UPLOAD
+# -------------------------------------------------
+def spool_upload(upload):
+    """
+    UploadFile is closed once the request returns, so copy it to a
+    temp file the job can read later.
+    """
+    upload.file.seek(0)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
+        shutil.copyfileobj(upload.file, tmp, length=1024 * 1024)
+        return tmp.name
+
+
+# -------------------------------------------------
+# SUBMIT
+# -------------------------------------------------
+def submit(kind, fn, *args, uploads=()):
+    """
+    Queue fn(job_id, *files, *args) and return the job id.
+    `uploads` are spooled to disk now and passed to fn as open
+    binary files; the return value of fn becomes the job result.
+    """
+    job_id = uuid.uuid4().hex
+    paths = [spool_upload(upload) for upload in uploads]
+
+    with _lock:
+        _jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+
+        while len(_jobs) > MAX_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+
+    _executor.submit(_run, job_id, fn, paths, args)
+
+    return job_id
+
+
+def _run(job_id, fn, paths, args):
+
+    _set(job_id, status="running", started_at=datetime.utcnow())
+
+    files = []
+
+    try:
+        files = [open(path, "rb") for path in paths]
+        result = fn(job_id, *files, *args)
+        _set(job_id, status="done", result=result)
+
+    except HTTPException as e:
+        _set(job_id, status="failed", error=str(e.detail))
+
+    except Exception as e:
+        traceback.print_exc()
+        _set(job_id, status="failed", error=str(e))
+
+    finally:
+        _set(job_id, finished_at=datetime.utcnow())
+
+        for f in files:
+            f.close()
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _set(job_id, **fields):
+    with _lock:
+        if job_id in _jobs:
+            _jobs[job_id].update(fields)
+
+
+# -------------------------------------------------
+# STATUS
+# -------------------------------------------------
+def get(job_id, include_result=True):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+
+    if not include_result:
+        job.pop("result")
+
+    job["progress"] = progress.get(job_id)
+
+    return job
+
+
+def list_jobs():
+    with _lock:
+        ids = list(_jobs)
+
+    return [get(job_id, include_result=False) for job_id in reversed(ids)]
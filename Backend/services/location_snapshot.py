@@ -0,0 +1,49 @@
+# services/location_snapshot.py
+import numpy as np
+import pandas as pd
+
+EMPTY_SKU_VALUES = ["", "-", "nan"]
+
+
+# -------------------------------------------------
+# NORMALIZE WMS LOCATION EXPORT
+# -------------------------------------------------
+def normalize_location_rows(location_df):
+    """
+    WMS export rows (location, skus, qty) -> one row per
+    (location_code, sku, units).
+
+    skus and qty hold whitespace separated lists that pair up
+    by position. Rows where the two lists differ in length are
+    skipped and returned as `mismatched`.
+    """
+    location_df = location_df.reindex(columns=["location", "skus", "qty"])
+
+    location = location_df["location"].astype("string").fillna("").str.split().str.join(" ").str.upper()
+    skus_raw = location_df["skus"].astype("string").fillna("").str.strip()
+    qty_raw = location_df["qty"].astype("string").fillna("").str.strip()
+
+    has_stock = (location != "") & ~skus_raw.isin(EMPTY_SKU_VALUES)
+
+    sku_lists = skus_raw[has_stock].str.split()
+    qty_lists = qty_raw[has_stock].str.split()
+
+    matched = sku_lists.str.len() == qty_lists.str.len()
+
+    mismatched = location[has_stock][~matched]
+
+    exploded = pd.DataFrame({
+        "location_code": location[has_stock][matched],
+        "sku": sku_lists[matched],
+        "units": qty_lists[matched],
+    }).explode(["sku", "units"], ignore_index=True)
+
+    units = pd.to_numeric(exploded["units"], errors="coerce")
+    units = units.where(np.isfinite(units), 0)
+
+    exploded["sku"] = exploded["sku"].astype(str)
+    exploded["units"] = units.astype("int64")
+
+    exploded = exploded.drop_duplicates(subset=["location_code", "sku"])
+
+    return exploded, mismatched.tolist()
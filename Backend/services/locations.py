@@ -0,0 +1,109 @@
+# services/locations.py
+import pandas as pd
+from sqlalchemy import text
+
+WAREHOUSE_BUILDING = "ELECTRA"
+ALLOWED_AISLES = ["P", "Q", "R", "S", "T"]
+
+LOCATION_COLUMNS = ["location_code", "building", "aisle", "rack", "shelf", "bin", "side"]
+
+# 'ELECTRA P1-A1' -> building, aisle, rack, shelf, bin
+CODE_PATTERN = r"^(.+) ([A-Z]+)([0-9]+)-([A-Z]+)([0-9]+)$"
+
+
+def normalize_code(code):
+    """ " electra p1-a1 " -> "ELECTRA P1-A1" """
+    return " ".join(str(code).split()).upper()
+
+
+# -------------------------------------------------
+# ENSURE LOCATIONS EXIST
+# -------------------------------------------------
+def ensure_locations(conn, codes):
+    """
+    Add location rows for codes written outside the WMS export
+    (scanner / pallet moves). Structure is parsed from the code.
+    """
+    if not codes:
+        return
+
+    conn.execute(text("""
+        INSERT INTO locations (location_code, building, aisle, rack, shelf, bin, side)
+        SELECT
+            code,
+            m[1],
+            m[2],
+            m[3]::int,
+            m[4],
+            m[5]::int,
+            CASE WHEN m[3]::int % 2 = 0 THEN 'RIGHT' ELSE 'LEFT' END
+        FROM unnest(CAST(:codes AS text[])) AS code
+        LEFT JOIN LATERAL regexp_match(code, :pattern) AS m ON true
+        ON CONFLICT (location_code) DO NOTHING
+    """), {"codes": sorted(set(codes)), "pattern": CODE_PATTERN})
+
+
+# -------------------------------------------------
+# LOCATIONS FROM WMS EXPORT
+# -------------------------------------------------
+def export_location_rows(location_df):
+    """
+    Building / Aisle / Rack / Shelf / Bin columns of the WMS export
+    -> rows for the locations table (empty bins included). Missing or
+    blank columns stay NULL; MERGE_LOCATIONS parses those from the code.
+    """
+    df = location_df.reindex(columns=["location", "building", "aisle", "rack", "shelf", "bin"])
+
+    def upper(column):
+        return df[column].astype("string").str.strip().str.upper().replace("", pd.NA)
+
+    rows = pd.DataFrame({
+        "location_code": df["location"].astype("string").str.split().str.join(" ").str.upper(),
+        "building": upper("building"),
+        "aisle": upper("aisle"),
+        "rack": pd.to_numeric(df["rack"], errors="coerce").astype("Int64"),
+        "shelf": upper("shelf"),
+        "bin": pd.to_numeric(df["bin"], errors="coerce").astype("Int64"),
+    })
+
+    rows["side"] = (rows["rack"] % 2).map({0: "RIGHT", 1: "LEFT"})
+
+    rows = rows[rows["location_code"].fillna("") != ""]
+
+    return rows.drop_duplicates(subset=["location_code"])
+
+
+# Run with {"pattern": CODE_PATTERN}. A column the export left blank
+# falls back to the code parse ensure_locations uses, and never
+# overwrites a stored value with NULL.
+MERGE_LOCATIONS = """
+INSERT INTO locations (location_code, building, aisle, rack, shelf, bin, side)
+SELECT DISTINCT ON (s.location_code)
+    s.location_code,
+    COALESCE(s.building, m[1]),
+    COALESCE(s.aisle, m[2]),
+    COALESCE(s.rack, m[3]::int),
+    COALESCE(s.shelf, m[4]),
+    COALESCE(s.bin, m[5]::int),
+    COALESCE(s.side, CASE WHEN m[3]::int % 2 = 0 THEN 'RIGHT' ELSE 'LEFT' END)
+FROM locations_staging s
+LEFT JOIN LATERAL regexp_match(s.location_code, :pattern) AS m ON true
+ORDER BY s.location_code, s.seq
+ON CONFLICT (location_code) DO UPDATE SET
+    building = COALESCE(EXCLUDED.building, locations.building),
+    aisle = COALESCE(EXCLUDED.aisle, locations.aisle),
+    rack = COALESCE(EXCLUDED.rack, locations.rack),
+    shelf = COALESCE(EXCLUDED.shelf, locations.shelf),
+    bin = COALESCE(EXCLUDED.bin, locations.bin),
+    side = COALESCE(EXCLUDED.side, locations.side),
+    updated_at = now()
+WHERE (locations.building, locations.aisle, locations.rack,
+       locations.shelf, locations.bin)
+      IS DISTINCT FROM
+      (COALESCE(EXCLUDED.building, locations.building),
+       COALESCE(EXCLUDED.aisle, locations.aisle),
+       COALESCE(EXCLUDED.rack, locations.rack),
+       COALESCE(EXCLUDED.shelf, locations.shelf),
+       COALESCE(EXCLUDED.bin, locations.bin))
+RETURNING location_code;
+"""
@@ -0,0 +1,347 @@
+# services/occupancy.py
+from sqlalchemy import text
+
+from services.capacity import DEFAULT_BIN_CAPACITY
+
+# Cartons per (bin, sku). units_per_carton of 0/NULL counts as 0 cartons.
+BIN_STOCK = """
+SELECT
+    ls.location_code,
+    ls.sku,
+    p.product_name,
+    p.brand,
+    p.category,
+    CASE
+        WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0 THEN 0
+        ELSE FLOOR(ls.units::float / p.units_per_carton)::int
+    END AS cartons
+FROM location_stock ls
+JOIN products p ON p.sku = ls.sku
+{where}
+"""
+
+# Upsert the bins in scope, then drop the ones in scope that no longer
+# hold stock. The DELETE sees the table as it was before the upsert.
+#
+# capacity: location override, else the group override for the brand /
+# category of the bin's first item, else DEFAULT_BIN_CAPACITY.
+REFRESH_BINS = """
+WITH stock AS (
+    {stock}
+),
+per_bin AS (
+    SELECT
+        location_code,
+        SUM(cartons) AS total_cartons,
+        COUNT(DISTINCT sku) AS sku_count,
+        (ARRAY_AGG(brand ORDER BY product_name, sku))[1] AS brand,
+        (ARRAY_AGG(category ORDER BY product_name, sku))[1] AS category,
+        jsonb_agg(
+            jsonb_build_object(
+                'sku', sku,
+                'product_name', product_name,
+                'cartons', cartons
+            )
+            ORDER BY product_name
+        ) AS items
+    FROM stock
+    GROUP BY location_code
+),
+fresh AS (
+    INSERT INTO bin_occupancy (
+        location_code, building, aisle, rack, shelf, bin, side,
+        total_cartons, max_cartons, status, items,
+        capacity, capacity_source, sku_count, updated_at
+    )
+    SELECT
+        l.location_code, l.building, l.aisle, l.rack, l.shelf, l.bin, l.side,
+        s.total_cartons,
+        COALESCE(lc.max_cartons, 0),
+        CASE
+            WHEN s.total_cartons = 0 THEN 'EMPTY'
+            WHEN lc.max_cartons IS NOT NULL AND s.total_cartons >= lc.max_cartons THEN 'FULL'
+            ELSE 'PARTIAL'
+        END,
+        s.items,
+        COALESCE(lc.max_cartons, g.max_cartons, :default_capacity),
+        CASE
+            WHEN lc.max_cartons IS NOT NULL THEN 'location-override'
+            WHEN g.max_cartons IS NOT NULL THEN 'group-override'
+            ELSE 'default'
+        END,
+        s.sku_count,
+        now()
+    FROM per_bin s
+    JOIN locations l ON l.location_code = s.location_code
+    LEFT JOIN location_capacity lc ON lc.location_code = l.location_code
+    LEFT JOIN product_group_capacity g
+        ON LOWER(TRIM(g.brand)) = LOWER(TRIM(s.brand))
+       AND LOWER(TRIM(g.category)) = LOWER(TRIM(s.category))
+    ORDER BY l.location_code
+    ON CONFLICT (location_code) DO UPDATE SET
+        building = EXCLUDED.building,
+        aisle = EXCLUDED.aisle,
+        rack = EXCLUDED.rack,
+        shelf = EXCLUDED.shelf,
+        bin = EXCLUDED.bin,
+        side = EXCLUDED.side,
+        total_cartons = EXCLUDED.total_cartons,
+        max_cartons = EXCLUDED.max_cartons,
+        status = EXCLUDED.status,
+        items = EXCLUDED.items,
+        capacity = EXCLUDED.capacity,
+        capacity_source = EXCLUDED.capacity_source,
+        sku_count = EXCLUDED.sku_count,
+        updated_at = EXCLUDED.updated_at
+    RETURNING location_code
+)
+DELETE FROM bin_occupancy b
+WHERE {scope}
+  AND NOT EXISTS (
+      SELECT 1 FROM fresh f WHERE f.location_code = b.location_code
+  )
+"""
+
+
+# -------------------------------------------------
+# ROLLUPS
+# -------------------------------------------------
+# bin_rollups holds one row per rack, aggregated from its bins (empty
+# bins included, via locations). Aisle, building and warehouse totals
+# are summed from the racks on read (view bin_rollup_tree), so a
+# scanner move recomputes one rack row and no shared ancestor.
+# Upserts go in node order so writers spanning racks lock them in the
+# same order.
+ROLLUP_RACKS = """
+WITH racks AS (
+    SELECT DISTINCT building, aisle, rack
+    FROM unnest(
+        CAST(:buildings AS text[]),
+        CAST(:aisles AS text[]),
+        CAST(:racks AS int[])
+    ) AS r(building, aisle, rack)
+),
+fresh AS (
+    INSERT INTO bin_rollups (
+        node, parent, level, building, aisle, rack,
+        bins, empty_bins, mixed_bins, cartons, capacity, updated_at
+    )
+    SELECT
+        l.building || '/' || l.aisle || '/' || l.rack,
+        l.building || '/' || l.aisle,
+        'rack',
+        l.building, l.aisle, l.rack,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE COALESCE(b.total_cartons, 0) = 0),
+        COUNT(*) FILTER (WHERE b.sku_count > 1),
+        COALESCE(SUM(b.total_cartons), 0),
+        SUM(COALESCE(b.capacity, lc.max_cartons, :default_capacity)),
+        now()
+    FROM locations l
+    JOIN racks r
+        ON r.building = l.building AND r.aisle = l.aisle AND r.rack = l.rack
+    LEFT JOIN bin_occupancy b ON b.location_code = l.location_code
+    LEFT JOIN location_capacity lc ON lc.location_code = l.location_code
+    GROUP BY l.building, l.aisle, l.rack
+    ORDER BY 1
+    ON CONFLICT (node) DO UPDATE SET {update}
+    RETURNING node
+)
+DELETE FROM bin_rollups u
+USING racks r
+WHERE u.level = 'rack'
+  AND u.node = r.building || '/' || r.aisle || '/' || r.rack
+  AND NOT EXISTS (SELECT 1 FROM fresh f WHERE f.node = u.node)
+"""
+
+ROLLUP_UPDATE = """
+    bins = EXCLUDED.bins,
+    empty_bins = EXCLUDED.empty_bins,
+    mixed_bins = EXCLUDED.mixed_bins,
+    cartons = EXCLUDED.cartons,
+    capacity = EXCLUDED.capacity,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_rollups(conn, racks=None):
+    """
+    Recompute the bin_rollups rows of `racks` [(building, aisle, rack),
+    ...], or of every rack when racks is None.
+    """
+    if racks is None:
+        racks = conn.execute(text("""
+            SELECT DISTINCT building, aisle, rack
+            FROM locations
+            WHERE building IS NOT NULL AND aisle IS NOT NULL AND rack IS NOT NULL
+            UNION
+            SELECT building, aisle, rack
+            FROM bin_rollups
+            WHERE level = 'rack'
+        """)).all()
+
+    racks = sorted({tuple(r) for r in racks if None not in tuple(r)})
+    if not racks:
+        return
+
+    conn.execute(text(ROLLUP_RACKS.format(update=ROLLUP_UPDATE)), {
+        "buildings": [r[0] for r in racks],
+        "aisles": [r[1] for r in racks],
+        "racks": [r[2] for r in racks],
+        "default_capacity": DEFAULT_BIN_CAPACITY,
+    })
+
+
+# bin_changes rows kept for GET /bins/changes; older clients resync
+CHANGE_RETENTION = 50000
+
+
+# -------------------------------------------------
+# REFRESH
+# -------------------------------------------------
+def refresh_bins(conn, codes=None):
+    """
+    Recompute bin_occupancy for `codes`, or for every bin when codes
+    is None, and record them in the bin_changes feed. Call inside the
+    transaction that changed the stock.
+    """
+    if codes is None:
+        conn.execute(text(REFRESH_BINS.format(
+            stock=BIN_STOCK.format(where=""),
+            scope="true",
+        )), {"default_capacity": DEFAULT_BIN_CAPACITY})
+        refresh_rollups(conn)
+        record_changes(conn, None)
+        return
+
+    codes = sorted(set(codes))
+    if not codes:
+        return
+
+    # racks the bins sit in now, and sat in before (layout may change)
+    racks = conn.execute(text("""
+        SELECT building, aisle, rack FROM locations WHERE location_code = ANY(:codes)
+        UNION
+        SELECT building, aisle, rack FROM bin_occupancy WHERE location_code = ANY(:codes)
+    """), {"codes": codes}).all()
+
+    conn.execute(text(REFRESH_BINS.format(
+        stock=BIN_STOCK.format(where="WHERE ls.location_code = ANY(:codes)"),
+        scope="b.location_code = ANY(:codes)",
+    )), {"codes": codes, "default_capacity": DEFAULT_BIN_CAPACITY})
+    refresh_rollups(conn, racks)
+    record_changes(conn, codes)
+
+
+# -------------------------------------------------
+# CHANGE FEED
+# -------------------------------------------------
+# Writers append their bins without a version. Readers stamp the rows
+# that have committed since (stamp_changes) before reading the feed:
+# stamping is serialized, so versions follow the order rows became
+# visible and a reader that has seen version N never finds a later
+# commit show up below N. Writers never wait on each other for it.
+# nextval() sits in a CTE so it runs once per row (a volatile CTE is
+# always materialized, a subquery could be rescanned by the join)
+STAMP_CHANGES = """
+WITH stamp AS (
+    SELECT id, nextval(pg_get_serial_sequence('bin_changes', 'version')) AS version
+    FROM (
+        SELECT id
+        FROM bin_changes
+        WHERE version IS NULL
+        ORDER BY id
+    ) pending
+)
+UPDATE bin_changes c
+SET version = s.version
+FROM stamp s
+WHERE c.id = s.id
+RETURNING c.version, c.location_code
+"""
+
+
+def record_changes(conn, codes):
+    """Append `codes` to bin_changes (None = full reset marker)."""
+    conn.execute(text("""
+        INSERT INTO bin_changes (location_code)
+        SELECT unnest(CAST(:codes AS text[]))
+    """), {"codes": [None] if codes is None else list(codes)})
+
+
+def stamp_changes(conn):
+    """
+    Version the committed change rows and return the latest version.
+    Run in its own short transaction, before reading the feed.
+    """
+    pending = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM bin_changes WHERE version IS NULL)"
+    )).scalar()
+
+    if pending:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('bin_changes'))"))
+        stamped = conn.execute(text(STAMP_CHANGES)).all()
+
+        resets = [version for version, code in stamped if code is None]
+
+        # a rebuild marker makes everything before it redundant
+        if resets:
+            conn.execute(
+                text("DELETE FROM bin_changes WHERE version < :v"),
+                {"v": max(resets)}
+            )
+
+        if stamped:
+            conn.execute(
+                text("DELETE FROM bin_changes WHERE version <= :v"),
+                {"v": max(version for version, _ in stamped) - CHANGE_RETENTION}
+            )
+
+    return conn.execute(text(
+        "SELECT COALESCE(MAX(version), 0) FROM bin_changes"
+    )).scalar()
+
+
+def changed_since(conn, since, version, limit):
+    """
+    Bins changed in (since, version], or None when the client has to
+    resync: the gap was pruned, crosses a full rebuild, or holds more
+    than `limit` bins.
+    """
+    feed = conn.execute(text("""
+        SELECT
+            MIN(version) AS oldest,
+            BOOL_OR(location_code IS NULL) FILTER (WHERE version > :since) AS reset,
+            ARRAY_AGG(DISTINCT location_code) FILTER (
+                WHERE version > :since AND location_code IS NOT NULL
+            ) AS codes
+        FROM bin_changes
+        WHERE version <= :version
+    """), {"since": since, "version": version}).mappings().first()
+
+    codes = feed["codes"] or []
+
+    if (
+        feed["oldest"] is None
+        or feed["oldest"] > since + 1
+        or feed["reset"]
+        or len(codes) > limit
+    ):
+        return None
+
+    return codes
+
+
+def refresh_bins_for_skus(conn, skus):
+    """Bins holding any of `skus` (after a product master change)."""
+    skus = sorted(set(skus))
+    if not skus:
+        return
+
+    codes = conn.execute(text("""
+        SELECT DISTINCT location_code
+        FROM location_stock
+        WHERE sku = ANY(:skus)
+    """), {"skus": skus}).scalars().all()
+
+    refresh_bins(conn, codes)
@@ -0,0 +1,70 @@
+# services/progress.py
+import threading
+from datetime import datetime
+
+# In-process registry of running uploads, polled by the upload page.
+# Entries are kept for the last MAX_ENTRIES uploads.
+MAX_ENTRIES = 100
+
+_lock = threading.Lock()
+_progress = {}
+
+
+def start(task_id, total_bytes=None):
+    with _lock:
+        _progress[task_id] = {
+            "id": task_id,
+            "status": "running",
+            "phase": "reading",
+            "bytes_read": 0,
+            "total_bytes": total_bytes,
+            "rows_read": 0,
+            "rows_loaded": 0,
+            "percent": 0.0,
+            "error": None,
+            "started_at": datetime.utcnow(),
+            "finished_at": None,
+        }
+
+        while len(_progress) > MAX_ENTRIES:
+            _progress.pop(next(iter(_progress)))
+
+
+def update(task_id, **fields):
+    if task_id is None:
+        return
+
+    with _lock:
+        entry = _progress.get(task_id)
+        if entry is None:
+            return
+
+        entry.update(fields)
+
+        if entry["total_bytes"]:
+            entry["percent"] = round(
+                min(entry["bytes_read"] / entry["total_bytes"], 1.0) * 100, 1
+            )
+
+
+def finish(task_id, error=None):
+    if task_id is None:
+        return
+
+    with _lock:
+        entry = _progress.get(task_id)
+        if entry is None:
+            return
+
+        entry["status"] = "failed" if error else "done"
+        entry["phase"] = entry["status"]
+        entry["error"] = error
+        entry["finished_at"] = datetime.utcnow()
+        if not error:
+            entry["percent"] = 100.0
+
+
+def get(task_id):
+    with _lock:
+        entry = _progress.get(task_id)
+        return dict(entry) if entry else None
@@ -0,0 +1,254 @@
+# services/putaway.py
+import bisect
+import threading
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from db.database import engine
+from services import capacity
+from services.occupancy import stamp_changes, changed_since
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+
+# In-memory free-capacity index over ELECTRA P-T for putaway suggestions.
+# Every stock write records its bins in bin_changes (services/occupancy),
+# so the index only re-reads the bins listed there since the version it
+# last applied; a rebuild marker or a pruned gap reloads it whole.
+#
+# Per aisle it keeps stocked bins with room as a sorted [(free, code)]
+# list (best fit = bisect on the cartons needed) and empty bins sorted
+# front to back. Empty bins take their capacity from the incoming
+# product, so it is resolved per suggestion.
+MAX_SYNC_CODES = 2000
+
+LAYOUT = """
+    SELECT
+        l.location_code,
+        l.aisle,
+        l.rack,
+        l.shelf,
+        l.bin,
+        b.capacity,
+        COALESCE(b.total_cartons, 0) AS total_cartons,
+        COALESCE(
+            ARRAY(SELECT DISTINCT i->>'sku' FROM jsonb_array_elements(b.items) AS i),
+            '{{}}'
+        ) AS skus
+    FROM locations l
+    LEFT JOIN bin_occupancy b ON b.location_code = l.location_code
+    WHERE l.building = :building
+      AND l.aisle = ANY(:aisles)
+      {where}
+"""
+
+_lock = threading.Lock()
+
+
+class FreeCapacityIndex:
+
+    def __init__(self):
+        self.version = None
+        self.bins = {}
+        self.stocked = defaultdict(list)    # aisle -> sorted [(free, code)]
+        self.empty = defaultdict(list)      # aisle -> sorted [(rack, code)]
+        self.by_sku = defaultdict(set)      # sku -> {code}
+
+    # -------------------------------------------------
+    # MAINTENANCE
+    # -------------------------------------------------
+    def _remove(self, code):
+        old = self.bins.pop(code, None)
+        if old is None:
+            return
+
+        if old["skus"]:
+            entries = self.stocked[old["aisle"]]
+            entry = (old["free"], code)
+        else:
+            entries = self.empty[old["aisle"]]
+            entry = (old["rack"] or 0, code)
+
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            entries.pop(i)
+
+        for sku in old["skus"]:
+            self.by_sku[sku].discard(code)
+            if not self.by_sku[sku]:
+                del self.by_sku[sku]
+
+    def _add(self, row):
+        code = row["location_code"]
+        skus = set(row["skus"])
+
+        entry = {
+            "location_code": code,
+            "aisle": row["aisle"],
+            "rack": row["rack"],
+            "shelf": row["shelf"],
+            "bin": row["bin"],
+            "capacity": row["capacity"],
+            "total_cartons": row["total_cartons"],
+            "free": (row["capacity"] or 0) - row["total_cartons"],
+            "skus": skus,
+        }
+        self.bins[code] = entry
+
+        if skus:
+            bisect.insort(self.stocked[entry["aisle"]], (entry["free"], code))
+        else:
+            bisect.insort(self.empty[entry["aisle"]], (entry["rack"] or 0, code))
+
+        for sku in skus:
+            self.by_sku[sku].add(code)
+
+    def apply(self, rows, codes):
+        """Replace `codes` with their fresh rows (absent = left the layout)."""
+        for code in codes:
+            self._remove(code)
+
+        for row in rows:
+            self._add(row)
+
+    def load(self, rows):
+        self.__init__()
+        for row in rows:
+            self._add(row)
+
+
+_index = FreeCapacityIndex()
+
+
+def _rows(conn, codes=None):
+    where = "" if codes is None else "AND l.location_code = ANY(:codes)"
+
+    return conn.execute(text(LAYOUT.format(where=where)), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+        "codes": codes,
+    }).mappings().all()
+
+
+def _sync():
+    """Catch the index up with bin_changes. Caller holds _lock."""
+    with engine.begin() as conn:
+        version = stamp_changes(conn)
+
+    if _index.version == version:
+        return _index
+
+    with engine.connect() as conn:
+
+        codes = None
+        if _index.version is not None and _index.version < version:
+            codes = changed_since(conn, _index.version, version, MAX_SYNC_CODES)
+
+        if codes is None:
+            _index.load(_rows(conn))
+        else:
+            _index.apply(_rows(conn, codes), codes)
+
+        _index.version = version
+
+        return _index
+
+
+# -------------------------------------------------
+# SUGGEST
+# -------------------------------------------------
+def suggest(skus, cartons, brand=None, category=None, aisle=None, limit=10):
+    """
+    Best destination bins for `cartons` of `skus` (one SKU, or the
+    contents of a pallet).
+
+    Tiers: bins holding only these SKUs (co-location), then empty bins,
+    then bins holding other SKUs (would become mixed). Within a tier the
+    preferred aisle comes first (`aisle`, else the aisle already holding
+    most of these SKUs), then the tightest fit.
+    """
+    skus = set(skus)
+
+    with _lock:
+        idx = _sync()
+
+        same = set()
+        for sku in skus:
+            same |= idx.by_sku.get(sku, set())
+
+        # aisles already holding these SKUs, most cartons first
+        held = defaultdict(int)
+        for code in same:
+            held[idx.bins[code]["aisle"]] += idx.bins[code]["total_cartons"]
+
+        preferred = [aisle] if aisle else sorted(held, key=lambda a: (-held[a], a))
+
+        def aisle_rank(a):
+            return preferred.index(a) if a in preferred else len(preferred) + ALLOWED_AISLES.index(a)
+
+        candidates = []
+
+        for code in same:
+            b = idx.bins[code]
+            if b["skus"] <= skus and b["free"] >= cartons:
+                candidates.append((0, b, b["free"], b["capacity"]))
+
+        # each aisle's best fits and front-most empty bins
+        for a in ALLOWED_AISLES:
+
+            entries = idx.stocked.get(a, [])
+            i = bisect.bisect_left(entries, (cartons, ""))
+
+            for free, code in entries[i:i + limit]:
+                b = idx.bins[code]
+                if not b["skus"] <= skus:
+                    candidates.append((2, b, free, b["capacity"]))
+
+            # one resolve per aisle: each call checks the override version
+            empty = idx.empty.get(a, [])
+            resolved = capacity.resolve([
+                {"location_code": code, "brand": brand, "category": category}
+                for _, code in empty
+            ])
+
+            fits = 0
+            for (_, code), res in zip(empty, resolved):
+                b = idx.bins[code]
+                cap = res["max_cartons"]
+
+                if cap >= cartons:
+                    candidates.append((1, b, cap, cap))
+                    fits += 1
+                    if fits >= limit:
+                        break
+
+        version = idx.version
+
+    reasons = ["same-sku", "empty", "mixed"]
+
+    candidates.sort(key=lambda c: (
+        c[0],
+        aisle_rank(c[1]["aisle"]),
+        c[2] - cartons,
+        c[1]["rack"] or 0,
+        c[1]["location_code"],
+    ))
+
+    return {
+        "version": version,
+        "cartons": cartons,
+        "suggestions": [
+            {
+                "location_code": b["location_code"],
+                "aisle": b["aisle"],
+                "rack": b["rack"],
+                "shelf": b["shelf"],
+                "bin": b["bin"],
+                "reason": reasons[tier],
+                "capacity": cap,
+                "free_cartons": free,
+                "free_after": free - cartons,
+                "current_skus": sorted(b["skus"]),
+            }
+            for tier, b, free, cap in candidates[:limit]
+        ],
+    }
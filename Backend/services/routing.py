@@ -0,0 +1,330 @@
+# services/routing.py
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+
+# Walking model of ELECTRA P-T: parallel aisles joined by a cross aisle
+# at the front (dispatch side) and one at the back. Odd racks are on the
+# LEFT and even racks on the RIGHT, so racks 2k-1 and 2k face each other
+# and share one stop position along the aisle.
+RACK_PITCH_M = 2.7
+AISLE_PITCH_M = 3.5
+
+# picking starts and ends at the front of the first aisle
+DEPOT = (0, 0)
+
+MAX_2OPT_ROUNDS = 1000
+
+
+# -------------------------------------------------
+# LAYOUT
+# -------------------------------------------------
+def stop_position(rack):
+    """Rack number -> position along the aisle (1, 1, 2, 2, 3, ...)."""
+    return (np.asarray(rack, dtype=int) + 1) // 2
+
+
+@lru_cache(maxsize=8)
+def distance_matrix(aisle_length):
+    """
+    Walking distance between every (aisle, position) node, node id =
+    aisle_index * (aisle_length + 1) + position. Position 0 is the front
+    cross aisle, aisle_length the back one.
+    """
+    positions = aisle_length + 1
+    nodes = np.arange(len(ALLOWED_AISLES) * positions)
+    aisle = nodes // positions
+    pos = nodes % positions
+
+    same_aisle = aisle[:, None] == aisle[None, :]
+
+    along = np.abs(pos[:, None] - pos[None, :])
+    via_cross = np.minimum(
+        pos[:, None] + pos[None, :],
+        2 * aisle_length - pos[:, None] - pos[None, :],
+    )
+    across = np.abs(aisle[:, None] - aisle[None, :])
+
+    distance = np.where(
+        same_aisle,
+        along * RACK_PITCH_M,
+        via_cross * RACK_PITCH_M + across * AISLE_PITCH_M,
+    )
+    distance.setflags(write=False)
+
+    return distance
+
+
+# -------------------------------------------------
+# LOAD
+# -------------------------------------------------
+def load_candidates(conn, skus):
+    """Stocked P-T locations holding whole cartons of the given SKUs."""
+    aisle_length = conn.execute(text("""
+        SELECT COALESCE(MAX((rack + 1) / 2), 1) + 1
+        FROM locations
+        WHERE building = :building
+          AND aisle = ANY(:aisles)
+    """), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+    }).scalar()
+
+    candidates = pd.DataFrame(conn.execute(text("""
+        SELECT
+            ls.sku,
+            ls.location_code,
+            l.aisle,
+            l.rack,
+            l.shelf,
+            l.bin,
+            l.side,
+            ls.units / p.units_per_carton AS cartons
+        FROM location_stock ls
+        JOIN locations l ON l.location_code = ls.location_code
+        JOIN products p ON p.sku = ls.sku
+        WHERE ls.sku = ANY(:skus)
+          AND l.building = :building
+          AND l.aisle = ANY(:aisles)
+          AND l.rack IS NOT NULL
+          AND p.units_per_carton > 0
+          AND ls.units >= p.units_per_carton
+    """), {
+        "skus": sorted(set(skus)),
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+    }).all(), columns=["sku", "location_code", "aisle", "rack", "shelf", "bin", "side", "cartons"])
+
+    return candidates, aisle_length
+
+
+# -------------------------------------------------
+# ALLOCATE LINES TO LOCATIONS
+# -------------------------------------------------
+def allocate(lines, candidates, aisle_length):
+    """
+    Choose the locations each pick line is taken from.
+
+    Lines with the fewest candidate locations are placed first, so
+    forced stops are known before the flexible lines choose. A line
+    then takes the location nearest to a stop already on the route
+    (the depot at the start) that can cover it alone, and only splits
+    over several locations, nearest first, when none can.
+    """
+    distance = distance_matrix(aisle_length)
+    positions = aisle_length + 1
+
+    candidates = candidates.copy()
+    candidates["node"] = (
+        candidates["aisle"].map({a: i for i, a in enumerate(ALLOWED_AISLES)}).to_numpy(int) * positions
+        + stop_position(candidates["rack"])
+    )
+    by_sku = {sku: group for sku, group in candidates.groupby("sku", sort=False)}
+
+    # remaining cartons per (location, sku) when lines repeat a SKU
+    remaining = {
+        (r.location_code, r.sku): r.cartons
+        for r in candidates.itertuples(index=False)
+    }
+
+    depot = DEPOT[0] * positions + DEPOT[1]
+    stops = [depot]
+    picks = []
+    unfulfilled = []
+
+    order = sorted(
+        range(len(lines)),
+        key=lambda i: (len(by_sku.get(lines[i]["sku"], ())), lines[i]["sku"])
+    )
+
+    for i in order:
+        sku, need = lines[i]["sku"], lines[i]["cartons"]
+        group = by_sku.get(sku)
+
+        if group is None:
+            unfulfilled.append({"sku": sku, "requested": need, "short": need})
+            continue
+
+        available = np.array([remaining[(code, sku)] for code in group["location_code"]])
+        nodes = group["node"].to_numpy()
+
+        # distance from each candidate to the nearest stop chosen so far
+        near = distance[np.ix_(nodes, np.unique(stops))].min(axis=1)
+
+        covering = np.flatnonzero(available >= need)
+
+        if len(covering):
+            chosen = [covering[np.argmin(near[covering])]]
+        else:
+            chosen = np.lexsort((-available, near))
+
+        short = need
+
+        for k in chosen:
+            if short <= 0:
+                break
+            if available[k] <= 0:
+                continue
+
+            take = int(min(available[k], short))
+            code = group["location_code"].iloc[k]
+
+            remaining[(code, sku)] -= take
+            short -= take
+            stops.append(nodes[k])
+
+            picks.append({
+                "sku": sku,
+                "cartons": take,
+                "location_code": code,
+                "node": int(nodes[k]),
+            })
+
+        if short > 0:
+            unfulfilled.append({"sku": sku, "requested": need, "short": int(short)})
+
+    return picks, unfulfilled
+
+
+# -------------------------------------------------
+# ROUTE
+# -------------------------------------------------
+def tour_length(tour, distance):
+    return float(distance[tour[:-1], tour[1:]].sum())
+
+
+def s_shape(nodes, aisle_length):
+    """
+    Classic S-shape: enter every aisle with picks and walk it end to
+    end, alternating direction. An odd last aisle is walked in and back.
+    """
+    positions = aisle_length + 1
+    nodes = np.asarray(nodes)
+    aisle, pos = nodes // positions, nodes % positions
+
+    tour = []
+    forward = True
+
+    for a in np.unique(aisle):
+        in_aisle = np.sort(pos[aisle == a])
+        if not forward:
+            in_aisle = in_aisle[::-1]
+        tour.extend(a * positions + in_aisle)
+        forward = not forward
+
+    return np.array(tour, dtype=int)
+
+
+def nearest_neighbour(nodes, depot, distance):
+    left = list(nodes)
+    tour = []
+    current = depot
+
+    while left:
+        k = int(np.argmin(distance[current, left]))
+        current = left.pop(k)
+        tour.append(current)
+
+    return np.array(tour, dtype=int)
+
+
+def two_opt(tour, distance):
+    """
+    Best-improvement 2-opt on a closed tour (depot at both ends). All
+    edge pairs are scored at once per round with NumPy.
+    """
+    tour = tour.copy()
+    n = len(tour) - 1
+
+    if n < 3:
+        return tour
+
+    later = np.triu(np.ones((n, n), dtype=bool), k=2)
+
+    for _ in range(MAX_2OPT_ROUNDS):
+        a, b = tour[:-1], tour[1:]
+        edge = distance[a, b]
+
+        delta = (
+            distance[a[:, None], a[None, :]]
+            + distance[b[:, None], b[None, :]]
+            - edge[:, None]
+            - edge[None, :]
+        )
+        delta[~later] = 0
+
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[i, j] > -1e-9:
+            break
+
+        tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+
+    return tour
+
+
+def route(picks, candidates, aisle_length):
+    """
+    Walk order for the allocated picks. Locations at the same stop
+    (facing racks, any shelf or bin) are visited together.
+    """
+    started = time.perf_counter()
+
+    distance = distance_matrix(aisle_length)
+    depot = DEPOT[0] * (aisle_length + 1) + DEPOT[1]
+
+    nodes = np.unique([p["node"] for p in picks]) if picks else np.array([], dtype=int)
+
+    def closed(order):
+        return np.concatenate([[depot], order, [depot]]).astype(int)
+
+    baseline = closed(s_shape(nodes, aisle_length))
+    greedy = closed(nearest_neighbour(nodes, depot, distance))
+
+    start = min((baseline, greedy), key=lambda t: tour_length(t, distance))
+    best = two_opt(start, distance)
+
+    sequence = {node: k for k, node in enumerate(best[1:-1])}
+
+    layout = (
+        candidates.drop_duplicates(subset=["location_code"])
+        .set_index("location_code")[["aisle", "rack", "shelf", "bin", "side"]]
+    )
+
+    stops = {}
+
+    for p in picks:
+        stop = stops.get(p["location_code"])
+        if stop is None:
+            info = layout.loc[p["location_code"]]
+            stop = stops[p["location_code"]] = {
+                "location_code": p["location_code"],
+                "aisle": info["aisle"],
+                "rack": int(info["rack"]),
+                "shelf": info["shelf"],
+                "bin": None if pd.isna(info["bin"]) else int(info["bin"]),
+                "side": info["side"],
+                "stop": sequence[p["node"]] + 1,
+                "picks": [],
+            }
+        stop["picks"].append({"sku": p["sku"], "cartons": p["cartons"]})
+
+    walk = sorted(
+        stops.values(),
+        key=lambda s: (s["stop"], s["side"] or "", s["shelf"] or "", s["bin"] or 0, s["location_code"])
+    )
+
+    for k, s in enumerate(walk, start=1):
+        s["sequence"] = k
+
+    return walk, {
+        "stops": len(nodes),
+        "locations": len(walk),
+        "distance_m": round(tour_length(best, distance), 1),
+        "s_shape_distance_m": round(tour_length(baseline, distance), 1),
+        "routing_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,255 @@
+# services/slotting.py
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from services.bulk_ingest import create_staging_table, copy_dataframe
+from services.locations import WAREHOUSE_BUILDING, ALLOWED_AISLES
+
+# Cumulative share of daily sales covered by the A and B bands
+A_SHARE = 0.80
+B_SHARE = 0.95
+
+BANDS = np.array(["A", "B", "C"])
+
+# Accessibility = weighted mix of shelf level, rack depth and aisle.
+# Shelf A is floor level; aisles and racks are numbered from dispatch,
+# so P1 is the nearest rack.
+SHELF_WEIGHTS = {"A": 1.0, "B": 0.8, "C": 0.5, "D": 0.3}
+WEIGHT_SHELF = 0.5
+WEIGHT_RACK = 0.3
+WEIGHT_AISLE = 0.2
+
+
+# -------------------------------------------------
+# STORE VELOCITY (from /purchase/analyze)
+# -------------------------------------------------
+def store_velocity(conn, velocity_df, period_start, period_end):
+    """
+    Replace sku_velocity with the latest analysis.
+    velocity_df columns: sku, qty_sold, avg_daily_sales
+    """
+    df = velocity_df.dropna(subset=["sku"]).copy()
+    df["sku"] = df["sku"].astype(str).str.strip()
+    df = df[df["sku"] != ""].drop_duplicates(subset=["sku"])
+    df["period_start"] = period_start.date()
+    df["period_end"] = period_end.date()
+
+    columns = ["sku", "qty_sold", "avg_daily_sales", "period_start", "period_end"]
+
+    create_staging_table(conn, "velocity_stage", {
+        "sku": "TEXT",
+        "qty_sold": "NUMERIC",
+        "avg_daily_sales": "NUMERIC",
+        "period_start": "DATE",
+        "period_end": "DATE",
+    })
+    copy_dataframe(conn, df, "velocity_stage", columns)
+
+    conn.execute(text("DELETE FROM sku_velocity"))
+    conn.execute(text(f"""
+        INSERT INTO sku_velocity ({", ".join(columns)})
+        SELECT {", ".join(columns)}
+        FROM velocity_stage
+    """))
+
+    return len(df)
+
+
+# -------------------------------------------------
+# ABC BANDS
+# -------------------------------------------------
+def abc_classes(sales):
+    """
+    Daily sales array -> "A" / "B" / "C" per SKU. A SKU lands in the band
+    its sales start in, so the single fastest mover is always A.
+    Non-sellers are C.
+    """
+    sales = np.nan_to_num(np.asarray(sales, dtype=float)).clip(min=0)
+    classes = np.full(len(sales), "C", dtype="<U1")
+
+    total = sales.sum()
+    if total <= 0:
+        return classes
+
+    order = np.argsort(-sales, kind="stable")
+    ranked = sales[order]
+    share_before = (np.cumsum(ranked) - ranked) / total
+
+    band = np.where(share_before < A_SHARE, "A", np.where(share_before < B_SHARE, "B", "C"))
+    band[ranked <= 0] = "C"
+
+    classes[order] = band
+    return classes
+
+
+# -------------------------------------------------
+# ACCESSIBILITY
+# -------------------------------------------------
+def accessibility(aisle, rack, shelf):
+    """Layout columns -> score in [0, 1], higher is easier to pick."""
+    aisle_pos = pd.Series(aisle).map({a: i for i, a in enumerate(ALLOWED_AISLES)})
+    aisle_pos = aisle_pos.fillna(len(ALLOWED_AISLES) - 1).to_numpy(float)
+    aisle_term = 1 - aisle_pos / max(len(ALLOWED_AISLES) - 1, 1)
+
+    rack = pd.to_numeric(pd.Series(rack), errors="coerce").to_numpy(float)
+    deepest = np.nanmax(rack) if np.isfinite(rack).any() else 1
+    rack = np.where(np.isfinite(rack), rack, deepest)
+    rack_term = 1 - (rack - 1) / max(deepest - 1, 1)
+
+    shelf_term = pd.Series(shelf).map(SHELF_WEIGHTS).fillna(min(SHELF_WEIGHTS.values()))
+
+    return (
+        WEIGHT_SHELF * shelf_term.to_numpy(float)
+        + WEIGHT_RACK * rack_term
+        + WEIGHT_AISLE * aisle_term
+    )
+
+
+# -------------------------------------------------
+# LOAD
+# -------------------------------------------------
+def load_slotting_data(conn):
+    slots = pd.DataFrame(conn.execute(text("""
+        SELECT location_code, aisle, rack, shelf
+        FROM locations
+        WHERE building = :building
+          AND aisle = ANY(:aisles)
+    """), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+    }).all(), columns=["location_code", "aisle", "rack", "shelf"])
+
+    stock = pd.DataFrame(conn.execute(text("""
+        SELECT
+            ls.location_code,
+            ls.sku,
+            CASE
+                WHEN p.units_per_carton IS NULL OR p.units_per_carton = 0 THEN 0
+                ELSE ls.units / p.units_per_carton
+            END AS cartons,
+            ls.units
+        FROM location_stock ls
+        JOIN locations l ON l.location_code = ls.location_code
+        LEFT JOIN products p ON p.sku = ls.sku
+        WHERE l.building = :building
+          AND l.aisle = ANY(:aisles)
+          AND ls.units > 0
+    """), {
+        "building": WAREHOUSE_BUILDING,
+        "aisles": ALLOWED_AISLES,
+    }).all(), columns=["location_code", "sku", "cartons", "units"])
+
+    velocity = pd.DataFrame(conn.execute(text("""
+        SELECT sku, avg_daily_sales::float8, period_start, period_end, updated_at
+        FROM sku_velocity
+    """)).all(), columns=["sku", "avg_daily_sales", "period_start", "period_end", "updated_at"])
+
+    return slots, stock, velocity
+
+
+# -------------------------------------------------
+# RECOMMEND
+# -------------------------------------------------
+def recommend(slots, stock, velocity, limit=200):
+    """
+    Rank relocations that bring A-band bins into prime slots.
+
+    Slots are ordered by accessibility; the best N of them are prime,
+    N being the number of bins holding an A SKU. Each A bin outside
+    prime is paired with the best prime slot not already holding an A
+    bin, hottest bin first. A target holding stock becomes a swap.
+    Gain = bin sales/day x accessibility improvement.
+    """
+    started = time.perf_counter()
+
+    velocity = velocity.assign(velocity_class=abc_classes(velocity["avg_daily_sales"]))
+
+    stock = stock.merge(velocity[["sku", "avg_daily_sales", "velocity_class"]], on="sku", how="left")
+    stock["avg_daily_sales"] = stock["avg_daily_sales"].fillna(0.0)
+    stock["velocity_class"] = stock["velocity_class"].fillna("C")
+
+    # one row per stocked bin: hottest band and total sales/day
+    stock["band"] = np.searchsorted(BANDS, stock["velocity_class"].to_numpy())
+    bins = stock.groupby("location_code", sort=False).agg(
+        band=("band", "min"),
+        heat=("avg_daily_sales", "sum"),
+    )
+    bins["velocity_class"] = BANDS[bins["band"].to_numpy()]
+
+    slots = slots.drop_duplicates(subset=["location_code"]).copy()
+    slots["access"] = accessibility(slots["aisle"], slots["rack"], slots["shelf"])
+    slots = slots.sort_values(["access", "location_code"], ascending=[False, True], ignore_index=True)
+
+    slots = slots.join(bins[["velocity_class", "heat"]], on="location_code")
+    slots["heat"] = slots["heat"].fillna(0.0)
+
+    is_a = (slots["velocity_class"] == "A").to_numpy()
+    prime = np.arange(len(slots)) < is_a.sum()
+
+    misplaced = np.flatnonzero(is_a & ~prime)
+    misplaced = misplaced[np.argsort(-slots["heat"].to_numpy()[misplaced], kind="stable")]
+
+    open_prime = np.flatnonzero(prime & ~is_a)
+
+    pairs = min(len(misplaced), len(open_prime))
+    src, dst = misplaced[:pairs], open_prime[:pairs]
+
+    access = slots["access"].to_numpy()
+    heat = slots["heat"].to_numpy()
+    gain = heat[src] * (access[dst] - access[src])
+
+    keep = gain > 0
+    src, dst, gain = src[keep], dst[keep], gain[keep]
+
+    order = np.argsort(-gain, kind="stable")
+    src, dst, gain = src[order], dst[order], gain[order]
+
+    codes = slots["location_code"].to_numpy()
+    classes = slots["velocity_class"].to_numpy()
+
+    # SKU lists only for the bins in the returned page
+    listed = stock[stock["location_code"].isin(np.concatenate([codes[src[:limit]], codes[dst[:limit]]]))]
+    contents = {
+        code: group[["sku", "cartons", "units", "avg_daily_sales", "velocity_class"]].to_dict(orient="records")
+        for code, group in listed.groupby("location_code", sort=False)
+    }
+
+    relocations = []
+
+    for rank, (s, d, g) in enumerate(zip(src[:limit], dst[:limit], gain[:limit]), start=1):
+        displaced = contents.get(codes[d], [])
+
+        relocations.append({
+            "rank": rank,
+            "action": "swap" if displaced else "move",
+            "from_location": codes[s],
+            "to_location": codes[d],
+            "from_accessibility": round(float(access[s]), 3),
+            "to_accessibility": round(float(access[d]), 3),
+            "avg_daily_sales": round(float(heat[s]), 3),
+            "gain": round(float(g), 3),
+            "skus": contents.get(codes[s], []),
+            "displaced_class": classes[d] if displaced else None,
+            "displaced_skus": displaced,
+        })
+
+    class_counts = pd.Series(velocity["velocity_class"]).value_counts()
+
+    return {
+        "relocations": relocations,
+        "summary": {
+            "skus": len(velocity),
+            "classes": {c: int(class_counts.get(c, 0)) for c in ("A", "B", "C")},
+            "slots": len(slots),
+            "prime_slots": int(prime.sum()),
+            "a_bins_in_prime": int((is_a & prime).sum()),
+            "a_bins_outside_prime": len(misplaced),
+            "recommended": len(src),
+            "total_gain": round(float(gain.sum()), 3),
+            "velocity_updated_at": velocity["updated_at"].dropna().max() if velocity["updated_at"].notna().any() else None,
+            "planning_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    }
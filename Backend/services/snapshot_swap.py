@@ -0,0 +1,179 @@
+# services/snapshot_swap.py
+import re
+from sqlalchemy import text
+
+# Readers queue behind the ACCESS EXCLUSIVE lock the rename needs.
+# Fail the upload rather than stall the floor if it can't get it quickly.
+SWAP_LOCK_TIMEOUT = "5s"
+
+INDEX_DEF = re.compile(r"^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON (?:ONLY )?)(\S+)( .*)$")
+
+
+def _shadow_name(name):
+    # identifiers are capped at 63 bytes
+    return f"{name[:56]}_shadow"
+
+
+# -------------------------------------------------
+# CREATE SHADOW
+# -------------------------------------------------
+def create_shadow_table(conn, table):
+    """
+    Empty copy of `table` (columns, defaults, checks) without indexes,
+    so the bulk load doesn't pay for index maintenance row by row.
+    Blocks writes to `table` until the caller's transaction ends.
+    """
+    shadow = _shadow_name(table)
+
+    # one snapshot build at a time
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:t))"),
+        {"t": shadow}
+    )
+
+    # Writers queue until the rename and then land in the new table;
+    # otherwise they'd commit into the live table and be dropped with
+    # it. EXCLUSIVE still lets SELECTs through.
+    conn.execute(text(f"LOCK TABLE {table} IN EXCLUSIVE MODE"))
+
+    conn.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+    conn.execute(text(f"""
+        CREATE TABLE {shadow} (
+            LIKE {table}
+            INCLUDING DEFAULTS
+            INCLUDING CONSTRAINTS
+            INCLUDING IDENTITY
+            INCLUDING GENERATED
+        )
+    """))
+
+    return shadow
+
+
+# -------------------------------------------------
+# BUILD INDEXES ON SHADOW
+# -------------------------------------------------
+def build_shadow_indexes(conn, table):
+    """
+    Recreate the live table's indexes, primary/unique keys and foreign
+    keys on the loaded shadow. Returns the renames to apply after swap.
+    """
+    shadow = _shadow_name(table)
+    renames = []
+
+    indexes = conn.execute(text("""
+        SELECT
+            i.relname AS index_name,
+            pg_get_indexdef(i.oid) AS definition,
+            c.conname AS constraint_name,
+            c.contype AS constraint_type
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c
+            ON c.conindid = x.indexrelid
+           AND c.conrelid = x.indrelid
+        WHERE x.indrelid = CAST(:table AS regclass)
+    """), {"table": table}).mappings().all()
+
+    for idx in indexes:
+
+        match = INDEX_DEF.match(idx["definition"])
+        if not match:
+            raise RuntimeError(f"Cannot rebuild index {idx['index_name']}")
+
+        index_shadow = _shadow_name(idx["index_name"])
+
+        conn.execute(text(
+            match.group(1) + index_shadow + match.group(3) + shadow + match.group(5)
+        ))
+
+        if idx["constraint_type"] in ("p", "u"):
+
+            kind = "PRIMARY KEY" if idx["constraint_type"] == "p" else "UNIQUE"
+            constraint_shadow = _shadow_name(idx["constraint_name"])
+
+            conn.execute(text(f"""
+                ALTER TABLE {shadow}
+                ADD CONSTRAINT {constraint_shadow} {kind} USING INDEX {index_shadow}
+            """))
+
+            renames.append(
+                f"ALTER TABLE {table} RENAME CONSTRAINT {constraint_shadow} "
+                f"TO {idx['constraint_name']}"
+            )
+
+        else:
+            renames.append(f"ALTER INDEX {index_shadow} RENAME TO {idx['index_name']}")
+
+    foreign_keys = conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass)
+          AND contype = 'f'
+    """), {"table": table}).mappings().all()
+
+    for fk in foreign_keys:
+
+        constraint_shadow = _shadow_name(fk["conname"])
+
+        conn.execute(text(f"""
+            ALTER TABLE {shadow}
+            ADD CONSTRAINT {constraint_shadow} {fk["definition"]}
+        """))
+
+        renames.append(
+            f"ALTER TABLE {table} RENAME CONSTRAINT {constraint_shadow} TO {fk['conname']}"
+        )
+
+    conn.execute(text(f"ANALYZE {shadow}"))
+
+    return renames
+
+
+# -------------------------------------------------
+# SWAP
+# -------------------------------------------------
+def swap_shadow_table(conn, table, renames):
+    """
+    Rename shadow into place and drop the old table. Only this step
+    takes the ACCESS EXCLUSIVE lock; commit right after it.
+    """
+    shadow = _shadow_name(table)
+    old = f"{table[:59]}_old"
+
+    conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    conn.execute(text(f"ALTER TABLE {shadow} RENAME TO {table}"))
+
+    # serial columns: the shadow's defaults still point at sequences
+    # owned by the old table, hand them over before dropping it
+    sequences = conn.execute(text("""
+        SELECT a.attname AS column_name,
+               pg_get_serial_sequence(:old, a.attname) AS sequence_name
+        FROM pg_attribute a
+        WHERE a.attrelid = CAST(:old AS regclass)
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+    """), {"old": old}).mappings().all()
+
+    for seq in sequences:
+        if seq["sequence_name"] and not _is_identity(conn, old, seq["column_name"]):
+            conn.execute(text(
+                f"ALTER SEQUENCE {seq['sequence_name']} "
+                f"OWNED BY {table}.{seq['column_name']}"
+            ))
+
+    conn.execute(text(f"DROP TABLE {old}"))
+
+    for statement in renames:
+        conn.execute(text(statement))
+
+
+def _is_identity(conn, table, column):
+    return conn.execute(text("""
+        SELECT attidentity <> ''
+        FROM pg_attribute
+        WHERE attrelid = CAST(:t AS regclass)
+          AND attname = :c
+    """), {"t": table, "c": column}).scalar()
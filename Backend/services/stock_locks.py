@@ -0,0 +1,46 @@
+# services/stock_locks.py
+from sqlalchemy import text
+
+
+# -------------------------------------------------
+# LOCATION LOCKS
+# -------------------------------------------------
+def lock_locations(conn, codes):
+    """
+    Transaction-level lock on each location in `codes`, always taken in
+    sorted order. Every scanner and pallet write locks the locations it
+    touches through here before changing location_stock, so writers on
+    the same bins queue instead of overselling or deadlocking. Call it
+    before ensure_locations too: inserting a new locations row waits on
+    any other transaction inserting the same code.
+
+    Locks are per location rather than FOR UPDATE on location_stock rows:
+    a destination row may not exist yet, and a swap changes the rows'
+    location_code, so a row lock taken by predicate would miss them.
+    """
+    codes = sorted(set(codes))
+    if not codes:
+        return
+
+    # The table lock first, before any read of location_stock: a swap
+    # upload holds EXCLUSIVE until its rename, and a writer already
+    # holding ACCESS SHARE on the old table would deadlock with it.
+    conn.execute(text("LOCK TABLE location_stock IN ROW EXCLUSIVE MODE"))
+
+    conn.execute(text("""
+        SELECT pg_advisory_xact_lock(hashtext('location:' || code))
+        FROM (
+            SELECT code
+            FROM unnest(CAST(:codes AS text[])) AS code
+            ORDER BY code
+        ) ordered
+    """), {"codes": codes})
+
+
+def stock_exists(conn, code, sku):
+    return conn.execute(text("""
+        SELECT 1
+        FROM location_stock
+        WHERE location_code = :loc
+        AND sku = :sku
+    """), {"loc": code, "sku": sku}).first() is not None
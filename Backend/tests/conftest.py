@@ -0,0 +1,127 @@
+# tests/conftest.py
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+# Tests using the `db` / `client` fixtures need a disposable Postgres
+# (with the pg_trgm extension available):
+#
+#     TEST_DATABASE_URL=postgresql://... python -m pytest
+#
+# On an empty database the first such test creates the base tables
+# from tests/schema.sql and then applies every db/migrations file in
+# order. They TRUNCATE the warehouse tables, so never point this at
+# real data. Without it they are skipped and only the unit tests run.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# db.database reads DATABASE_URL on import, before any test module loads
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+SCHEMA = Path(__file__).with_name("schema.sql")
+MIGRATIONS = sorted((Path(__file__).parents[1] / "db" / "migrations").glob("*.sql"))
+
+TABLES = [
+    "products",
+    "locations",
+    "location_stock",
+    "location_capacity",
+    "product_group_capacity",
+    "bin_occupancy",
+    "bin_rollups",
+    "bin_changes",
+    "stock_movements",
+    "upload_history",
+    "pallets",
+    "pallet_items",
+    "sku_velocity",
+]
+
+
+@pytest.fixture(scope="session")
+def schema():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+
+    from sqlalchemy import text
+    from db.database import engine
+
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('products')")).scalar() is None:
+            # raw cursor: the migrations contain literal % signs
+            cursor = conn.connection.cursor()
+            for path in [SCHEMA, *MIGRATIONS]:
+                cursor.execute(path.read_text())
+
+    return engine
+
+
+@pytest.fixture
+def db(schema):
+    from sqlalchemy import text
+    from services import capacity
+
+    engine = schema
+
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(TABLES)}"))
+
+    capacity.invalidate()
+
+    return engine
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import main
+
+    return TestClient(main.app)
+
+
+def csv_file(rows):
+    """[[header...], [row...], ...] -> in-memory CSV upload."""
+    text = "\n".join(",".join(str(v) for v in row) for row in rows) + "\n"
+    return io.BytesIO(text.encode())
+
+
+# SKU, units per carton
+PRODUCTS = [
+    ["SKU", "Product Name", "Category", "hidden carton qty"],
+    ["A1", "Apple Ice", "Disposables", 10],
+    ["B2", "Blue Razz", "Disposables", 5],
+    ["C3", "Cola", "E-liquids", 12],
+]
+
+LOCATION_HEADER = ["Location", "Building", "Aisle", "Rack", "Shelf", "Bin", "SKU(s)", "QTY"]
+
+
+def location_row(code, skus="-", qty="-"):
+    """"ELECTRA P1-A2" -> a WMS export row with its layout columns."""
+    building, rest = code.split(" ")
+    aisle, shelf_bin = rest[0], rest[1:]
+    rack, shelf_bin = shelf_bin.split("-")
+    return [code, building, aisle, rack, shelf_bin[0], shelf_bin[1:], skus, qty]
+
+
+@pytest.fixture
+def upload(client):
+    """upload(products=..., locations=[location_row(...)], mode=...)"""
+
+    def _upload(locations=None, mode="snapshot", products=PRODUCTS):
+        if products is not None:
+            r = client.post("/upload/products", files={
+                "products_file": ("products.csv", csv_file(products)),
+            })
+            assert r.status_code == 200, r.text
+
+        if locations is not None:
+            r = client.post(f"/upload/location-stock?mode={mode}", files={
+                "location_file": ("location.csv", csv_file([LOCATION_HEADER] + locations)),
+            })
+            assert r.status_code == 200, r.text
+            return r.json()
+
+    return _upload
@@ -0,0 +1,69 @@
+-- Base tables the app expects before db/migrations/*.sql run.
+-- They predate the migrations folder, so tests/conftest.py applies
+-- this file and then every migration, in order, to an empty test
+-- database.
+
+CREATE TABLE products (
+    sku TEXT PRIMARY KEY,
+    product_name TEXT,
+    category TEXT,
+    brand TEXT,
+    units_per_carton INTEGER,
+    unit_barcode TEXT,
+    carton_barcode TEXT,
+    outer_barcode TEXT,
+    pallet_carton_capacity INTEGER
+);
+
+CREATE TABLE location_stock (
+    id SERIAL,
+    location_code TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (location_code, sku)
+);
+
+CREATE INDEX location_stock_sku_idx ON location_stock (sku);
+
+CREATE TABLE location_capacity (
+    location_code TEXT PRIMARY KEY,
+    max_cartons INTEGER,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE product_group_capacity (
+    brand TEXT,
+    category TEXT,
+    max_cartons INTEGER,
+    PRIMARY KEY (brand, category)
+);
+
+CREATE TABLE upload_history (
+    id SERIAL PRIMARY KEY,
+    product_rows INTEGER,
+    location_rows INTEGER,
+    upload_time TIMESTAMP
+);
+
+CREATE TABLE stock_movements (
+    id SERIAL PRIMARY KEY,
+    sku TEXT,
+    from_location TEXT,
+    to_location TEXT,
+    cartons INTEGER,
+    user_name TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE pallets (
+    pallet_id TEXT PRIMARY KEY,
+    status TEXT
+);
+
+CREATE TABLE pallet_items (
+    pallet_id TEXT,
+    sku TEXT,
+    cartons INTEGER,
+    PRIMARY KEY (pallet_id, sku)
+);
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+
+from services import capacity, data_version
+
+pytestmark = pytest.mark.db
+
+
+def resolved(code):
+    [bin_] = capacity.resolve([{"location_code": code, "brand": "ACME", "category": "Disposables"}])
+    return bin_["max_cartons"], bin_["capacity_source"]
+
+
+def test_resolve_priority(client, db):
+    assert resolved("ELECTRA P1-A1") == (capacity.DEFAULT_BIN_CAPACITY, "default")
+
+    r = client.post("/optimizer/set-group-capacity", json={
+        "brand": "acme", "category": "disposables", "max_cartons": 12,
+    })
+    assert r.status_code == 200, r.text
+    assert resolved("ELECTRA P1-A1") == (12, "group-override")
+
+    r = client.post("/locations/pallet-capacity", json={
+        "location_code": "electra p1-a1", "max_cartons": 40,
+    })
+    assert r.status_code == 200, r.text
+    assert resolved("ELECTRA P1-A1") == (40, "location-override")
+
+
+def test_overrides_follow_writes_from_other_workers(db):
+    assert resolved("ELECTRA P1-A1") == (capacity.DEFAULT_BIN_CAPACITY, "default")
+
+    # what a setter in another process does; this one's cache is not told
+    with db.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO location_capacity (location_code, max_cartons)
+            VALUES ('ELECTRA P1-A1', 8)
+        """))
+
+    assert resolved("ELECTRA P1-A1") == (capacity.DEFAULT_BIN_CAPACITY, "default")
+
+    data_version.bump(data_version.CAPACITY)
+
+    assert resolved("ELECTRA P1-A1") == (8, "location-override")
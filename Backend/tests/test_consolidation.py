@@ -0,0 +1,88 @@
+from services.consolidation import plan_consolidation
+
+
+def bin_(code, cartons, capacity=30, skus=None, loose_units=0, aisle="P"):
+    skus = {"A1": cartons} if skus is None else skus
+    return {
+        "location_code": code,
+        "aisle": aisle,
+        "rack": 1,
+        "capacity": capacity,
+        "cartons": cartons,
+        "loose_units": loose_units,
+        "skus": skus,
+    }
+
+
+def test_moves_into_fullest_bin_that_fits():
+    bins = [
+        bin_("P1-A1", 5),
+        bin_("P1-A2", 20),    # 10 free: tightest fit
+        bin_("P1-A3", 10),    # 20 free
+    ]
+
+    plan = plan_consolidation(bins)
+
+    assert [(m["from_location"], m["to_location"], m["cartons"]) for m in plan["moves"]] == [
+        ("P1-A1", "P1-A2", 5),
+    ]
+    assert plan["moves"][0]["moves"] == [
+        {"sku": "A1", "from_location": "P1-A1", "to_location": "P1-A2", "cartons": 5},
+    ]
+    assert plan["moves"][0]["target_occupancy_after"] == 83.3
+    assert plan["summary"]["bins_freed"] == 1
+
+
+def test_receiving_bin_is_never_emptied_later():
+    bins = [bin_("P1-A1", 2), bin_("P1-A2", 3), bin_("P1-A3", 4)]
+
+    plan = plan_consolidation(bins)
+
+    sources = {m["from_location"] for m in plan["moves"]}
+    targets = {m["to_location"] for m in plan["moves"]}
+
+    assert not sources & targets
+    assert sum(m["cartons"] for m in plan["moves"]) + sum(
+        b["cartons"] for b in bins if b["location_code"] in targets
+    ) == 9
+
+
+def test_single_sku_bins_only_merge_with_the_same_sku():
+    bins = [
+        bin_("P1-A1", 5, skus={"A1": 5}),
+        bin_("P1-A2", 5, skus={"B2": 5}),
+    ]
+
+    assert plan_consolidation(bins)["moves"] == []
+
+    mixed = plan_consolidation(bins, allow_mixed=True)
+    assert len(mixed["moves"]) == 1
+
+
+def test_mixed_and_loose_sources_are_skipped():
+    bins = [
+        bin_("P1-A1", 4, skus={"A1": 2, "B2": 2}),
+        bin_("P1-A2", 3, loose_units=4),
+        bin_("P1-A3", 20),    # 67%: target only
+    ]
+
+    summary = plan_consolidation(bins)["summary"]
+
+    assert summary["skipped_mixed"] == 1
+    assert summary["skipped_loose_units"] == 1
+    assert summary["bins_freed"] == 0
+
+
+def test_threshold_and_same_aisle():
+    bins = [
+        bin_("P1-A1", 5, aisle="P"),
+        bin_("Q1-A1", 10, aisle="Q"),
+        bin_("R1-A1", 25, aisle="R"),    # 83%: not a source
+    ]
+
+    plan = plan_consolidation(bins, same_aisle=True)
+    assert plan["moves"] == []
+    assert plan["summary"]["candidates"] == 2
+
+    plan = plan_consolidation(bins, threshold=20)
+    assert [m["from_location"] for m in plan["moves"]] == ["P1-A1"]
@@ -0,0 +1,107 @@
+import io
+
+import pandas as pd
+import pytest
+
+from services.csv_reader import (
+    SAMPLE_BYTES,
+    detect_encoding,
+    iter_csv,
+    map_headers,
+    read_csv,
+)
+
+ALIASES = {
+    "sku": ["sku"],
+    "units_per_carton": ["hidden carton qty"],
+    "skus": ["sku(s)", "skus"],
+}
+
+
+# -------------------------------------------------
+# HEADERS
+# -------------------------------------------------
+def test_map_headers_exact_match_ignores_case_spaces_underscores():
+    mapping = map_headers([" SKU ", "Hidden_Carton Qty"], ALIASES)
+
+    assert mapping[" SKU "] == "sku"
+    assert mapping["Hidden_Carton Qty"] == "units_per_carton"
+
+
+def test_map_headers_exact_match_wins_over_contains():
+    # "SKU(s)" contains "sku" but must stay with the skus alias
+    mapping = map_headers(["SKU(s)", "SKU"], ALIASES)
+
+    assert mapping["SKU"] == "sku"
+    assert mapping["SKU(s)"] == "skus"
+
+
+def test_map_headers_falls_back_to_contains():
+    mapping = map_headers(["Product SKU code"], {"sku": ["sku"]})
+
+    assert mapping["Product SKU code"] == "sku"
+
+
+def test_map_headers_keeps_unmatched_lowercased():
+    mapping = map_headers(["Average Cost "], ALIASES)
+
+    assert mapping == {"Average Cost ": "average cost"}
+
+
+# -------------------------------------------------
+# ENCODING
+# -------------------------------------------------
+def test_detect_encoding_utf8():
+    f = io.BytesIO("sku,name\nA1,Crème\n".encode("utf-8"))
+
+    assert detect_encoding(f) == "utf8"
+    assert f.tell() == 0
+
+
+def test_detect_encoding_latin1_byte_after_the_sample():
+    data = b"sku,qty\n" + b"A1,1\n" * (SAMPLE_BYTES // 5 + 10) + "CAFé,2\n".encode("latin1")
+    f = io.BytesIO(data)
+
+    assert len(data) > SAMPLE_BYTES
+    assert detect_encoding(f, block_bytes=4096) == "latin1"
+    assert f.tell() == 0
+
+
+def test_detect_encoding_multibyte_char_across_blocks():
+    data = ("sku\n" + "x" * 4095 + "é\n").encode("utf-8")
+
+    assert detect_encoding(io.BytesIO(data), block_bytes=4096) == "utf8"
+
+
+def test_iter_csv_streams_latin1_file_with_late_byte():
+    rows = b"sku,qty\n" + b"A1,1\n" * 20000 + "CAFé,2\n".encode("latin1") + b"B2,3\n"
+
+    chunks = list(iter_csv(io.BytesIO(rows), {"sku": ["sku"]}, block_bytes=16 * 1024))
+    df = pd.concat(chunks, ignore_index=True)
+
+    assert len(chunks) > 1
+    assert len(df) == 20002
+    assert df["sku"].iloc[-2] == "CAFé"
+
+
+# -------------------------------------------------
+# READ
+# -------------------------------------------------
+def test_read_csv_renames_strips_bom_and_coerces_numbers():
+    data = "\ufeffSKU,Hidden Carton Qty\nA1,\"1,200\"\nB2,n/a\n".encode("utf-8")
+
+    df = read_csv(io.BytesIO(data), ALIASES, {"units_per_carton": "number"})
+
+    assert list(df.columns) == ["sku", "units_per_carton"]
+    assert df["units_per_carton"].iloc[0] == 1200
+    assert pd.isna(df["units_per_carton"].iloc[1])
+
+
+def test_read_csv_missing_required_column():
+    with pytest.raises(ValueError, match="Missing required column: units_per_carton"):
+        read_csv(io.BytesIO(b"sku\nA1\n"), ALIASES, required=["sku", "units_per_carton"])
+
+
+def test_read_csv_empty_file():
+    with pytest.raises(ValueError, match="empty"):
+        read_csv(io.BytesIO(b"  \n"))
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from services.location_snapshot import normalize_location_rows
+
+
+def export(rows):
+    return pd.DataFrame(rows, columns=["location", "skus", "qty"])
+
+
+def test_lists_pair_up_by_position():
+    rows, mismatched = normalize_location_rows(export([
+        ["electra  p1-a1", "A1 B2", "10 5"],
+    ]))
+
+    assert rows.to_dict(orient="records") == [
+        {"location_code": "ELECTRA P1-A1", "sku": "A1", "units": 10},
+        {"location_code": "ELECTRA P1-A1", "sku": "B2", "units": 5},
+    ]
+    assert mismatched == []
+
+
+def test_empty_bins_are_dropped():
+    rows, mismatched = normalize_location_rows(export([
+        ["ELECTRA P1-A1", "-", "-"],
+        ["ELECTRA P1-A2", "", ""],
+        ["ELECTRA P1-A3", None, None],
+        ["", "A1", "3"],
+    ]))
+
+    assert rows.empty
+    assert mismatched == []
+
+
+def test_length_mismatch_is_skipped_and_reported():
+    rows, mismatched = normalize_location_rows(export([
+        ["ELECTRA P1-A1", "A1 B2", "10"],
+        ["ELECTRA P1-A2", "C3", "4"],
+    ]))
+
+    assert rows["location_code"].tolist() == ["ELECTRA P1-A2"]
+    assert mismatched == ["ELECTRA P1-A1"]
+
+
+def test_bad_quantities_become_zero_and_duplicates_keep_first():
+    rows, _ = normalize_location_rows(export([
+        ["ELECTRA P1-A1", "A1 A1 B2", "7 9 x"],
+    ]))
+
+    assert rows[["sku", "units"]].values.tolist() == [["A1", 7], ["B2", 0]]
+    assert rows["units"].dtype == "int64"
+
+
+def test_missing_columns_are_tolerated():
+    rows, mismatched = normalize_location_rows(pd.DataFrame({"location": ["ELECTRA P1-A1"]}))
+
+    assert rows.empty
+    assert mismatched == []
@@ -0,0 +1,186 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from conftest import location_row
+
+pytestmark = pytest.mark.db
+
+MODES = ["snapshot", "delta", "swap"]
+
+FIRST = [
+    location_row("ELECTRA P1-A1", "A1", "50"),
+    location_row("ELECTRA P1-A2", "A1 B2", "20 10"),
+    location_row("ELECTRA P2-A1"),
+    location_row("ELECTRA Q3-B1", "C3", "36"),
+    location_row("ASTON A0-A3", "B2", "5"),
+]
+
+# changed, emptied, newly stocked, unchanged and a mismatched row
+SECOND = [
+    location_row("ELECTRA P1-A1", "A1", "30"),
+    location_row("ELECTRA P1-A2"),
+    location_row("ELECTRA P2-A1", "B2 C3", "15 24"),
+    location_row("ELECTRA Q3-B1", "C3", "36"),
+    location_row("ELECTRA R4-A1", "A1 B2", "10"),
+    location_row("ASTON A0-A3", "B2", "5"),
+]
+
+
+def state(engine):
+    with engine.connect() as conn:
+        return [
+            conn.execute(text(query)).all()
+            for query in (
+                "SELECT location_code, sku, units FROM location_stock ORDER BY 1, 2",
+                """
+                SELECT location_code, building, aisle, rack, shelf, bin, side,
+                       total_cartons, max_cartons, status, items,
+                       capacity, capacity_source, sku_count
+                FROM bin_occupancy
+                ORDER BY 1
+                """,
+                """
+                SELECT node, parent, level, bins, empty_bins, mixed_bins, cartons, capacity
+                FROM bin_rollup_tree
+                ORDER BY 1
+                """,
+            )
+        ]
+
+
+@pytest.fixture
+def loaded_with(upload, db):
+    """Final state after FIRST as a snapshot, then SECOND in `mode`."""
+
+    def _loaded_with(mode):
+        with db.begin() as conn:
+            conn.execute(text("TRUNCATE locations, location_stock, bin_occupancy, bin_rollups"))
+
+        upload(FIRST, mode="snapshot")
+        result = upload(SECOND, mode=mode, products=None)
+
+        return result, state(db)
+
+    return _loaded_with
+
+
+def test_first_load_is_the_same_in_every_mode(upload, db):
+    states = []
+
+    for mode in MODES:
+        with db.begin() as conn:
+            conn.execute(text("TRUNCATE locations, location_stock, bin_occupancy, bin_rollups"))
+
+        result = upload(FIRST, mode=mode)
+        assert result["rows"] == 5
+        states.append(state(db))
+
+    assert all(s == states[0] for s in states)
+    assert len(states[0][1]) == 4
+
+
+def test_reload_is_the_same_in_every_mode(loaded_with):
+    results = {mode: loaded_with(mode) for mode in MODES}
+
+    snapshot = results["snapshot"][1]
+    for mode in MODES:
+        assert results[mode][1] == snapshot
+
+    # only the changed rows were written in delta mode
+    assert results["delta"][0]["delta"] == {"deleted": 2, "updated": 1, "inserted": 2}
+    assert results["delta"][0]["mismatched_locations"] == ["ELECTRA R4-A1"]
+
+    stock = snapshot[0]
+    assert ("ELECTRA P1-A1", "A1", 30) in stock
+    assert not [r for r in stock if r[0] in ("ELECTRA P1-A2", "ELECTRA R4-A1")]
+
+
+
+def test_swap_keeps_location_stock_writable(loaded_with, client):
+    loaded_with("swap")
+
+    r = client.post("/scanner/move", json={
+        "sku": "C3",
+        "from_location": "ELECTRA Q3-B1",
+        "to_location": "ELECTRA P1-A2",
+        "cartons": 1,
+    })
+
+    assert r.status_code == 200, r.text
+
+
+def test_swap_keeps_scanner_writes_made_during_the_build(monkeypatch, upload, client, db):
+    import api.uploads
+    from services.occupancy import refresh_bins
+
+    upload(SECOND)
+
+    building, release = threading.Event(), threading.Event()
+    build_shadow_indexes = api.uploads.build_shadow_indexes
+
+    def paused(conn, table):
+        building.set()
+        release.wait(10)
+        return build_shadow_indexes(conn, table)
+
+    monkeypatch.setattr(api.uploads, "build_shadow_indexes", paused)
+
+    results = {}
+    load = threading.Thread(target=lambda: results.update(load=upload(FIRST, mode="swap", products=None)))
+    scan = threading.Thread(target=lambda: results.update(move=client.post("/scanner/move", json={
+        "sku": "A1",
+        "from_location": "ELECTRA P1-A1",
+        "to_location": "ELECTRA P2-A1",
+        "cartons": 2,
+    })))
+
+    load.start()
+    assert building.wait(10)
+
+    # the move queues behind the load instead of landing in the old table
+    scan.start()
+    scan.join(0.5)
+    assert scan.is_alive()
+
+    release.set()
+    load.join(10)
+    scan.join(10)
+
+    assert results["move"].status_code == 200, results["move"].text
+
+    stock = state(db)[0]
+    assert ("ELECTRA P1-A1", "A1", 30) in stock
+    assert ("ELECTRA P2-A1", "A1", 20) in stock
+
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM stock_movements")).scalar() == 1
+
+    # bin_occupancy saw the move too
+    before = state(db)
+    with db.begin() as conn:
+        refresh_bins(conn)
+    assert state(db) == before
+
+
+def test_swap_reports_a_failed_occupancy_rebuild_as_loaded(monkeypatch, upload, client, db):
+    import api.uploads
+    from services import data_version
+
+    upload(FIRST)
+    before = data_version.current(data_version.STOCK)
+
+    def broken(conn, codes=None):
+        raise RuntimeError("rebuild failed")
+
+    monkeypatch.setattr(api.uploads, "refresh_bins", broken)
+
+    result = upload(SECOND, mode="swap", products=None)
+
+    assert result["status"] == "location stock loaded, occupancy rebuild failed"
+    assert result["occupancy_error"] == "rebuild failed"
+    assert ("ELECTRA P1-A1", "A1", 30) in state(db)[0]
+
+    # readers of location_stock must not keep answering 304
+    assert data_version.current(data_version.STOCK) > before
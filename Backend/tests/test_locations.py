@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from conftest import LOCATION_HEADER, csv_file, location_row
+from services.locations import export_location_rows
+
+
+def test_export_rows_leave_blank_layout_columns_null():
+    rows = export_location_rows(pd.DataFrame({
+        "location": ["electra p1-a1", "ELECTRA P2-B3"],
+        "building": ["Electra", " "],
+        "aisle": ["p", ""],
+        "rack": ["1", ""],
+        "shelf": ["a", None],
+        "bin": ["1", None],
+    }))
+
+    first, second = rows.to_dict(orient="records")
+
+    assert (first["building"], first["aisle"], first["rack"], first["side"]) == ("ELECTRA", "P", 1, "LEFT")
+    assert second["location_code"] == "ELECTRA P2-B3"
+    assert all(pd.isna(second[c]) for c in ("building", "aisle", "rack", "shelf", "bin", "side"))
+
+
+def layout(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT location_code, building, aisle, rack, shelf, bin, side
+            FROM locations
+            ORDER BY location_code
+        """)).all()
+
+
+@pytest.mark.db
+def test_export_without_layout_columns_keeps_the_parsed_layout(client, upload, db):
+    upload([
+        location_row("ELECTRA P1-A1", "A1", "50"),
+        location_row("ELECTRA Q2-B3"),
+    ])
+    before = layout(db)
+
+    # only the required columns, and a code the export never had
+    r = client.post("/upload/location-stock?mode=delta", files={
+        "location_file": ("location.csv", csv_file([
+            ["Location", "SKU(s)", "QTY"],
+            ["ELECTRA P1-A1", "A1", "40"],
+            ["ELECTRA Q2-B3", "-", "-"],
+            ["ELECTRA R4-C2", "B2", "5"],
+        ])),
+    })
+    assert r.status_code == 200, r.text
+
+    assert layout(db) == before + [("ELECTRA R4-C2", "ELECTRA", "R", 4, "C", 2, "RIGHT")]
+
+    codes = {b["location_code"] for b in client.get("/bins").json()}
+    assert codes == {"ELECTRA P1-A1", "ELECTRA R4-C2"}
+
+
+@pytest.mark.db
+def test_blank_layout_cells_fall_back_to_the_code(upload, db):
+    upload([
+        ["ELECTRA P1-A1", "", "", "", "", "", "A1", "50"],
+        location_row("ELECTRA Q2-B3"),
+    ])
+
+    assert layout(db) == [
+        ("ELECTRA P1-A1", "ELECTRA", "P", 1, "A", 1, "LEFT"),
+        ("ELECTRA Q2-B3", "ELECTRA", "Q", 2, "B", 3, "RIGHT"),
+    ]
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import text
+
+from conftest import PRODUCTS, csv_file
+
+pytestmark = pytest.mark.db
+
+
+def products(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT sku, product_name, category, units_per_carton
+            FROM products
+            ORDER BY sku
+        """)).all()
+
+
+def test_first_load_inserts_every_row(upload, db):
+    upload(products=PRODUCTS)
+
+    assert products(db) == [
+        ("A1", "Apple Ice", "Disposables", 10),
+        ("B2", "Blue Razz", "Disposables", 5),
+        ("C3", "Cola", "E-liquids", 12),
+    ]
+
+
+def test_reload_merges_into_existing_rows(client, upload, db):
+    upload(products=PRODUCTS)
+
+    r = client.post("/upload/products", files={"products_file": ("products.csv", csv_file([
+        PRODUCTS[0],
+        ["B2", "Blue Razz Ice", "Disposables", 6],
+        ["D4", "Dragon Fruit", "Disposables", 10],
+        # first occurrence of a SKU wins
+        ["D4", "Duplicate", "Disposables", 99],
+    ]))})
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["rows"], body["inserted"], body["updated"]) == (2, 1, 1)
+
+    assert products(db) == [
+        ("A1", "Apple Ice", "Disposables", 10),
+        ("B2", "Blue Razz Ice", "Disposables", 6),
+        ("C3", "Cola", "E-liquids", 12),
+        ("D4", "Dragon Fruit", "Disposables", 10),
+    ]
+
@@ -0,0 +1,68 @@
+from services.putaway import FreeCapacityIndex
+
+
+def row(code, aisle="P", rack=1, capacity=30, cartons=0, skus=()):
+    return {
+        "location_code": code,
+        "aisle": aisle,
+        "rack": rack,
+        "shelf": "A",
+        "bin": 1,
+        "capacity": capacity,
+        "total_cartons": cartons,
+        "skus": list(skus),
+    }
+
+
+def snapshot(index):
+    return (
+        index.bins,
+        {a: list(v) for a, v in index.stocked.items() if v},
+        {a: list(v) for a, v in index.empty.items() if v},
+        {s: set(v) for s, v in index.by_sku.items() if v},
+    )
+
+
+def test_load_sorts_stocked_by_free_space_and_empty_by_rack():
+    index = FreeCapacityIndex()
+    index.load([
+        row("P3-A1", rack=3),
+        row("P1-A1", rack=1),
+        row("P2-A1", cartons=25, skus=["A1"]),
+        row("P2-A2", cartons=5, skus=["A1", "B2"]),
+    ])
+
+    assert index.stocked["P"] == [(5, "P2-A1"), (25, "P2-A2")]
+    assert index.empty["P"] == [(1, "P1-A1"), (3, "P3-A1")]
+    assert index.by_sku == {"A1": {"P2-A1", "P2-A2"}, "B2": {"P2-A2"}}
+
+
+def test_apply_matches_a_full_reload():
+    before = [
+        row("P1-A1"),
+        row("P1-A2", cartons=10, skus=["A1"]),
+        row("Q1-A1", aisle="Q", cartons=30, skus=["B2"]),
+    ]
+    # P1-A1 filled, P1-A2 emptied, Q1-A1 left the layout, R1-A1 is new
+    after = [
+        row("P1-A1", cartons=4, skus=["C3"]),
+        row("P1-A2"),
+        row("R1-A1", aisle="R", cartons=1, skus=["A1"]),
+    ]
+
+    incremental = FreeCapacityIndex()
+    incremental.load(before)
+    incremental.apply(after, ["P1-A1", "P1-A2", "Q1-A1", "R1-A1"])
+
+    full = FreeCapacityIndex()
+    full.load(after)
+
+    assert snapshot(incremental) == snapshot(full)
+
+
+def test_apply_unknown_code_is_a_no_op():
+    index = FreeCapacityIndex()
+    index.load([row("P1-A1")])
+    index.apply([], ["P9-Z9"])
+
+    assert list(index.bins) == ["P1-A1"]
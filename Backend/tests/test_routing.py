@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from services.locations import ALLOWED_AISLES
+from services.routing import (
+    AISLE_PITCH_M,
+    RACK_PITCH_M,
+    allocate,
+    distance_matrix,
+    nearest_neighbour,
+    route,
+    s_shape,
+    stop_position,
+    tour_length,
+    two_opt,
+)
+
+AISLE_LENGTH = 10
+POSITIONS = AISLE_LENGTH + 1
+
+
+def node(aisle, rack):
+    return ALLOWED_AISLES.index(aisle) * POSITIONS + int(stop_position(rack))
+
+
+def candidates(rows):
+    return pd.DataFrame(rows, columns=["sku", "location_code", "aisle", "rack", "shelf", "bin", "side", "cartons"])
+
+
+def test_facing_racks_share_a_stop():
+    assert stop_position([1, 2, 3, 4]).tolist() == [1, 1, 2, 2]
+
+
+def test_distance_matrix():
+    d = distance_matrix(AISLE_LENGTH)
+
+    assert d.shape == (len(ALLOWED_AISLES) * POSITIONS,) * 2
+    assert np.allclose(d, d.T)
+    assert not d.diagonal().any()
+
+    # along one aisle
+    assert d[node("P", 1), node("P", 9)] == 4 * RACK_PITCH_M
+    # next aisle, via the nearer (front) cross aisle
+    assert d[node("P", 1), node("Q", 1)] == 2 * RACK_PITCH_M + AISLE_PITCH_M
+    # near the back, the back cross aisle wins
+    back = 2 * (AISLE_LENGTH - 9) * RACK_PITCH_M + AISLE_PITCH_M
+    assert d[node("P", 18), node("Q", 18)] == back
+
+
+def test_two_opt_never_worse_than_its_start():
+    d = distance_matrix(AISLE_LENGTH)
+    rng = np.random.default_rng(7)
+    nodes = rng.choice(len(d), size=25, replace=False)
+    nodes = nodes[nodes != 0]
+
+    start = np.concatenate([[0], nodes, [0]])
+    best = two_opt(start, d)
+
+    assert tour_length(best, d) <= tour_length(start, d)
+    assert sorted(best[1:-1]) == sorted(nodes)
+    assert best[0] == best[-1] == 0
+
+
+def test_s_shape_alternates_direction():
+    nodes = [node("P", 3), node("P", 9), node("Q", 3), node("Q", 9)]
+
+    assert s_shape(nodes, AISLE_LENGTH).tolist() == [
+        node("P", 3), node("P", 9), node("Q", 9), node("Q", 3),
+    ]
+
+
+def test_nearest_neighbour_visits_everything_once():
+    d = distance_matrix(AISLE_LENGTH)
+    nodes = [node("R", 5), node("P", 1), node("Q", 3)]
+
+    assert nearest_neighbour(nodes, 0, d).tolist() == [node("P", 1), node("Q", 3), node("R", 5)]
+
+
+def test_allocate_prefers_one_covering_location_near_the_route():
+    stock = candidates([
+        ["A1", "ELECTRA P1-A1", "P", 1, "A", 1, "L", 10],
+        ["A1", "ELECTRA T19-A1", "T", 19, "A", 1, "L", 10],
+        ["B2", "ELECTRA P3-A1", "P", 3, "A", 1, "L", 2],
+        ["B2", "ELECTRA Q3-A1", "Q", 3, "A", 1, "L", 2],
+    ])
+
+    picks, unfulfilled = allocate(
+        [{"sku": "A1", "cartons": 4}, {"sku": "B2", "cartons": 3}, {"sku": "ZZ", "cartons": 1}],
+        stock, AISLE_LENGTH
+    )
+
+    assert unfulfilled == [{"sku": "ZZ", "requested": 1, "short": 1}]
+    assert {(p["sku"], p["location_code"], p["cartons"]) for p in picks} == {
+        ("A1", "ELECTRA P1-A1", 4),
+        # no single location holds 3: split, nearest first
+        ("B2", "ELECTRA P3-A1", 2),
+        ("B2", "ELECTRA Q3-A1", 1),
+    }
+
+
+def test_allocate_reports_shortfall():
+    stock = candidates([["A1", "ELECTRA P1-A1", "P", 1, "A", 1, "L", 2]])
+
+    picks, unfulfilled = allocate([{"sku": "A1", "cartons": 5}], stock, AISLE_LENGTH)
+
+    assert [p["cartons"] for p in picks] == [2]
+    assert unfulfilled == [{"sku": "A1", "requested": 5, "short": 3}]
+
+
+def test_route_groups_picks_per_location_in_walk_order():
+    stock = candidates([
+        ["A1", "ELECTRA Q5-A1", "Q", 5, "A", 1, "L", 5],
+        ["B2", "ELECTRA Q5-A1", "Q", 5, "A", 1, "L", 5],
+        ["C3", "ELECTRA P2-B1", "P", 2, "B", 1, "R", 5],
+    ])
+    lines = [{"sku": s, "cartons": 1} for s in ("A1", "B2", "C3")]
+
+    picks, _ = allocate(lines, stock, AISLE_LENGTH)
+    walk, summary = route(picks, stock, AISLE_LENGTH)
+
+    assert [s["location_code"] for s in walk] == ["ELECTRA P2-B1", "ELECTRA Q5-A1"]
+    assert [s["sequence"] for s in walk] == [1, 2]
+    assert len(walk[1]["picks"]) == 2
+    assert summary["stops"] == 2
+    assert summary["distance_m"] <= summary["s_shape_distance_m"]
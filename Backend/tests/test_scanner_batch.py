@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import text
+
+from conftest import location_row
+
+pytestmark = pytest.mark.db
+
+LOCATIONS = [
+    location_row("ELECTRA P1-A1", "A1", "50"),       # 5 cartons
+    location_row("ELECTRA P1-A2", "A1 B2", "20 10"),
+    location_row("ELECTRA P2-A1"),
+    location_row("ELECTRA Q3-B1", "C3", "36"),
+]
+
+
+def stock(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT location_code, sku, units
+            FROM location_stock
+            ORDER BY location_code, sku
+        """)).all()
+
+
+def bins(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT location_code, total_cartons, status, items, capacity, sku_count
+            FROM bin_occupancy
+            ORDER BY location_code
+        """)).all()
+
+
+def move(sku, src, dst, cartons):
+    return {"sku": sku, "from_location": src, "to_location": dst, "cartons": cartons}
+
+
+def test_batch_rejects_whole_batch_on_one_bad_line(client, upload, db):
+    upload(LOCATIONS)
+    before = stock(db), bins(db)
+
+    r = client.post("/scanner/move-batch", json={"moves": [
+        move("A1", "ELECTRA P1-A1", "ELECTRA P2-A1", 3),
+        # only 2 cartons left after line 1
+        move("A1", "ELECTRA P1-A1", "ELECTRA Q3-B1", 3),
+        move("ZZ", "ELECTRA P1-A1", "ELECTRA Q3-B1", 1),
+        move("C3", "ELECTRA P1-A1", "ELECTRA Q3-B1", 1),
+    ]})
+
+    assert r.status_code == 400
+    results = r.json()["detail"]["results"]
+    assert [(x["status"], x["detail"]) for x in results] == [
+        ("ok", None),
+        ("error", "Not enough stock"),
+        ("error", "SKU not found"),
+        ("error", "SKU not in source"),
+    ]
+
+    assert (stock(db), bins(db)) == before
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM stock_movements")).scalar() == 0
+
+
+def test_batch_running_balance_allows_chained_moves(client, upload, db):
+    upload(LOCATIONS)
+
+    r = client.post("/scanner/move-batch", json={"moves": [
+        # P2-A1 is empty until line 1 fills it
+        move("A1", "ELECTRA P1-A1", "ELECTRA P2-A1", 5),
+        move("A1", "ELECTRA P2-A1", "ELECTRA Q3-B1", 4),
+        move(" B2 ", "electra p1-a2", "ELECTRA P2-A1", 2),
+    ]})
+
+    assert r.status_code == 200, r.text
+    assert r.json()["moved"] == 3
+
+    assert stock(db) == [
+        ("ELECTRA P1-A1", "A1", 0),
+        ("ELECTRA P1-A2", "A1", 20),
+        ("ELECTRA P1-A2", "B2", 0),
+        ("ELECTRA P2-A1", "A1", 10),
+        ("ELECTRA P2-A1", "B2", 10),
+        ("ELECTRA Q3-B1", "A1", 40),
+        ("ELECTRA Q3-B1", "C3", 36),
+    ]
+
+
+def test_batch_matches_the_same_moves_one_by_one(client, upload, db):
+    moves = [
+        move("A1", "ELECTRA P1-A1", "ELECTRA P2-A1", 5),
+        move("A1", "ELECTRA P2-A1", "ELECTRA Q3-B1", 4),
+        move("B2", "ELECTRA P1-A2", "ELECTRA P2-A1", 2),
+        move("A1", "ELECTRA Q3-B1", "ELECTRA P1-A1", 4),
+    ]
+
+    upload(LOCATIONS)
+    for m in moves:
+        assert client.post("/scanner/move", json=m).status_code == 200
+    sequential = stock(db), bins(db)
+
+    upload(LOCATIONS)
+    assert client.post("/scanner/move-batch", json={"moves": moves}).status_code == 200
+
+    assert (stock(db), bins(db)) == sequential
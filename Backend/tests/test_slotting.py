@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from services.slotting import abc_classes, accessibility, recommend
+
+
+def test_abc_classes_by_cumulative_share():
+    assert abc_classes([5, 100, 0, 10]).tolist() == ["C", "A", "C", "B"]
+
+
+def test_abc_classes_fastest_mover_is_always_a():
+    assert abc_classes([1000, 1]).tolist() == ["A", "C"]
+
+
+def test_abc_classes_without_sales():
+    assert abc_classes([0, None, -3]).tolist() == ["C", "C", "C"]
+
+
+def test_accessibility_prefers_floor_front_rack_first_aisle():
+    score = accessibility(
+        ["P", "P", "P", "T"],
+        [1, 1, 9, 1],
+        ["A", "D", "A", "A"],
+    )
+
+    assert score[0] == pytest.approx(1.0)
+    assert score[0] > score[2] > score[1]
+    assert score[0] > score[3]
+
+
+def slotting_frames(stock_rows, sales):
+    slots = pd.DataFrame([
+        ["ELECTRA P1-A1", "P", 1, "A"],
+        ["ELECTRA P1-A2", "P", 1, "A"],
+        ["ELECTRA T9-D1", "T", 9, "D"],
+        ["ELECTRA T9-D2", "T", 9, "D"],
+    ], columns=["location_code", "aisle", "rack", "shelf"])
+
+    stock = pd.DataFrame(stock_rows, columns=["location_code", "sku", "cartons", "units"])
+
+    velocity = pd.DataFrame(
+        [[sku, rate, None, None, None] for sku, rate in sales.items()],
+        columns=["sku", "avg_daily_sales", "period_start", "period_end", "updated_at"],
+    )
+
+    return slots, stock, velocity
+
+
+def test_recommend_swaps_hot_bin_into_prime_slot():
+    slots, stock, velocity = slotting_frames(
+        [
+            ["ELECTRA T9-D1", "HOT", 4, 40],
+            ["ELECTRA P1-A1", "COLD", 2, 20],
+        ],
+        {"HOT": 10.0, "COLD": 0.0},
+    )
+
+    result = recommend(slots, stock, velocity)
+    [move] = result["relocations"]
+
+    assert move["action"] == "swap"
+    assert (move["from_location"], move["to_location"]) == ("ELECTRA T9-D1", "ELECTRA P1-A1")
+    assert move["displaced_class"] == "C"
+    assert [s["sku"] for s in move["displaced_skus"]] == ["COLD"]
+    assert move["gain"] == pytest.approx(10 * (move["to_accessibility"] - move["from_accessibility"]), abs=1e-2)
+    assert result["summary"]["a_bins_outside_prime"] == 1
+
+
+def test_recommend_leaves_prime_a_bins_alone():
+    slots, stock, velocity = slotting_frames(
+        [["ELECTRA P1-A1", "HOT", 4, 40]],
+        {"HOT": 10.0},
+    )
+
+    result = recommend(slots, stock, velocity)
+
+    assert result["relocations"] == []
+    assert result["summary"]["a_bins_in_prime"] == 1
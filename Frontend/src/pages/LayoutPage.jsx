@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useNavigate, useLocation } from "react-router-dom";
 import RackGrid from "../Components/RackGrid";
 import BinPopup from "../Components/BinPopup";
@@ -19,12 +19,20 @@ export default function LayoutPage() {
   const [aisleFilter, setAisleFilter] = useState("ALL");
   const [loading, setLoading] = useState(true);
 
+  // last change-feed version applied to `bins`
+  const versionRef = useRef(null);
+
   // ===============================
   // LOAD DATA
   // ===============================
   useEffect(() => {
     const loadBins = async () => {
       try {
+        // take the feed version first so nothing between the two
+        // calls is missed (replaying a change is harmless)
+        const feedRes = await fetch(`${BASE_URL}/bins/changes`);
+        const feed = feedRes.ok ? await feedRes.json() : null;
+
         const res = await fetch(`${BASE_URL}/bins`);
 
         if (!res.ok) throw new Error("Failed to load bins");
@@ -32,6 +40,7 @@ export default function LayoutPage() {
         const data = await res.json();
         const safeData = Array.isArray(data) ? data : [];
 
+        versionRef.current = feed ? feed.version : null;
         setBins(safeData);
         setFilteredBins(safeData);
       } catch (err) {
@@ -43,7 +52,53 @@ export default function LayoutPage() {
       }
     };
 
+    // ===============================
+    // APPLY CHANGES SINCE LAST LOAD
+    // ===============================
+    const syncBins = async () => {
+      if (versionRef.current === null) return;
+
+      try {
+        const res = await fetch(
+          `${BASE_URL}/bins/changes?since=${versionRef.current}`
+        );
+        if (!res.ok) return;
+
+        const feed = await res.json();
+
+        if (feed.resync) {
+          await loadBins();
+          return;
+        }
+
+        versionRef.current = feed.version;
+
+        if (!feed.bins.length && !feed.removed.length) return;
+
+        const changed = new Map(feed.bins.map(b => [b.location_code, b]));
+        const removed = new Set(feed.removed);
+
+        setBins(prev => {
+          const next = prev
+            .filter(b => !removed.has(b.location_code))
+            .map(b => changed.get(b.location_code) || b);
+
+          const known = new Set(prev.map(b => b.location_code));
+          feed.bins.forEach(b => {
+            if (!known.has(b.location_code)) next.push(b);
+          });
+
+          return next;
+        });
+      } catch (err) {
+        console.error("Error syncing bins:", err);
+      }
+    };
+
     loadBins();
+
+    const timer = setInterval(syncBins, 10000);
+    return () => clearInterval(timer);
   }, []);
 
   // ===============================
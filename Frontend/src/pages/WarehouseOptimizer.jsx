@@ -64,11 +64,16 @@ const selectStyles = {
 };
 
 
+// locations per request; "Load more" fetches the next page
+const PAGE_SIZE = 200;
+
+
 export default function WarehouseOptimizer() {
 
   const [locations, setLocations] = useState([]);
   const [selected, setSelected] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const sidebarRef = useRef(null);   // ⭐ sidebar reference
 
@@ -81,7 +86,8 @@ export default function WarehouseOptimizer() {
     flavour: [],
     search: "",
     pallet_type: "",
-    empty: ""
+    empty: "",
+    sort: ""
   });
 
   const [availableFilters, setAvailableFilters] = useState({
@@ -96,15 +102,33 @@ export default function WarehouseOptimizer() {
 
 
   // ================================
-  // Load filter values
+  // Load filter values (with location counts)
   // ================================
   useEffect(() => {
 
-    fetch(`${BASE_URL}/optimizer/filters`)
+    const params = new URLSearchParams();
+
+    filters.brand.forEach(b => params.append("brand", b));
+    filters.category.forEach(c => params.append("category", c));
+    filters.flavour.forEach(f => params.append("flavour", f));
+
+    fetch(`${BASE_URL}/optimizer/facets?${params.toString()}`)
       .then(res => res.json())
-      .then(data => setAvailableFilters(data || { categories: [], brands: [] }));
+      .then(data => {
+        setAvailableFilters({
+          categories: data.categories || [],
+          brands: data.brands || []
+        });
+
+        // flavours only once a brand or category is picked
+        setFlavours(
+          filters.brand.length === 0 && filters.category.length === 0
+            ? []
+            : data.flavours || []
+        );
+      });
 
-  }, []);
+  }, [filters.brand, filters.category, filters.flavour]);
 
 
   // ================================
@@ -115,12 +139,15 @@ export default function WarehouseOptimizer() {
   }, [filters]);
 
 
-  const loadLocations = () => {
+  const loadLocations = (cursor = null) => {
 
     setLoading(true);
 
     const params = new URLSearchParams();
 
+    params.append("limit", PAGE_SIZE);
+    if (cursor) params.append("cursor", cursor);
+
     Object.entries(filters).forEach(([key, value]) => {
 
       if (!value || value === "ALL") return;
@@ -136,39 +163,21 @@ export default function WarehouseOptimizer() {
     fetch(`${BASE_URL}/optimizer/locations?${params.toString()}`)
       .then(res => res.json())
       .then(data => {
-        setLocations(Array.isArray(data) ? data : []);
+        const page = Array.isArray(data.items) ? data.items : [];
+
+        setLocations(prev => cursor ? [...prev, ...page] : page);
+        setNextCursor(data.next_cursor || null);
         setLoading(false);
       })
       .catch(() => {
-        setLocations([]);
+        if (!cursor) setLocations([]);
+        setNextCursor(null);
         setLoading(false);
       });
 
   };
 
 
-  // ================================
-  // Brand → flavour loading
-  // ================================
-  useEffect(() => {
-
-    if (filters.brand.length === 0 && filters.category.length === 0) {
-      setFlavours([]);
-      return;
-    }
-
-    const params = new URLSearchParams();
-
-    filters.brand.forEach(b => params.append("brand", b));
-    filters.category.forEach(c => params.append("category", c));
-
-    fetch(`${BASE_URL}/optimizer/flavours?${params.toString()}`)
-      .then(res => res.json())
-      .then(data => setFlavours(data.flavours || []));
-
-  }, [filters.brand, filters.category]);
-
-
   // ================================
   // Scroll to sidebar when pallet selected
   // ================================
@@ -200,7 +209,8 @@ export default function WarehouseOptimizer() {
       flavour: [],
       search: "",
       pallet_type: "",
-      empty: ""
+      empty: "",
+      sort: ""
     });
 
   };
@@ -280,8 +290,8 @@ export default function WarehouseOptimizer() {
             isMulti
             closeMenuOnSelect={false}
             options={availableFilters.categories.map(c => ({
-              value:c,
-              label:c
+              value:c.value,
+              label:`${c.value} (${c.locations})`
             }))}
             value={filters.category.map(c => ({ value:c, label:c }))}
             onChange={(v)=>setFilters({...filters, category: v ? v.map(x=>x.value) : []})}
@@ -299,8 +309,8 @@ export default function WarehouseOptimizer() {
             isMulti
             closeMenuOnSelect={false}
             options={availableFilters.brands.map(b => ({
-              value:b,
-              label:b
+              value:b.value,
+              label:`${b.value} (${b.locations})`
             }))}
             value={filters.brand.map(b => ({ value:b, label:b }))}
             onChange={(v)=>setFilters({...filters, brand: v ? v.map(x=>x.value) : []})}
@@ -317,7 +327,7 @@ export default function WarehouseOptimizer() {
             maxMenuHeight={300}
             isMulti
             closeMenuOnSelect={false}
-            options={flavours.map(f => ({ value:f, label:f }))}
+            options={flavours.map(f => ({ value:f.value, label:`${f.value} (${f.locations})` }))}
             value={filters.flavour.map(f => ({ value:f, label:f }))}
             onChange={(v)=>setFilters({...filters, flavour: v ? v.map(x=>x.value) : []})}
           />
@@ -347,6 +357,17 @@ export default function WarehouseOptimizer() {
             <option value="false">Occupied</option>
           </select>
 
+          <select
+            value={filters.sort}
+            onChange={(e)=>setFilters({...filters, sort:e.target.value})}
+          >
+            <option value="">Default Order</option>
+            <option value="location">Location</option>
+            <option value="occupancy">Occupancy (low first)</option>
+            <option value="cartons">Cartons (high first)</option>
+            <option value="skus">SKU Count (high first)</option>
+          </select>
+
           <button onClick={clearFilters}>
             Clear Filters
           </button>
@@ -355,7 +376,7 @@ export default function WarehouseOptimizer() {
 
 
         <div className="dashboard-stats">
-          <div>Total Locations: {totalLocations}</div>
+          <div>Total Locations: {totalLocations}{nextCursor ? "+" : ""}</div>
           <div>Mixed Pallets: {mixedCount}</div>
           <div>Low Occupancy: {lowCount}</div>
         </div>
@@ -367,7 +388,7 @@ export default function WarehouseOptimizer() {
 
         <div className="dashboard-grid">
 
-          {loading ? (
+          {loading && locations.length === 0 ? (
             <p>Loading...</p>
           ) : locations.length === 0 ? (
             <p>No data found</p>
@@ -408,6 +429,15 @@ export default function WarehouseOptimizer() {
 
           )}
 
+          {nextCursor && (
+            <button
+              disabled={loading}
+              onClick={()=>loadLocations(nextCursor)}
+            >
+              {loading ? "Loading..." : "Load more"}
+            </button>
+          )}
+
         </div>
 
 
@@ -5,6 +5,7 @@ export default function WarehouseUpload() {
 
   const [productFile, setProductFile] = useState(null);
   const [locationFile, setLocationFile] = useState(null);
+  const [loadMode, setLoadMode] = useState("snapshot");
 
   const [loadingProducts, setLoadingProducts] = useState(false);
   const [loadingLocation, setLoadingLocation] = useState(false);
@@ -12,6 +13,7 @@ export default function WarehouseUpload() {
   const [report, setReport] = useState(null);
   const [error, setError] = useState("");
   const [history, setHistory] = useState([]);
+  const [progress, setProgress] = useState(null);
 
   // =========================
   // LOAD HISTORY
@@ -30,6 +32,29 @@ export default function WarehouseUpload() {
     }
   };
 
+  // =========================
+  // POLL UPLOAD PROGRESS
+  // =========================
+  const startProgressPolling = (uploadId) => {
+    setProgress(null);
+
+    const timer = setInterval(async () => {
+      try {
+        const res = await fetch(`${BASE_URL}/upload/progress/${uploadId}`);
+        if (!res.ok) return;
+        const data = await res.json();
+        setProgress(data);
+      } catch {
+        // keep polling, the upload request reports the final error
+      }
+    }, 1000);
+
+    return () => {
+      clearInterval(timer);
+      setProgress(null);
+    };
+  };
+
   // =========================
   // UPLOAD PRODUCTS
   // =========================
@@ -47,8 +72,11 @@ export default function WarehouseUpload() {
     const formData = new FormData();
     formData.append("products_file", productFile);
 
+    const uploadId = crypto.randomUUID();
+    const stopPolling = startProgressPolling(uploadId);
+
     try {
-      const res = await fetch(`${BASE_URL}/upload/products`, {
+      const res = await fetch(`${BASE_URL}/upload/products?upload_id=${uploadId}`, {
         method: "POST",
         body: formData,
       });
@@ -69,6 +97,7 @@ export default function WarehouseUpload() {
     } catch (err) {
       setError("Product upload failed");
     } finally {
+      stopPolling();
       setLoadingProducts(false);
     }
   };
@@ -90,8 +119,11 @@ export default function WarehouseUpload() {
     const formData = new FormData();
     formData.append("location_file", locationFile);
 
+    const uploadId = crypto.randomUUID();
+    const stopPolling = startProgressPolling(uploadId);
+
     try {
-      const res = await fetch(`${BASE_URL}/upload/location-stock`, {
+      const res = await fetch(`${BASE_URL}/upload/location-stock?upload_id=${uploadId}&mode=${loadMode}`, {
         method: "POST",
         body: formData,
       });
@@ -105,13 +137,15 @@ export default function WarehouseUpload() {
 
       setReport({
         message: data.status,
-        rows: data.rows
+        rows: data.rows,
+        mismatched: data.mismatched_rows
       });
 
       fetchHistory();
     } catch {
       setError("Location upload failed");
     } finally {
+      stopPolling();
       setLoadingLocation(false);
     }
   };
@@ -169,6 +203,15 @@ export default function WarehouseUpload() {
           onChange={(e) => setLocationFile(e.target.files[0])}
         />
 
+        <select
+          value={loadMode}
+          onChange={(e) => setLoadMode(e.target.value)}
+        >
+          <option value="snapshot">Replace all (snapshot)</option>
+          <option value="delta">Apply changes only (delta)</option>
+          <option value="swap">Replace without blocking (swap)</option>
+        </select>
+
         <button
           onClick={uploadLocation}
           disabled={loadingLocation}
@@ -177,11 +220,26 @@ export default function WarehouseUpload() {
         </button>
       </div>
 
+      {/* ================= PROGRESS ================= */}
+      {progress && progress.status === "running" && (
+        <div className="report-card">
+          <strong>
+            {progress.phase === "merging" ? "Applying to database..." : "Reading file..."}
+          </strong>
+          <div>
+            Rows read: {progress.rows_read} ({progress.percent}%)
+          </div>
+        </div>
+      )}
+
       {/* ================= REPORT ================= */}
       {report && (
         <div className="report-card">
           <strong>{report.message}</strong>
           <div>Rows Processed: {report.rows}</div>
+          {report.mismatched > 0 && (
+            <div>Skipped (SKU/QTY mismatch): {report.mismatched}</div>
+          )}
         </div>
       )}
 
@@ -204,6 +262,7 @@ export default function WarehouseUpload() {
                 <th>Date</th>
                 <th>Products</th>
                 <th>Locations</th>
+                <th>Changes</th>
                 <th>Action</th>
               </tr>
             </thead>
@@ -215,6 +274,11 @@ export default function WarehouseUpload() {
                   </td>
                   <td>{h.product_rows || 0}</td>
                   <td>{h.location_rows || 0}</td>
+                  <td>
+                    {h.load_mode === "delta"
+                      ? `+${h.rows_inserted} ~${h.rows_updated} -${h.rows_deleted}`
+                      : "-"}
+                  </td>
                   <td>
                     <button
                       className="danger-btn"